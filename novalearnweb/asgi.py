@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'novalearnweb.settings')
+# Lu par settings.py : pas de connexions persistantes par défaut sous ASGI
+os.environ.setdefault('DJANGO_ASGI', 'True')
 
 application = get_asgi_application()
@@ -34,19 +34,23 @@ ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS').split(',')
 # Application definition
 
 INSTALLED_APPS = [
+    # Avant django.contrib.auth : store remplace sa commande createsuperuser
+    'store',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'store',
     'social_django',
 ]
 
 MIDDLEWARE = [
+    'store.middleware.QueryMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'store.middleware.ReplicaStickinessMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -61,8 +65,14 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Templates compilés une fois par processus (rechargés par l'autoreloader en DEBUG)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
@@ -79,9 +89,46 @@ WSGI_APPLICATION = 'novalearnweb.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 DATABASE_URL = os.getenv('DATABASE_URL')
+# Connexions persistantes : réutilisées pendant DB_CONN_MAX_AGE secondes (None : sans limite,
+# 0 : une connexion par requête) et vérifiées avant réutilisation.
+# Sous ASGI (DJANGO_ASGI, posé par novalearnweb/asgi.py), l'ORM s'exécute dans un nouveau
+# thread à chaque requête : les connexions persistantes s'y accumuleraient sans être
+# réutilisées. Défaut 0 ; pour réutiliser les connexions sous ASGI, activer DB_POOL.
+ASGI = os.getenv('DJANGO_ASGI', 'False') == 'True'
+DB_CONN_MAX_AGE = os.getenv('DB_CONN_MAX_AGE', '0' if ASGI else '60')
+DB_CONN_MAX_AGE = None if DB_CONN_MAX_AGE == 'None' else int(DB_CONN_MAX_AGE)
 DATABASES = {
-    'default': dj_database_url.parse(DATABASE_URL)
+    'default': dj_database_url.parse(
+        DATABASE_URL,
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
+    )
 }
+# Réplica en lecture seule pour le catalogue, la recherche et les statistiques (store/routers.py)
+DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = dj_database_url.parse(
+        DATABASE_REPLICA_URL,
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=DATABASES['default']['CONN_HEALTH_CHECKS'],
+    )
+    # En test, le réplica est la base de test principale
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['store.routers.PrimaryReplicaRouter']
+# Durée (secondes) pendant laquelle un visiteur relit la base principale après une écriture
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', '5'))
+
+# Pool de connexions psycopg 3 (PostgreSQL, paquet psycopg_pool), partagé par les threads
+# d'un processus ; remplace les connexions persistantes, que Django refuse en même temps
+DB_POOL = os.getenv('DB_POOL', 'False') == 'True'
+for database in DATABASES.values():
+    if DB_POOL and database['ENGINE'] == 'django.db.backends.postgresql':
+        database['CONN_MAX_AGE'] = 0
+        database.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+            'timeout': int(os.getenv('DB_POOL_TIMEOUT', '10')),
+        }
 
 '''
 DATABASES = {
@@ -129,6 +176,14 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 
+# collectstatic hache les noms et pré-compresse (gzip, brotli si le paquet Brotli est installé) ;
+# WhiteNoise sert ces fichiers avec Cache-Control: immutable d'un an (60 s pour les noms non hachés)
+STORAGES = {
+    # Médias adressés par contenu : un fichier téléversé plusieurs fois n'est stocké qu'une fois
+    'default': {'BACKEND': 'store.media.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'store.staticfiles.StaticFilesStorage'},
+}
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -162,6 +217,25 @@ SOCIAL_AUTH_FACEBOOK_PROFILE_EXTRA_PARAMS = {
     'fields': 'id, name, email, first_name, last_name'
 }
 
+# Pipeline par défaut, plus le rattachement par email (store.accounts) : l'email
+# est unique sans tenir compte de la casse (migration 0014)
+SOCIAL_AUTH_PIPELINE = (
+    'social_core.pipeline.social_auth.social_details',
+    'social_core.pipeline.social_auth.social_uid',
+    'social_core.pipeline.social_auth.auth_allowed',
+    'social_core.pipeline.social_auth.social_user',
+    'social_core.pipeline.user.get_username',
+    'store.accounts.associate_by_email',
+    'social_core.pipeline.user.create_user',
+    'social_core.pipeline.social_auth.associate_user',
+    'social_core.pipeline.social_auth.load_extra_data',
+    'social_core.pipeline.user.user_details',
+)
+
+# Fournisseurs dont l'email est vérifié (champ email_verified) : seuls rattachés à un compte existant.
+# Facebook peut transmettre une adresse non confirmée
+SOCIAL_AUTH_VERIFIED_EMAIL_BACKENDS = ('google-oauth2',)
+
 # Redirections en cas d'erreur OAuth
 SOCIAL_AUTH_LOGIN_ERROR_URL = '/login/'
 SOCIAL_AUTH_RAISE_EXCEPTIONS = False
@@ -172,6 +246,70 @@ SITE_URL = 'http://localhost:8000'
 # Timeout pour les API de paiement (en secondes)
 PAYMENT_API_TIMEOUT = 30
 
+# Cache partagé entre processus si REDIS_URL est défini (paquet redis requis),
+# sinon cache mémoire local au processus. Les droits d'accès (PurchaseEntitlement)
+# ne sont mis en cache qu'avec un cache partagé : un remboursement doit valoir
+# immédiatement pour tous les workers
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# Stockage des sessions (panier) : db, cache, cookie (signé) ou adaptive
+# (cookie signé pour les petits paniers anonymes, cache sinon - voir store/sessions.py).
+# cache et adaptive supposent un cache partagé (REDIS_URL) dès qu'il y a plusieurs processus.
+SESSION_STRATEGY = os.getenv('SESSION_STRATEGY', 'db')
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'cookie': 'django.contrib.sessions.backends.signed_cookies',
+    'adaptive': 'store.sessions',
+}
+SESSION_ENGINE = SESSION_ENGINES[SESSION_STRATEGY]
+# Taille maximale (octets) d'une session stockée en cookie par la stratégie adaptive
+SESSION_COOKIE_PAYLOAD_LIMIT = int(os.getenv('SESSION_COOKIE_PAYLOAD_LIMIT', '1024'))
+
+# Limitation de débit (store/ratelimit.py) : seau -> (débit 'N/s|m|h', rafale tolérée).
+# Globale avec REDIS_URL ; avec le repli LocMemCache, les limites s'appliquent par processus.
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True') == 'True'
+RATE_LIMITS = {
+    'search': (os.getenv('RATE_LIMIT_SEARCH', '5/s'), 20),
+    'login': (os.getenv('RATE_LIMIT_LOGIN', '10/m'), 5),
+    'contact': (os.getenv('RATE_LIMIT_CONTACT', '5/h'), 3),
+    'webhook': (os.getenv('RATE_LIMIT_WEBHOOK', '20/s'), 50),
+    'download': (os.getenv('RATE_LIMIT_DOWNLOAD', '30/m'), 10),
+}
+# En-tête META portant l'IP du client derrière un proxy de confiance (ex. HTTP_X_FORWARDED_FOR)
+RATE_LIMIT_CLIENT_IP_HEADER = os.getenv('RATE_LIMIT_CLIENT_IP_HEADER') or None
+# Nombre de proxies de confiance qui ajoutent un maillon à cet en-tête (l'IP retenue est
+# celle vue par le plus éloigné d'entre eux, les maillons précédents sont falsifiables)
+RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv('RATE_LIMIT_TRUSTED_PROXIES', '1'))
+# Adresses jamais limitées, par seau. Les notifications de paiement arrivent en rafales depuis
+# quelques adresses de CinetPay : un 429 ferait manquer un paiement (CINETPAY_WEBHOOK_IPS, séparées par des virgules)
+RATE_LIMIT_EXEMPT_IPS = {
+    'webhook': [ip.strip() for ip in os.getenv('CINETPAY_WEBHOOK_IPS', '').split(',') if ip.strip()],
+}
+
+# Threads générant les variantes d'images après téléversement (0 : dans la requête)
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', '2'))
+
+# Empaquetage HLS des séquences vidéo (commande package_videos)
+FFMPEG_BINARY = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+FFPROBE_BINARY = os.getenv('FFPROBE_BINARY', 'ffprobe')
+VIDEO_PREVIEW_SECONDS = int(os.getenv('VIDEO_PREVIEW_SECONDS', '60'))
+
+# Instrumentation des requêtes (nombre de requêtes SQL, temps DB, rendu, taille)
+# Désactivée par défaut : le middleware est alors retiré de la chaîne
+QUERY_METRICS_ENABLED = os.getenv('QUERY_METRICS_ENABLED', 'False') == 'True'
+# Au-delà de ce nombre de répétitions d'une même requête, un N+1 est signalé
+QUERY_METRICS_N_PLUS_ONE_THRESHOLD = int(os.getenv('QUERY_METRICS_N_PLUS_ONE_THRESHOLD', '10'))
+# Temps de rendu des templates hors DEBUG (remplace Template.render pour tout le processus)
+QUERY_METRICS_TEMPLATES = os.getenv('QUERY_METRICS_TEMPLATES', 'False') == 'True'
+# Jeton pour l'accès à /metrics/ par un collecteur externe (sinon réservé au staff).
+# Les métriques sont tenues par processus : chaque collecte ne voit qu'un worker
+QUERY_METRICS_TOKEN = os.getenv('QUERY_METRICS_TOKEN', '')
+
 # Logging pour les paiements
 LOGGING = {
     'version': 1,
@@ -183,10 +321,18 @@ LOGGING = {
         },
     },
     'handlers': {
+        # JSON via une file bornée et un thread d'écriture (store/jsonlog.py) :
+        # un disque lent ne bloque ni le paiement ni le webhook.
+        # Fichier partagé par tous les workers : rotation par logrotate, pas par Python
         'file': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
+            'class': 'store.jsonlog.QueueFileHandler',
             'filename': BASE_DIR / 'logs' / 'payments.log',
+            'queue_size': int(os.getenv('PAYMENT_LOG_QUEUE_SIZE', '10000')),
+        },
+        'console': {
+            'level': 'DEBUG',
+            'class': 'logging.StreamHandler',
             'formatter': 'verbose',
         },
     },
@@ -196,6 +342,16 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        'store.views': {
+            'handlers': ['file'],
+            'level': 'INFO',
+            'propagate': True,
+        },
+        'store.middleware': {
+            'handlers': ['console'],
+            'level': os.getenv('QUERY_METRICS_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
     },
 }
 
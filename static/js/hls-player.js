@@ -0,0 +1,24 @@
+// Lecture des rendus HLS adaptatifs : natif (Safari, iOS) ou via hls.js, sinon fichier MP4.
+// hlsUrl est vide quand l'extrait court (mp4Url) doit être lu.
+function attachVideoSource(video, hlsUrl, mp4Url) {
+    if (video._hls) {
+        video._hls.destroy();
+        video._hls = null;
+    }
+    if (hlsUrl && video.canPlayType('application/vnd.apple.mpegurl')) {
+        video.src = hlsUrl;
+    } else if (hlsUrl && window.Hls && Hls.isSupported()) {
+        video._hls = new Hls();
+        video._hls.loadSource(hlsUrl);
+        video._hls.attachMedia(video);
+    } else if (mp4Url) {
+        video.src = mp4Url;
+    }
+}
+
+function detachVideoSource(video) {
+    if (video && video._hls) {
+        video._hls.destroy();
+        video._hls = null;
+    }
+}
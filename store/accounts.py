@@ -0,0 +1,85 @@
+"""
+Recherche des comptes par email normalisé.
+
+La migration 0014 ajoute à la table des utilisateurs un index unique sur
+lower(email) (emails vides exclus) et un index sur lower(username). Les
+requêtes ci-dessous reprennent exactement ces expressions et cette
+condition, sans quoi la base retombe sur un parcours complet de la table.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.db.models.functions import Lower
+from social_core.exceptions import AuthException
+
+
+EMAIL_INDEX_NAME = 'auth_user_email_lower_uniq'
+USERNAME_INDEX_NAME = 'auth_user_username_lower_idx'
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def _users():
+    return get_user_model().objects.alias(email_lower=Lower('email'), username_lower=Lower('username'))
+
+
+def _email_match(email):
+    # email > '' reprend la condition de l'index partiel
+    return Q(email_lower=normalize_email(email), email__gt='')
+
+
+def find_user_by_email(email):
+    """Utilisateur dont l'email correspond sans tenir compte de la casse, ou None"""
+    if not normalize_email(email):
+        return None
+    return _users().filter(_email_match(email)).first()
+
+
+def email_in_use(email, exclude=None):
+    """L'email appartient-il déjà à un autre compte que `exclude` ?"""
+    existing = find_user_by_email(email)
+    return existing is not None and (exclude is None or existing.pk != exclude.pk)
+
+
+def registration_conflicts(username, email):
+    """(nom d'utilisateur pris, email pris), en une seule requête indexée"""
+    condition = Q(username_lower=username.lower())
+    if normalize_email(email):
+        condition |= _email_match(email)
+    username_taken = email_taken = False
+    for existing_username, existing_email in _users().filter(condition).values_list('username', 'email'):
+        username_taken |= existing_username.lower() == username.lower()
+        email_taken |= bool(existing_email) and normalize_email(existing_email) == normalize_email(email)
+    return username_taken, email_taken
+
+
+def email_verified_by_provider(backend, response):
+    """Le fournisseur atteste-t-il que l'utilisateur possède cette adresse ?"""
+    if backend.name not in getattr(settings, 'SOCIAL_AUTH_VERIFIED_EMAIL_BACKENDS', ()):
+        return False
+    # Google : email_verified (OpenID Connect) ou verified_email (userinfo v2)
+    verified = response.get('email_verified', response.get('verified_email'))
+    return verified is True or str(verified).lower() == 'true'
+
+
+def associate_by_email(backend, details, user=None, response=None, *args, **kwargs):
+    """
+    Étape du pipeline social-auth, avant create_user : rattache la connexion
+    au compte existant de même email, seulement si le fournisseur a vérifié
+    l'adresse (SOCIAL_AUTH_VERIFIED_EMAIL_BACKENDS) ; une adresse non vérifiée
+    donnerait accès au compte d'un autre. Sinon la connexion est refusée avec
+    un message, au lieu de laisser create_user heurter l'index unique
+    lower(email) (IntegrityError, erreur 500).
+    """
+    if user:
+        return None
+    existing = find_user_by_email(details.get('email'))
+    if existing is None:
+        return None
+    if email_verified_by_provider(backend, response or {}):
+        return {'user': existing, 'is_new': False}
+    raise AuthException(
+        backend, "Un compte existe déjà avec cette adresse email : connectez-vous avec votre mot de passe."
+    )
@@ -1,21 +1,62 @@
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.models import User
+from django.db.models import Count
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
+from .forms import UniqueEmailUserChangeForm
+from .images import variant_url
 from .models import Category, Product, Order, OrderItem, Payment, Download, Review, VideoSequence, BookCollection, PersonalDevelopmentSection, Contact, CinetPayTransaction
 
 
+class AnnotatedCountsMixin:
+    """
+    Colonnes de comptage calculées par annotation dans get_queryset.
+
+    `annotated_counts` associe un nom de colonne de list_display à un couple
+    (relation, libellé). Le comptage est fait en une seule requête pour toute
+    la page au lieu d'un `obj.<relation>.count()` par ligne, et la colonne
+    devient triable.
+    """
+    annotated_counts = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name, (relation, description) in cls.annotated_counts.items():
+            if name not in cls.__dict__:
+                setattr(cls, name, cls._make_count_column(name, description))
+
+    @staticmethod
+    def _make_count_column(name, description):
+        alias = f'{name}_annotated'
+
+        def column(self, obj):
+            return getattr(obj, alias, 0)
+        column.short_description = description
+        column.admin_order_field = alias
+        return column
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if self.annotated_counts:
+            queryset = queryset.annotate(**{
+                f'{name}_annotated': Count(relation, distinct=True)
+                for name, (relation, description) in self.annotated_counts.items()
+            })
+        return queryset
+
+
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(AnnotatedCountsMixin, admin.ModelAdmin):
     list_display = ['name', 'slug', 'is_active', 'created_at', 'product_count']
     list_filter = ['is_active', 'created_at']
     search_fields = ['name', 'description']
     prepopulated_fields = {'slug': ('name',)}
     readonly_fields = ['created_at', 'updated_at']
-    
-    def product_count(self, obj):
-        return obj.products.count()
-    product_count.short_description = "Nombre de produits"
+    annotated_counts = {
+        'product_count': ('products', "Nombre de produits"),
+    }
 
 
 class OrderItemInline(admin.TabularInline):
@@ -31,10 +72,10 @@ class PaymentInline(admin.TabularInline):
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(AnnotatedCountsMixin, admin.ModelAdmin):
     list_display = [
         'order_number', 'customer_name', 'customer_email', 
-        'total_fcfa', 'total_eur', 'status', 'created_at'
+        'total_fcfa', 'total_eur', 'item_count', 'status', 'created_at'
     ]
     list_filter = ['status', 'created_at', 'paid_at']
     search_fields = ['order_number', 'customer_name', 'customer_email']
@@ -43,6 +84,9 @@ class OrderAdmin(admin.ModelAdmin):
         'subtotal_fcfa', 'subtotal_eur', 'total_fcfa', 'total_eur'
     ]
     inlines = [OrderItemInline, PaymentInline]
+    annotated_counts = {
+        'item_count': ('items', "Articles"),
+    }
     
     fieldsets = (
         ('Informations de base', {
@@ -73,7 +117,8 @@ class OrderAdmin(admin.ModelAdmin):
 class ProductAdmin(admin.ModelAdmin):
     list_display = [
         'title', 'category', 'product_type', 'pricing_type', 'price_fcfa', 
-        'price_eur', 'downloads_count', 'is_active', 'is_featured', 'views_count', 'sales_count'
+        'price_eur', 'downloads_count', 'video_sequence_count', 'is_active', 'is_featured',
+        'views_count', 'sales_count'
     ]
     list_filter = [
         'category', 'product_type', 'pricing_type', 'is_active', 'is_featured', 
@@ -82,7 +127,8 @@ class ProductAdmin(admin.ModelAdmin):
     search_fields = ['title', 'description', 'short_description']
     prepopulated_fields = {'slug': ('title',)}
     readonly_fields = [
-        'views_count', 'sales_count', 'downloads_count', 'rating', 'rating_count',
+        'views_count', 'sales_count', 'downloads_count', 'rating', 'rating_count', 'rating_sum',
+        'video_sequence_count', 'video_total_minutes', 'video_preview_count', 'composite_type',
         'created_at', 'updated_at', 'cover_image_preview'
     ]
     
@@ -111,7 +157,11 @@ class ProductAdmin(admin.ModelAdmin):
             'fields': ('is_featured', 'is_new', 'is_popular', 'is_active')
         }),
         ('Statistiques', {
-            'fields': ('views_count', 'sales_count', 'downloads_count', 'rating', 'rating_count'),
+            'fields': ('views_count', 'sales_count', 'downloads_count', 'rating', 'rating_count', 'rating_sum'),
+            'classes': ('collapse',)
+        }),
+        ('Contenu vidéo', {
+            'fields': ('composite_type', 'video_sequence_count', 'video_total_minutes', 'video_preview_count'),
             'classes': ('collapse',)
         }),
         ('SEO', {
@@ -128,7 +178,7 @@ class ProductAdmin(admin.ModelAdmin):
         if obj.cover_image:
             return format_html(
                 '<img src="{}" style="max-height: 100px; max-width: 100px;" />',
-                obj.cover_image.url
+                variant_url(obj.cover_image, 'thumb')
             )
         return "Aucune image"
     cover_image_preview.short_description = "Aperçu de l'image"
@@ -217,6 +267,7 @@ class ReviewAdmin(admin.ModelAdmin):
     list_filter = ['rating', 'is_approved', 'is_verified_purchase', 'created_at']
     search_fields = ['user__username', 'product__title', 'title', 'comment']
     readonly_fields = ['created_at', 'updated_at']
+    actions = ['approve_reviews', 'unapprove_reviews']
     
     fieldsets = (
         ('Informations de base', {
@@ -236,6 +287,16 @@ class ReviewAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('user', 'product', 'order')
+    
+    def approve_reviews(self, request, queryset):
+        count = Review.bulk_set_approved(queryset, True)
+        self.message_user(request, f"{count} avis approuvé(s).")
+    approve_reviews.short_description = "Approuver les avis sélectionnés"
+    
+    def unapprove_reviews(self, request, queryset):
+        count = Review.bulk_set_approved(queryset, False)
+        self.message_user(request, f"{count} avis désapprouvé(s).")
+    unapprove_reviews.short_description = "Désapprouver les avis sélectionnés"
 
 
 @admin.register(VideoSequence)
@@ -259,20 +320,24 @@ class VideoSequenceAdmin(admin.ModelAdmin):
         ('Statut', {
             'fields': ('is_preview', 'is_active')
         }),
+        ('Diffusion HLS (commande package_videos)', {
+            'fields': ('hls_playlist', 'preview_clip', 'packaged_source'),
+            'classes': ('collapse',)
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
     
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['created_at', 'updated_at', 'hls_playlist', 'preview_clip', 'packaged_source']
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('product')
 
 
 @admin.register(BookCollection)
-class BookCollectionAdmin(admin.ModelAdmin):
+class BookCollectionAdmin(AnnotatedCountsMixin, admin.ModelAdmin):
     list_display = ['title', 'get_books_count', 'price_fcfa', 'discount_percentage', 'is_active', 'created_at']
     list_filter = ['is_active', 'is_featured', 'created_at']
     search_fields = ['title', 'description']
@@ -298,14 +363,13 @@ class BookCollectionAdmin(admin.ModelAdmin):
     )
     
     readonly_fields = ['created_at', 'updated_at']
-    
-    def get_books_count(self, obj):
-        return obj.get_books_count()
-    get_books_count.short_description = "Nombre de livres"
+    annotated_counts = {
+        'get_books_count': ('books', "Nombre de livres"),
+    }
 
 
 @admin.register(PersonalDevelopmentSection)
-class PersonalDevelopmentSectionAdmin(admin.ModelAdmin):
+class PersonalDevelopmentSectionAdmin(AnnotatedCountsMixin, admin.ModelAdmin):
     list_display = ['name', 'sub_section', 'get_books_count', 'order', 'is_active']
     list_filter = ['is_active', 'sub_section', 'created_at']
     search_fields = ['name', 'description']
@@ -332,10 +396,9 @@ class PersonalDevelopmentSectionAdmin(admin.ModelAdmin):
     )
     
     readonly_fields = ['created_at', 'updated_at']
-    
-    def get_books_count(self, obj):
-        return obj.get_books_count()
-    get_books_count.short_description = "Nombre de livres"
+    annotated_counts = {
+        'get_books_count': ('books', "Nombre de livres"),
+    }
 
 
 @admin.register(Contact)
@@ -423,6 +486,14 @@ class CinetPayTransactionAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         return False  # Ne pas permettre la suppression
 
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class StoreUserAdmin(UserAdmin):
+    form = UniqueEmailUserChangeForm
+
+
 # Configuration de l'interface d'administration
 admin.site.site_header = "NovaLearn - Administration"
 admin.site.site_title = "NovaLearn Admin"
@@ -0,0 +1,149 @@
+"""
+Versions async des vues du catalogue, servies uniquement sous ASGI.
+
+store/urls.py les route quand l'application est démarrée par
+novalearnweb/asgi.py (settings.ASGI) ; sous WSGI (gunicorn), les vues
+synchrones de store/views.py évitent le passage par async_to_sync et les
+changements de thread à chaque requête. Les données sont chargées avec l'ORM
+async ; le template est encore rendu dans sync_to_async, car base.html lit la
+session et l'utilisateur paresseux. Les querysets que les templates
+n'affichent pas restent paresseux : chaque vue exécute le même nombre de
+requêtes que sa version synchrone.
+"""
+from asgiref.sync import sync_to_async
+
+from django.core.paginator import Paginator
+from django.db.models import F
+from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404, render
+
+from .conditional import catalog_condition, product_detail_validator
+from .models import Category, Product, PurchaseEntitlement, Review, VideoSequence
+from .ratelimit import rate_limit
+from .routers import read_from_replica
+from .views import _filter_products, _missing_video_response, _search_result, _sequence_preview_data
+
+
+async def _alist(queryset):
+    """Évalue un queryset avec l'ORM async"""
+    return [obj async for obj in queryset]
+
+
+async def _arender(request, template_name, context):
+    """render() pour les vues async : le template peut encore lire la session, l'utilisateur ou une relation"""
+    return await sync_to_async(render)(request, template_name, context)
+
+
+@read_from_replica
+async def home(request):
+    """Page d'accueil"""
+    try:
+        context = {
+            'featured_products': await _alist(
+                Product.objects.filter(is_active=True, is_featured=True).select_related('category')[:6]
+            ),
+            'new_products': await _alist(
+                Product.objects.filter(is_active=True, is_new=True).select_related('category')[:4]
+            ),
+            # Non affiché par le template : laissé paresseux, sans requête
+            'popular_products': Product.objects.filter(is_active=True, is_popular=True).select_related('category')[:4],
+            'categories': await _alist(Category.objects.filter(is_active=True)[:6]),
+            'reviews': await _alist(
+                Review.objects.filter(is_approved=True).select_related('user', 'product').order_by('-created_at')[:6]
+            ),
+            'products_with_reviews': await _alist(
+                Product.objects.filter(is_active=True, rating_count__gt=0).order_by('-rating')[:4]
+            ),
+        }
+    except Exception:
+        # Fallback context if there are database issues
+        context = {
+            'featured_products': [],
+            'new_products': [],
+            'popular_products': [],
+            'categories': [],
+            'reviews': [],
+            'products_with_reviews': [],
+        }
+    return await _arender(request, 'store/home.html', context)
+
+
+@read_from_replica
+async def product_list(request):
+    """Liste des produits"""
+    products, filters = _filter_products(request)
+
+    paginator = Paginator(products, 12)
+    # Le COUNT de Paginator est synchrone : calculé ici avec l'ORM async
+    paginator.count = await products.acount()
+    page_obj = paginator.get_page(request.GET.get('page'))
+    page_obj.object_list = await _alist(page_obj.object_list)
+
+    context = {
+        'page_obj': page_obj,
+        'categories': await _alist(Category.objects.filter(is_active=True)),
+        **filters,
+    }
+    return await _arender(request, 'store/product_list.html', context)
+
+
+@read_from_replica
+@catalog_condition(product_detail_validator)
+async def product_detail(request, slug):
+    """Détail d'un produit"""
+    product = await aget_object_or_404(Product, slug=slug, is_active=True)
+
+    # Incrémenter le compteur de vues sur la base principale, sans réécrire la valeur lue sur le réplica
+    await Product.objects.filter(pk=product.pk).aupdate(views_count=F('views_count') + 1)
+
+    # Produits similaires : voisins pré-calculés par build_recommendations
+    similar_products = [
+        recommendation.recommended
+        async for recommendation in product.recommendations.filter(
+            recommended__is_active=True
+        ).select_related('recommended')[:4]
+    ]
+    if not similar_products:
+        similar_products = await _alist(
+            Product.objects.filter(category_id=product.category_id, is_active=True).exclude(id=product.id)[:4]
+        )
+
+    context = {
+        'product': product,
+        # request.user se résout dans le thread (backends social_core sans aget_user)
+        'is_owned': await sync_to_async(PurchaseEntitlement.user_owns)(request.user, product),
+        'similar_products': similar_products,
+        # Avis approuvés (non affichés par le template : laissés paresseux, sans requête)
+        'reviews': Review.objects.filter(product=product, is_approved=True).select_related('user')[:10],
+    }
+    return await _arender(request, 'store/product_detail.html', context)
+
+
+@rate_limit('search')
+@read_from_replica
+async def product_search(request):
+    """Recherche de produits via AJAX"""
+    query = request.GET.get('q', '')
+    if len(query) < 2:
+        return JsonResponse({'products': []})
+
+    products = Product.objects.filter(is_active=True, title__icontains=query).select_related('category')[:10]
+    return JsonResponse({'products': [_search_result(product) async for product in products]})
+
+
+async def sequence_video_preview(request, sequence_id):
+    """API pour servir l'aperçu vidéo d'une séquence spécifique"""
+    try:
+        sequence = await aget_object_or_404(
+            VideoSequence.objects.select_related('product'), id=sequence_id, is_active=True
+        )
+        # Accès disque hors de la boucle d'événements
+        missing = await sync_to_async(_missing_video_response)(sequence)
+        if missing is not None:
+            return missing
+        hls_url = await sync_to_async(sequence.hls_url_for)(request.user)
+        return JsonResponse(_sequence_preview_data(sequence, hls_url))
+    except Exception as e:
+        return JsonResponse({
+            'error': f'Erreur lors de la récupération de la séquence: {str(e)}'
+        }, status=500)
@@ -0,0 +1,198 @@
+"""
+Outils communs aux commandes de benchmark : clients (en processus ou HTTP),
+statistiques de latence et stockage des résultats pour comparaison entre
+commits.
+"""
+import http.cookiejar
+import json
+import math
+import re
+import subprocess
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from importlib import import_module
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.db import close_old_connections, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+
+RESULTS_DIR = Path(settings.BASE_DIR) / 'benchmarks' / 'results'
+
+_SERVER_TIMING_QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+
+def percentile(values, pct):
+    """Percentile par rang le plus proche (values déjà triées)"""
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, math.ceil(pct / 100 * len(values)) - 1))
+    return values[rank]
+
+
+def summarize(samples, wall_time):
+    """Statistiques d'une série de mesures [(durée_s, nb_requêtes_sql, statut)]"""
+    durations = sorted(duration * 1000 for duration, _queries, _status in samples)
+    queries = [q for _duration, q, _status in samples if q is not None]
+    errors = sum(1 for _duration, _queries, status in samples if status >= 400)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput_rps': round(len(samples) / wall_time, 2) if wall_time else 0.0,
+        'p50_ms': round(percentile(durations, 50), 2),
+        'p95_ms': round(percentile(durations, 95), 2),
+        'p99_ms': round(percentile(durations, 99), 2),
+        'max_ms': round(durations[-1], 2) if durations else 0.0,
+        'avg_queries': round(sum(queries) / len(queries), 2) if queries else None,
+        'max_queries': max(queries) if queries else None,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def save_results(name, results, output=None):
+    """Enregistre les résultats en JSON, horodatés et liés au commit courant"""
+    revision = git_revision()
+    payload = {
+        'benchmark': name,
+        'revision': revision,
+        'created_at': timezone.now().isoformat(),
+        'database': connections['default'].vendor,
+        'results': results,
+    }
+    if output:
+        path = Path(output)
+    else:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        path = RESULTS_DIR / f"{name}-{timezone.now().strftime('%Y%m%d-%H%M%S')}-{revision}.json"
+    path.write_text(json.dumps(payload, indent=2, ensure_ascii=False))
+    return path
+
+
+def compare_results(previous_path, results):
+    """Écarts relatifs (%) par scénario et par indicateur avec un résultat antérieur"""
+    previous = json.loads(Path(previous_path).read_text())['results']
+    report = {}
+    for scenario, stats in results.items():
+        before = previous.get(scenario)
+        if not before:
+            continue
+        report[scenario] = {}
+        for key, value in stats.items():
+            old = before.get(key)
+            if isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+                report[scenario][key] = (old, value, round((value - old) / old * 100, 1))
+    return report
+
+
+class InProcessClient:
+    """Client de test Django : mesure exacte du nombre de requêtes SQL"""
+
+    def __init__(self):
+        self.client = Client()
+
+    def login(self, user):
+        self.client.force_login(user)
+
+    def request(self, method, path, data=None, content_type=None, headers=None):
+        kwargs = {'headers': headers or {}}
+        if data is not None:
+            kwargs['data'] = data
+        if content_type:
+            kwargs['content_type'] = content_type
+        # Chronomètre lancé avant l'ouverture éventuelle de la connexion (CONN_MAX_AGE=0)
+        start = time.perf_counter()
+        with CaptureQueriesContext(connections['default']) as ctx:
+            response = getattr(self.client, method.lower())(path, **kwargs)
+        # Fin de requête d'un vrai serveur (le client de test ne ferme jamais les connexions)
+        close_old_connections()
+        elapsed = time.perf_counter() - start
+        return response.status_code, elapsed, len(ctx.captured_queries)
+
+
+class HttpClient:
+    """
+    Client HTTP vers un serveur lancé à part (runserver, gunicorn, uvicorn).
+
+    Le nombre de requêtes SQL est lu dans l'en-tête Server-Timing si le
+    serveur tourne avec QUERY_METRICS_ENABLED.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies),
+            _NoRedirect,
+        )
+
+    def login(self, user):
+        # Même principe que Client.force_login : session créée côté serveur
+        engine = import_module(settings.SESSION_ENGINE)
+        session = engine.SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        host = urllib.parse.urlsplit(self.base_url).hostname
+        self.cookies.set_cookie(http.cookiejar.Cookie(
+            0, settings.SESSION_COOKIE_NAME, session.session_key, None, False,
+            host, False, False, '/', True, False, None, False, None, None, {},
+        ))
+        # Récupère le cookie CSRF pour les requêtes POST
+        self.request('GET', '/login/')
+
+    def _csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == settings.CSRF_COOKIE_NAME:
+                return cookie.value
+        return ''
+
+    def request(self, method, path, data=None, content_type=None, headers=None):
+        headers = dict(headers or {})
+        body = None
+        if method != 'GET':
+            headers.setdefault('X-CSRFToken', self._csrf_token())
+            headers.setdefault('Referer', self.base_url + '/')
+            if content_type:
+                body = data.encode() if isinstance(data, str) else data
+                headers['Content-Type'] = content_type
+            elif data is not None:
+                body = urllib.parse.urlencode(data).encode()
+                headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif data:
+            path = f'{path}?{urllib.parse.urlencode(data)}'
+
+        request = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request) as response:
+                response.read()
+                status, timing = response.status, response.headers.get('Server-Timing', '')
+        except urllib.error.HTTPError as error:
+            error.read()
+            status, timing = error.code, error.headers.get('Server-Timing', '')
+        elapsed = time.perf_counter() - start
+        match = _SERVER_TIMING_QUERIES_RE.search(timing)
+        return status, elapsed, int(match.group(1)) if match else None
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Les redirections sont mesurées comme des réponses à part entière"""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
@@ -0,0 +1,12 @@
+"""Panier stocké en session : {product_id (str): quantité}"""
+
+
+def get_cart(request):
+    """Copie du panier : les modifications ne touchent pas la session avant save_cart"""
+    return dict(request.session.get('cart', {}))
+
+
+def save_cart(request, cart_data):
+    """Enregistre le panier seulement s'il a changé (pas d'écriture de session inutile)"""
+    if cart_data != request.session.get('cart', {}):
+        request.session['cart'] = cart_data
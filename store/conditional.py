@@ -0,0 +1,138 @@
+"""
+Requêtes conditionnelles (ETag / Last-Modified) pour les pages du catalogue.
+
+Chaque page fournit une fonction de validation qui renvoie, en une requête
+SQL, les horodatages et identifiants dont dépend son contenu. Le validateur
+est complété par l'état propre au visiteur (utilisateur, panier, cookie
+CSRF) : un 304 n'est jamais renvoyé avec la page d'un autre utilisateur.
+"""
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
+
+from .models import (
+    Category, Product, BookCollection, PersonalDevelopmentSection, ProductRecommendation, PurchaseEntitlement,
+)
+
+
+def _visitor_state(request):
+    user = request.user
+    return [
+        user.pk if user.is_authenticated else None,
+        sorted(request.session.get('cart', {}).items()),
+        # Sans cookie (robots), la valeur reste None et le 304 reste possible
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+    ]
+
+
+def _resolve(request, parts):
+    """(etag, last_modified) à partir des éléments de la page, ou None pour un rendu normal"""
+    # Messages flash en attente : la page doit être rendue pour les afficher
+    if parts is None or len(get_messages(request)):
+        return None
+    visitor = _visitor_state(request)
+    etag = hashlib.sha1(repr([parts, visitor]).encode()).hexdigest()
+    # Last-Modified seul ne distingue pas les visiteurs : réservé aux anonymes sans panier.
+    # Il ne reflète que les horodatages : omis dès qu'un élément (identifiant, nombre de
+    # livres, possession) n'en est pas un, sinon un client n'envoyant qu'If-Modified-Since
+    # recevrait un 304 périmé après une suppression. L'ETag couvre alors tous les éléments.
+    last_modified = None
+    if visitor[0] is None and not visitor[1] and all(value is None or isinstance(value, datetime) for value in parts):
+        last_modified = max((value for value in parts if value is not None), default=None)
+    return etag, last_modified
+
+
+def catalog_condition(validator):
+    """
+    Décorateur de vue : 304 sans exécuter la vue ni rendre le template quand
+    le validateur `validator(request, *args, **kwargs)` n'a pas changé.
+    """
+    def state(request, *args, **kwargs):
+        if not hasattr(request, '_catalog_validator'):
+            request._catalog_validator = _resolve(request, validator(request, *args, **kwargs))
+        return request._catalog_validator
+
+    def etag_func(request, *args, **kwargs):
+        resolved = state(request, *args, **kwargs)
+        return resolved and resolved[0]
+
+    def last_modified_func(request, *args, **kwargs):
+        resolved = state(request, *args, **kwargs)
+        return resolved and resolved[1]
+
+    def decorator(view):
+        conditional = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view)
+        if iscoroutinefunction(view):
+            # condition() appelle les validateurs de façon synchrone : pour une vue async,
+            # le validateur (requêtes SQL, session) est résolu avant, dans un thread
+            conditional_view = conditional
+
+            @wraps(view)
+            async def conditional(request, *args, **kwargs):
+                await sync_to_async(state)(request, *args, **kwargs)
+                return await conditional_view(request, *args, **kwargs)
+        # Revalidation systématique, jamais dans un cache partagé
+        return vary_on_cookie(cache_control(private=True, no_cache=True)(conditional))
+    return decorator
+
+
+def _latest(queryset, field):
+    """Valeur la plus récente de `field` dans `queryset`, en sous-requête scalaire"""
+    return Subquery(queryset.order_by(f'-{field}').values(field)[:1])
+
+
+def product_detail_validator(request, slug):
+    # Relations multiples en sous-requêtes scalaires : des jointures dans un même
+    # aggregate() multiplieraient recommandations × livres de la collection × livres de la section
+    row = Product.objects.filter(slug=slug, is_active=True).annotate(
+        # Reconstruire les recommandations crée de nouvelles lignes : le dernier pk change
+        recommendation_max_pk=_latest(ProductRecommendation.objects.filter(product=OuterRef('pk')), 'pk'),
+        similar_updated=_latest(
+            ProductRecommendation.objects.filter(product=OuterRef('pk')), 'recommended__updated_at'
+        ),
+        collection_books_updated=_latest(Product.objects.filter(collection=OuterRef('collection')), 'updated_at'),
+        section_books_updated=_latest(
+            Product.objects.filter(personal_development_section=OuterRef('personal_development_section')),
+            'updated_at',
+        ),
+    ).values_list(
+        'pk', 'updated_at', 'category__updated_at', 'recommendation_max_pk', 'similar_updated',
+        'collection__updated_at', 'collection_books_updated',
+        'personal_development_section__updated_at', 'section_books_updated',
+    ).first()
+    if row is None:
+        return None
+    return [*row, PurchaseEntitlement.user_owns(request.user, row[0])]
+
+
+def category_detail_validator(request, slug):
+    row = Category.objects.filter(slug=slug, is_active=True).aggregate(
+        id=Max('pk'), updated=Max('updated_at'),
+        products_updated=Max('products__updated_at'), product_count=Count('products'),
+    )
+    return list(row.values()) if row['id'] is not None else None
+
+
+def book_collection_validator(request, slug):
+    row = BookCollection.objects.filter(slug=slug, is_active=True).aggregate(
+        id=Max('pk'), updated=Max('updated_at'),
+        books_updated=Max('books__updated_at'), book_count=Count('books'),
+    )
+    return list(row.values()) if row['id'] is not None else None
+
+
+def personal_development_section_validator(request, slug):
+    row = PersonalDevelopmentSection.objects.filter(slug=slug, is_active=True).aggregate(
+        id=Max('pk'), updated=Max('updated_at'),
+        books_updated=Max('books__updated_at'), book_count=Count('books'),
+    )
+    return list(row.values()) if row['id'] is not None else None
@@ -1,4 +1,6 @@
 from django import forms
+from django.contrib.auth.forms import UserChangeForm
+from .accounts import email_in_use
 from .models import Review
 
 
@@ -28,3 +30,14 @@ class ReviewForm(forms.ModelForm):
         }
 
 
+
+
+class UniqueEmailUserChangeForm(UserChangeForm):
+    """Formulaire utilisateur de l'admin : email unique sans tenir compte de la casse"""
+
+    def clean_email(self):
+        email = self.cleaned_data.get('email')
+        # Même règle que l'index unique lower(email) : une erreur de formulaire plutôt qu'une IntegrityError
+        if email and email_in_use(email, exclude=self.instance):
+            raise forms.ValidationError("Un autre compte utilise déjà cette adresse email.")
+        return email
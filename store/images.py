@@ -0,0 +1,152 @@
+"""
+Déclinaisons redimensionnées des images téléversées (Pillow).
+
+Chaque image `dossier/nom.ext` reçoit, à côté de l'original, une variante
+WebP et une variante JPEG par taille : `dossier/nom.<taille>.webp|jpg`.
+Elles sont produites après l'enregistrement du modèle dans un pool de
+threads (Pillow libère le GIL pendant le décodage, le redimensionnement et
+l'encodage) ; les templates retombent sur l'original tant qu'elles
+n'existent pas.
+"""
+import io
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Boîtes maximales (largeur, hauteur) ; le ratio de l'original est conservé
+VARIANT_SIZES = {
+    'thumb': (160, 160),
+    'card': (640, 400),
+    'detail': (1280, 800),
+}
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# Variante servie aux écrans haute densité (2x)
+RETINA_SIZES = {'thumb': 'card', 'card': 'detail'}
+
+VARIANT_NAME_RE = re.compile(r'\.(%s)\.(%s)$' % ('|'.join(VARIANT_SIZES), '|'.join(VARIANT_FORMATS)))
+
+_READY_CACHE_PREFIX = 'image-variants:'
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_name(name, size, fmt):
+    root, _ext = os.path.splitext(name)
+    return f'{root}.{size}.{fmt}'
+
+
+def variant_names(name):
+    return [variant_name(name, size, fmt) for size in VARIANT_SIZES for fmt in VARIANT_FORMATS]
+
+
+def is_variant(name):
+    return bool(VARIANT_NAME_RE.search(name))
+
+
+def _encode(image, fmt):
+    pil_format, options = VARIANT_FORMATS[fmt]
+    if fmt == 'jpg' and image.mode != 'RGB':
+        # JPEG sans transparence : aplati sur fond blanc
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def generate_variants(name, storage=default_storage, force=False):
+    """
+    Crée les variantes manquantes de l'image `name`.
+    Retourne (taille de l'original, {variante écrite: taille}), en octets.
+    """
+    targets = variant_names(name)
+    if not force and all(storage.exists(target) for target in targets):
+        return 0, {}
+    with storage.open(name, 'rb') as original:
+        data = original.read()
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+        written = {}
+        for size, box in VARIANT_SIZES.items():
+            resized = image.copy()
+            resized.thumbnail(box, Image.LANCZOS)
+            for fmt in VARIANT_FORMATS:
+                target = variant_name(name, size, fmt)
+                content = _encode(resized, fmt)
+                # FileSystemStorage renommerait le fichier au lieu de l'écraser
+                if storage.exists(target):
+                    storage.delete(target)
+                storage.save(target, ContentFile(content))
+                written[target] = len(content)
+    cache.delete(_READY_CACHE_PREFIX + name)
+    return len(data), written
+
+
+def variants_ready(name, storage=default_storage):
+    """Les variantes existent-elles ? (mis en cache : une vérification de stockage par image)"""
+    key = _READY_CACHE_PREFIX + name
+    ready = cache.get(key)
+    if ready is None:
+        ready = storage.exists(variant_names(name)[-1])
+        # Absence mise en cache brièvement : la génération est asynchrone
+        cache.set(key, ready, 24 * 3600 if ready else 60)
+    return ready
+
+
+def forget_variants_ready(names):
+    """Oublie l'état en cache des variantes (après une génération hors de ce processus)"""
+    cache.delete_many([_READY_CACHE_PREFIX + name for name in names])
+
+
+def variant_url(field, size, fmt='jpg'):
+    """URL de la variante si elle existe, sinon de l'original"""
+    if not field:
+        return ''
+    if variants_ready(field.name, field.storage):
+        return field.storage.url(variant_name(field.name, size, fmt))
+    return field.url
+
+
+def _generate_safely(name, storage):
+    try:
+        generate_variants(name, storage)
+    except FileNotFoundError:
+        logger.warning("Image introuvable, variantes non générées : %s", name)
+    except Exception:
+        logger.exception("Échec de génération des variantes de %s", name)
+
+
+def schedule_variants(field):
+    """Génère les variantes après la validation de la transaction, hors du thread de la requête"""
+    if not field or is_variant(field.name):
+        return
+    name, storage = field.name, field.storage
+    workers = getattr(settings, 'IMAGE_VARIANT_WORKERS', 2)
+
+    def submit():
+        global _executor
+        if workers <= 0:
+            _generate_safely(name, storage)
+            return
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-variants')
+        _executor.submit(_generate_safely, name, storage)
+
+    transaction.on_commit(submit)
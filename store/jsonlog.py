@@ -0,0 +1,113 @@
+"""
+Journalisation non bloquante au format JSON (chemin de paiement).
+
+QueueFileHandler sérialise l'enregistrement dans le thread appelant puis le
+dépose dans une file bornée ; un thread dédié (QueueListener) l'écrit dans le
+fichier. Si le disque ralentit et que la file est pleine, l'enregistrement
+est abandonné et compté au lieu de bloquer le paiement ou le webhook.
+
+Plusieurs processus (workers gunicorn / uvicorn) écrivent dans le même
+fichier : chacun l'ouvre en ajout seul, sans jamais le renommer. La rotation
+est confiée à logrotate, par taille ; WatchedFileHandler rouvre le fichier
+dès qu'il a été déplacé (donc sans copytruncate, qui le tronquerait sur
+place). Une rotation faite par chaque processus perdrait des lignes.
+logrotate n'évalue `size` qu'à chaque exécution : le lancer toutes les heures.
+
+    /srv/novalearn/logs/payments.log {
+        size 50M
+        rotate 20
+        compress
+        delaycompress
+        missingok
+        notifempty
+    }
+
+    logger.info("Paiement initié", extra={'order_number': ..., 'latency_ms': ...})
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import weakref
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
+
+# Champs repris tels quels de `extra` dans l'objet JSON
+STRUCTURED_FIELDS = ('event', 'order_number', 'transaction_id', 'status', 'latency_ms', 'view')
+
+_handlers = weakref.WeakSet()
+
+
+class JsonFormatter(logging.Formatter):
+
+    def format(self, record):
+        payload = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                payload[field] = value
+        if record.exc_info:
+            payload['exception'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class QueueFileHandler(QueueHandler):
+    """Handler à file bornée écrivant en JSON dans un fichier partagé (voir le docstring du module)"""
+
+    def __init__(self, filename, queue_size=10000):
+        super().__init__(queue.Queue(queue_size))
+        # prepare() sérialise en JSON dans le thread appelant : le listener n'écrit que la ligne
+        self.setFormatter(JsonFormatter())
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        # Ajout seul (O_APPEND) : sûr entre processus ; rouvert après une rotation externe
+        self.target = WatchedFileHandler(filename, encoding='utf-8', delay=True)
+        self.target.setFormatter(logging.Formatter('%(message)s'))
+        self._start_listener()
+        # Fin de processus : les enregistrements en file sont écrits avant de quitter
+        atexit.register(self.stop)
+        # Le thread d'écriture ne survit pas à un fork (gunicorn --preload, pool de processus)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._restart_after_fork)
+        _handlers.add(self)
+
+    def _start_listener(self):
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+        self._running = True
+
+    def _restart_after_fork(self):
+        self.queue = queue.Queue(self.queue.maxsize)
+        self.dropped = 0
+        self._start_listener()
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def stop(self):
+        if self._running:
+            self._running = False
+            self.listener.stop()
+        self.target.close()
+
+    def close(self):
+        self.stop()
+        super().close()
+
+
+def dropped_counts():
+    """Enregistrements abandonnés (file pleine) par fichier de journal"""
+    return {handler.target.baseFilename: handler.dropped for handler in list(_handlers)}
@@ -0,0 +1,115 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from store.accounts import find_user_by_email, registration_conflicts
+from store.benchmark import summarize, save_results, compare_results
+from .generate_benchmark_data import PREFIX
+
+
+USER_PREFIX = f'{PREFIX}-login'
+
+
+def _legacy_find(email):
+    return User.objects.filter(email__iexact=email).first()
+
+
+def _legacy_conflicts(username, email):
+    return (
+        User.objects.filter(username__iexact=username).exists(),
+        User.objects.filter(email__iexact=email).exists(),
+    )
+
+
+class Command(BaseCommand):
+    help = "Recherche de compte par email (connexion, inscription) : iexact contre l'index lower(email)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000_000)
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--keep', action='store_true', help="Conserver les comptes générés")
+        parser.add_argument('--output', help="Fichier de résultats JSON (par défaut benchmarks/results/)")
+        parser.add_argument('--compare', help="Fichier de résultats antérieur à comparer")
+        parser.add_argument('--no-save', action='store_true')
+
+    def handle(self, *args, **options):
+        self.ensure_users(options['users'], options['batch_size'])
+        rng = random.Random(options['seed'])
+        n = options['users']
+        # Casse mélangée comme à la saisie ; un tiers d'adresses inconnues (échec de connexion)
+        emails = [
+            f'{USER_PREFIX}-{rng.randrange(n * 3 // 2)}@Example.COM'.upper() if rng.random() < 0.5
+            else f'{USER_PREFIX}-{rng.randrange(n * 3 // 2)}@example.com'
+            for _ in range(options['iterations'])
+        ]
+        usernames = [f'{USER_PREFIX}-{rng.randrange(n * 3 // 2)}'.upper() for _ in range(options['iterations'])]
+
+        cases = {
+            'login_iexact': lambda i: _legacy_find(emails[i]),
+            'login_lower_index': lambda i: find_user_by_email(emails[i]),
+            'register_iexact': lambda i: _legacy_conflicts(usernames[i], emails[i]),
+            'register_lower_index': lambda i: registration_conflicts(usernames[i], emails[i]),
+        }
+        results = {}
+        for name, case in cases.items():
+            case(0)
+            samples = []
+            start = time.perf_counter()
+            for i in range(options['iterations']):
+                with CaptureQueriesContext(connection) as queries:
+                    began = time.perf_counter()
+                    case(i)
+                    samples.append((time.perf_counter() - began, len(queries), 200))
+            results[name] = summarize(samples, time.perf_counter() - start)
+            results[name]['plan'] = self.query_plan(queries.captured_queries[-1]['sql'])
+            self.stdout.write(
+                f"{name:<22} p50 {results[name]['p50_ms']:>9} ms  p95 {results[name]['p95_ms']:>9} ms  "
+                f"SQL {results[name]['avg_queries']:>4}  plan : {results[name]['plan']}"
+            )
+
+        if not options['keep']:
+            User.objects.filter(username__startswith=f'{USER_PREFIX}-').delete()
+
+        if not options['no_save']:
+            path = save_results('login', results, options['output'])
+            self.stdout.write(f"\nRésultats enregistrés dans {path}")
+
+        if options['compare']:
+            self.stdout.write("\nComparaison avec le résultat précédent :")
+            for name, metrics in compare_results(options['compare'], results).items():
+                for metric in ('p50_ms', 'p95_ms'):
+                    if metric in metrics:
+                        old, new, delta = metrics[metric]
+                        self.stdout.write(f"  {name:<22} {metric:<8} {old:>10} → {new:>10} ({delta:+}%)")
+
+    def ensure_users(self, count, batch_size):
+        """Complète la table jusqu'à `count` comptes générés (mot de passe inutilisable : pas de hachage)"""
+        existing = User.objects.filter(username__startswith=f'{USER_PREFIX}-').count()
+        if existing >= count:
+            return
+        self.stdout.write(f"Création de {count - existing} comptes…")
+        for start in range(existing, count, batch_size):
+            with transaction.atomic():
+                User.objects.bulk_create([
+                    User(username=f'{USER_PREFIX}-{i}', email=f'{USER_PREFIX}-{i}@example.com', password='!')
+                    for i in range(start, min(start + batch_size, count))
+                ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def query_plan(self, sql):
+        if connection.vendor == 'sqlite':
+            prefix, column = 'EXPLAIN QUERY PLAN ', -1
+        elif connection.vendor == 'postgresql':
+            prefix, column = 'EXPLAIN ', 0
+        else:
+            return ''
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql)
+            return ' | '.join(str(row[column]).strip() for row in cursor.fetchall())
@@ -0,0 +1,75 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from store.benchmark import summarize, save_results, compare_results
+from store.ratelimit import consume, rate_limit
+
+
+def _view(request):
+    return HttpResponse('ok')
+
+
+class Command(BaseCommand):
+    help = "Coût par requête du limiteur de débit (cache configuré : mémoire locale ou Redis)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000)
+        parser.add_argument('--output', help="Fichier de résultats JSON (par défaut benchmarks/results/)")
+        parser.add_argument('--compare', help="Fichier de résultats antérieur à comparer")
+        parser.add_argument('--no-save', action='store_true')
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        limited = rate_limit('bench')(_view)
+        n = options['iterations']
+
+        def request(index):
+            req = factory.get('/bench/', REMOTE_ADDR=f'10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}')
+            req.user = AnonymousUser()
+            return req
+
+        cases = {
+            # Vue nue : référence pour isoler le coût du décorateur
+            'view_baseline': lambda i: _view(request(i)),
+            'view_limited_allowed': lambda i: limited(request(i)),
+            'view_limited_denied': lambda i: limited(request(0)),
+            'consume_allowed': lambda i: consume('bench', f'ip{i}'),
+            'consume_denied': lambda i: consume('bench', 'hot'),
+        }
+        results = {}
+        with override_settings(RATE_LIMITS={'bench': ('1/h', 1)}, RATE_LIMIT_ENABLED=True):
+            for name, case in cases.items():
+                cache.clear()
+                samples = []
+                start = time.perf_counter()
+                for i in range(n):
+                    began = time.perf_counter()
+                    case(i)
+                    samples.append((time.perf_counter() - began, None, 200))
+                results[name] = summarize(samples, time.perf_counter() - start)
+                results[name]['avg_us'] = round(sum(d for d, _q, _s in samples) / n * 1e6, 2)
+                self.stdout.write(
+                    f"{name:<22} moyenne {results[name]['avg_us']:>8} µs  "
+                    f"p50 {results[name]['p50_ms'] * 1000:>8.1f} µs  p95 {results[name]['p95_ms'] * 1000:>8.1f} µs"
+                )
+        cache.clear()
+
+        overhead = results['view_limited_allowed']['avg_us'] - results['view_baseline']['avg_us']
+        self.stdout.write(self.style.SUCCESS(f"Surcoût du limiteur par requête acceptée : {overhead:.1f} µs"))
+
+        if not options['no_save']:
+            path = save_results('ratelimit', results, options['output'])
+            self.stdout.write(f"\nRésultats enregistrés dans {path}")
+
+        if options['compare']:
+            self.stdout.write("\nComparaison avec le résultat précédent :")
+            for name, metrics in compare_results(options['compare'], results).items():
+                if 'avg_us' in metrics:
+                    old, new, delta = metrics['avg_us']
+                    self.stdout.write(f"  {name:<22} avg_us {old:>10} → {new:>10} ({delta:+}%)")
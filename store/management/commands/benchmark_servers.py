@@ -0,0 +1,189 @@
+import asyncio
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from store.benchmark import summarize, save_results, compare_results
+from store.models import Product, VideoSequence
+from .generate_benchmark_data import PREFIX, WORDS
+
+
+# Vues async sous ASGI (store/async_views.py), vues synchrones sous WSGI
+PAGES = {
+    'home': lambda state, rng: '/',
+    'product_list': lambda state, rng: f'/products/?search={quote(rng.choice(WORDS))}',
+    'product_detail': lambda state, rng: f'/product/{rng.choice(state["products"])}/',
+    'product_search': lambda state, rng: f'/api/product-search/?q={quote(rng.choice(WORDS))}',
+    'sequence_preview': lambda state, rng: f'/api/sequence/{rng.choice(state["sequences"])}/preview/',
+}
+
+SERVERS = {
+    'wsgi': lambda options, port: [
+        sys.executable, '-m', 'gunicorn', 'novalearnweb.wsgi:application',
+        '--workers', str(options['workers']), '--threads', str(options['threads']),
+        '--bind', f'127.0.0.1:{port}', '--log-level', 'warning',
+    ],
+    'asgi': lambda options, port: [
+        sys.executable, '-m', 'uvicorn', 'novalearnweb.asgi:application',
+        '--workers', str(options['workers']), '--host', '127.0.0.1', '--port', str(port),
+        '--log-level', 'warning', '--no-access-log',
+    ],
+}
+REQUIRED_MODULES = {'wsgi': 'gunicorn', 'asgi': 'uvicorn'}
+
+
+async def fetch(port, path, latency, timeout):
+    """
+    Requête HTTP envoyée par un client lent : l'en-tête arrive en deux temps,
+    séparés de `latency` secondes, comme sur un réseau mobile.
+    Retourne (durée, None, statut) ; 599 pour un échec de connexion ou un délai dépassé.
+    """
+    start = time.perf_counter()
+    try:
+        async with asyncio.timeout(timeout):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            try:
+                writer.write(f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n'.encode())
+                await writer.drain()
+                await asyncio.sleep(latency)
+                writer.write(b'Connection: close\r\n\r\n')
+                await writer.drain()
+                status_line = await reader.readline()
+                await reader.read()
+            finally:
+                writer.close()
+        status = int(status_line.split()[1])
+    except (OSError, TimeoutError, IndexError, ValueError):
+        status = 599
+    return time.perf_counter() - start, None, status
+
+
+async def run_load(port, paths, options):
+    queue = asyncio.Queue()
+    for path in paths:
+        queue.put_nowait(path)
+    samples = []
+
+    async def client():
+        while not queue.empty():
+            path = queue.get_nowait()
+            samples.append(await fetch(port, path, options['latency_ms'] / 1000, options['timeout']))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(options['concurrency'])))
+    return samples, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare gunicorn (WSGI) et uvicorn (ASGI) sur les vues du catalogue, "
+        "à forte concurrence et avec des clients lents simulés"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', nargs='+', choices=list(SERVERS), default=list(SERVERS))
+        parser.add_argument('--pages', nargs='+', choices=list(PAGES), default=list(PAGES))
+        parser.add_argument('--requests', type=int, default=1000, help="Requêtes par serveur")
+        parser.add_argument('--concurrency', type=int, default=200, help="Clients simultanés")
+        parser.add_argument('--latency-ms', type=int, default=100, help="Latence simulée par client")
+        parser.add_argument('--workers', type=int, default=2, help="Processus par serveur")
+        parser.add_argument('--threads', type=int, default=1, help="Threads par worker gunicorn (WSGI)")
+        parser.add_argument('--timeout', type=float, default=30.0, help="Délai maximal par requête (s)")
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help="Fichier de résultats JSON (par défaut benchmarks/results/)")
+        parser.add_argument('--compare', help="Fichier de résultats antérieur à comparer")
+        parser.add_argument('--no-save', action='store_true')
+
+    def handle(self, *args, **options):
+        state = {
+            'products': list(Product.objects.filter(slug__startswith=f'{PREFIX}-', is_active=True)
+                             .values_list('slug', flat=True)),
+            'sequences': list(VideoSequence.objects.filter(product__slug__startswith=f'{PREFIX}-', is_active=True)
+                              .values_list('pk', flat=True)),
+        }
+        if not state['products'] or not state['sequences']:
+            raise CommandError("Données absentes : lancez d'abord `manage.py generate_benchmark_data`")
+        if '*' not in settings.ALLOWED_HOSTS and '127.0.0.1' not in settings.ALLOWED_HOSTS:
+            raise CommandError("Ajoutez 127.0.0.1 à ALLOWED_HOSTS pour lancer les serveurs de benchmark")
+
+        rng = random.Random(options['seed'])
+        paths = [PAGES[rng.choice(options['pages'])](state, rng) for _ in range(options['requests'])]
+        self.stdout.write(
+            f"{options['requests']} requêtes, {options['concurrency']} clients, "
+            f"latence simulée {options['latency_ms']} ms, {options['workers']} workers"
+        )
+
+        results = {}
+        for offset, name in enumerate(options['servers']):
+            port = options['port'] + offset
+            with self.server(name, port, options):
+                # Préchauffage : imports, connexions SQL, templates compilés
+                asyncio.run(run_load(port, paths[:options['workers'] * 10], dict(options, concurrency=options['workers'], latency_ms=0)))
+                samples, wall_time = asyncio.run(run_load(port, paths, options))
+            results[name] = summarize(samples, wall_time)
+            self.print_stats(name, results[name])
+
+        if not options['no_save']:
+            path = save_results('servers', results, options['output'])
+            self.stdout.write(f"\nRésultats enregistrés dans {path}")
+
+        if options['compare']:
+            self.stdout.write("\nComparaison avec le résultat précédent :")
+            for name, metrics in compare_results(options['compare'], results).items():
+                for key in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+                    if key in metrics:
+                        old, new, delta = metrics[key]
+                        self.stdout.write(f"  {name:<6} {key:<15} {old:>10} → {new:>10} ({delta:+}%)")
+
+    def server(self, name, port, options):
+        module = REQUIRED_MODULES[name]
+        if shutil.which(module) is None:
+            raise CommandError(f"{module} n'est pas installé (voir requirements.txt)")
+        return _Server(SERVERS[name](options, port), port)
+
+    def print_stats(self, name, stats):
+        self.stdout.write(
+            f"{name:<6} {stats['requests']:>6} req  {stats['throughput_rps']:>8} req/s  "
+            f"p50 {stats['p50_ms']:>8} ms  p95 {stats['p95_ms']:>8} ms  p99 {stats['p99_ms']:>8} ms  "
+            f"erreurs {stats['errors']}"
+        )
+
+
+class _Server:
+    """Serveur lancé dans un sous-processus le temps du bloc `with`"""
+
+    def __init__(self, command, port):
+        self.command = command
+        self.port = port
+
+    def __enter__(self):
+        # Toutes les requêtes viennent de 127.0.0.1 : pas de limitation de débit
+        env = dict(os.environ, RATE_LIMIT_ENABLED='False')
+        self.process = subprocess.Popen(self.command, cwd=settings.BASE_DIR, env=env)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise CommandError(f"Le serveur s'est arrêté au démarrage : {' '.join(self.command)}")
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=1).close()
+                return self
+            except OSError:
+                time.sleep(0.2)
+        self.__exit__()
+        raise CommandError(f"Le serveur n'écoute pas sur le port {self.port}")
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
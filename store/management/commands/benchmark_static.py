@@ -0,0 +1,105 @@
+import json
+import random
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, RequestFactory
+from django.test.utils import override_settings
+from django.views.static import serve
+
+from store.benchmark import summarize, save_results, compare_results
+
+
+ENCODINGS = {'identity': '', 'gzip': 'gzip', 'br': 'br, gzip'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Débit des fichiers statiques : WhiteNoise (noms hachés, variantes pré-compressées) "
+        "comparé à django.views.static.serve. À lancer après collectstatic"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=['whitenoise', 'django'], default=['whitenoise', 'django'])
+        parser.add_argument('--encodings', nargs='+', choices=list(ENCODINGS), default=list(ENCODINGS))
+        parser.add_argument('--iterations', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help="Fichier de résultats JSON (par défaut benchmarks/results/)")
+        parser.add_argument('--compare', help="Fichier de résultats antérieur à comparer")
+        parser.add_argument('--no-save', action='store_true')
+
+    def handle(self, *args, **options):
+        manifest = Path(settings.STATIC_ROOT) / staticfiles_storage.manifest_name
+        if not manifest.exists():
+            raise CommandError("Manifeste absent : lancez d'abord `manage.py collectstatic`")
+        # Fichiers du projet (hors admin), sous leur nom haché
+        names = sorted(
+            hashed for original, hashed in json.loads(manifest.read_text())['paths'].items()
+            if not original.startswith('admin/')
+        )
+        rng = random.Random(options['seed'])
+        sample = [rng.choice(names) for _ in range(options['iterations'])]
+        self.stdout.write(f"{len(names)} fichiers statiques, {options['iterations']} requêtes par mesure")
+
+        results = {}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            fetch = {'whitenoise': self.whitenoise_fetcher(), 'django': self.django_fetcher()}
+            for mode in options['modes']:
+                for encoding in options['encodings']:
+                    key = f'{mode}:{encoding}'
+                    results[key] = self.run(fetch[mode], sample, ENCODINGS[encoding])
+                    self.print_stats(key, results[key])
+
+        if not options['no_save']:
+            path = save_results('static', results, options['output'])
+            self.stdout.write(f"\nRésultats enregistrés dans {path}")
+
+        if options['compare']:
+            self.stdout.write("\nComparaison avec le résultat précédent :")
+            for key, metrics in compare_results(options['compare'], results).items():
+                for metric in ('throughput_rps', 'p50_ms', 'p95_ms', 'avg_bytes'):
+                    if metric in metrics:
+                        old, new, delta = metrics[metric]
+                        self.stdout.write(f"  {key:<20} {metric:<15} {old:>10} → {new:>10} ({delta:+}%)")
+
+    def whitenoise_fetcher(self):
+        client = Client()
+
+        def fetch(name, accept_encoding):
+            return client.get(settings.STATIC_URL + name, headers={'accept-encoding': accept_encoding})
+        return fetch
+
+    def django_fetcher(self):
+        # Vue de développement (urls.py en DEBUG), appelée directement : sans middleware
+        factory = RequestFactory()
+
+        def fetch(name, accept_encoding):
+            request = factory.get(settings.STATIC_URL + name, headers={'accept-encoding': accept_encoding})
+            return serve(request, name, document_root=settings.STATIC_ROOT)
+        return fetch
+
+    def run(self, fetch, names, accept_encoding):
+        samples, sizes, immutable = [], [], 0
+        start = time.perf_counter()
+        for name in names:
+            began = time.perf_counter()
+            response = fetch(name, accept_encoding)
+            size = sum(len(chunk) for chunk in response.streaming_content) if response.streaming else len(response.content)
+            response.close()
+            samples.append((time.perf_counter() - began, None, response.status_code))
+            sizes.append(size)
+            immutable += 'immutable' in response.get('Cache-Control', '')
+        stats = summarize(samples, time.perf_counter() - start)
+        stats['avg_bytes'] = round(sum(sizes) / len(sizes)) if sizes else 0
+        stats['immutable_ratio'] = round(immutable / len(names), 2) if names else 0.0
+        return stats
+
+    def print_stats(self, key, stats):
+        self.stdout.write(
+            f"{key:<20} {stats['throughput_rps']:>9} req/s  p50 {stats['p50_ms']:>7} ms  "
+            f"p95 {stats['p95_ms']:>7} ms  {stats['avg_bytes']:>8} o/req  "
+            f"immutable {stats['immutable_ratio']:>4}  erreurs {stats['errors']}"
+        )
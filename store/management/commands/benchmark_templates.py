@@ -0,0 +1,92 @@
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+
+from store.benchmark import summarize, save_results, compare_results
+from store.metrics import RequestMetrics, install_template_timer, wrap_queries
+from store.models import Category, Product
+from .generate_benchmark_data import PREFIX
+
+
+PAGES = {
+    'home': lambda state, rng: '/',
+    'product_list': lambda state, rng: '/products/',
+    'category_detail': lambda state, rng: f'/category/{rng.choice(state["categories"])}/',
+    'product_detail': lambda state, rng: f'/product/{rng.choice(state["products"])}/',
+}
+
+
+class Command(BaseCommand):
+    help = "Temps de rendu des templates par page, cache de fragments froid puis chaud"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', nargs='+', choices=list(PAGES), default=list(PAGES))
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help="Fichier de résultats JSON (par défaut benchmarks/results/)")
+        parser.add_argument('--compare', help="Fichier de résultats antérieur à comparer")
+        parser.add_argument('--no-save', action='store_true')
+
+    def handle(self, *args, **options):
+        state = {
+            'categories': list(Category.objects.filter(slug__startswith=f'{PREFIX}-').values_list('slug', flat=True)),
+            'products': list(Product.objects.filter(slug__startswith=f'{PREFIX}-', is_active=True)
+                             .values_list('slug', flat=True)),
+        }
+        if not state['categories'] or not state['products']:
+            raise CommandError("Données absentes : lancez d'abord `manage.py generate_benchmark_data`")
+
+        install_template_timer()
+        results = {}
+        # Le middleware de métriques est retiré : le chronomètre de rendu est activé ici
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], QUERY_METRICS_ENABLED=False):
+            client = Client()
+            for name in options['pages']:
+                for mode in ('cold', 'warm'):
+                    key = f'{name}:{mode}'
+                    results[key] = self.run_page(client, name, mode, state, options)
+                    self.print_stats(key, results[key])
+
+        if not options['no_save']:
+            path = save_results('templates', results, options['output'])
+            self.stdout.write(f"\nRésultats enregistrés dans {path}")
+
+        if options['compare']:
+            self.stdout.write("\nComparaison avec le résultat précédent :")
+            for key, metrics in compare_results(options['compare'], results).items():
+                for metric in ('p50_ms', 'p95_ms', 'avg_queries'):
+                    if metric in metrics:
+                        old, new, delta = metrics[metric]
+                        self.stdout.write(f"  {key:<22} {metric:<12} {old:>10} → {new:>10} ({delta:+}%)")
+
+    def run_page(self, client, name, mode, state, options):
+        """Mesure le rendu ; « cold » vide le cache avant chaque requête, « warm » rejoue les mêmes URLs"""
+        rng = random.Random(options['seed'])
+        paths = [PAGES[name](state, rng) for _ in range(options['iterations'])]
+        if mode == 'warm':
+            for path in set(paths):
+                client.get(path)
+
+        samples = []
+        for path in paths:
+            if mode == 'cold':
+                cache.clear()
+            metrics = RequestMetrics()
+            token = metrics.activate()
+            try:
+                with wrap_queries(metrics):
+                    response = client.get(path)
+            finally:
+                RequestMetrics.deactivate(token)
+            samples.append((metrics.template_time, metrics.query_count, response.status_code))
+        return summarize(samples, sum(duration for duration, _queries, _status in samples))
+
+    def print_stats(self, key, stats):
+        self.stdout.write(
+            f"{key:<22} rendu p50 {stats['p50_ms']:>8} ms  p95 {stats['p95_ms']:>8} ms  "
+            f"max {stats['max_ms']:>8} ms  SQL {stats['avg_queries']:>6}  erreurs {stats['errors']}"
+        )
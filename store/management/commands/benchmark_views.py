@@ -0,0 +1,244 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from store.benchmark import InProcessClient, HttpClient, summarize, save_results, compare_results
+from store.models import Product, Order, Payment, Download, CinetPayTransaction
+from .generate_benchmark_data import PREFIX, WORDS, MEDIA_FILES
+
+
+SORTS = ['newest', 'price_low', 'price_high', 'popular']
+
+
+def scenario_home(client, state, rng):
+    return [client.request('GET', '/')]
+
+
+def scenario_product_list(client, state, rng):
+    data = {'search': rng.choice(WORDS), 'sort': rng.choice(SORTS)}
+    if rng.random() < 0.5:
+        data['page'] = rng.randint(1, 3)
+    return [client.request('GET', '/products/', data)]
+
+
+def scenario_product_detail(client, state, rng):
+    return [client.request('GET', f'/product/{rng.choice(state["slugs"])}/')]
+
+
+def scenario_product_search(client, state, rng):
+    # Vue très légère : l'ouverture de la connexion SQL y domine la latence
+    return [client.request('GET', '/api/product-search/', {'q': rng.choice(WORDS)})]
+
+
+def scenario_checkout(client, state, rng):
+    """Panier → commande → paiement simulé → webhook CinetPay"""
+    product_id = rng.choice(state['paid_ids'])
+    samples = [
+        client.request('POST', f'/add-to-cart/{product_id}/', {'quantity': 1}),
+        client.request('GET', '/cart/'),
+        client.request('POST', '/checkout/', {
+            'customer_name': 'Client Benchmark',
+            'customer_email': state['user'].email,
+            'customer_phone': '0700000000',
+        }),
+    ]
+    order = Order.objects.filter(user=state['user']).order_by('-id').first()
+    # Équivalent de CinetPayService.initiate_payment sans appel à l'API externe
+    payment = Payment.objects.create(
+        payment_id=f'PAY_{order.order_number}_{time.time_ns()}', order=order, payment_method='cinetpay',
+        amount_fcfa=order.total_fcfa, amount_eur=order.total_eur,
+    )
+    transaction = CinetPayTransaction.objects.create(
+        order=order, payment=payment, amount_fcfa=order.total_fcfa, amount_eur=order.total_eur,
+        customer_name=order.customer_name, customer_email=order.customer_email,
+        customer_phone='+2250700000000', status='PENDING', initiated_at=timezone.now(),
+    )
+    samples.append(client.request(
+        'POST', '/api/cinetpay/webhook/',
+        json.dumps({'transaction_id': transaction.transaction_id, 'status': 'SUCCESS'}),
+        content_type='application/json',
+    ))
+    return samples
+
+
+def scenario_downloads(client, state, rng):
+    return [
+        client.request('GET', '/account/downloads/'),
+        client.request('GET', f'/download/{state["download_token"]}/'),
+    ]
+
+
+def scenario_cart(client, state, rng):
+    return [client.request('GET', '/cart/')]
+
+
+def scenario_update_cart(client, state, rng):
+    # Une fois sur deux la quantité ne change pas : aucune écriture de session attendue
+    product_id = rng.choice(state['cart_ids'])
+    return [client.request(
+        'POST', '/api/update-cart/',
+        json.dumps({'product_id': product_id, 'quantity': rng.choice([1, 2])}),
+        content_type='application/json',
+    )]
+
+
+SCENARIOS = {
+    'home': scenario_home,
+    'product_list': scenario_product_list,
+    'product_detail': scenario_product_detail,
+    'product_search': scenario_product_search,
+    'checkout': scenario_checkout,
+    'downloads': scenario_downloads,
+    'cart': scenario_cart,
+    'update_cart': scenario_update_cart,
+}
+
+AUTHENTICATED = {'checkout', 'downloads'}
+
+# Scénarios anonymes partant d'un panier de quelques articles
+PREFILLED_CART = {'cart', 'update_cart'}
+
+
+class Command(BaseCommand):
+    help = "Benchmark des vues de la boutique (débit, latences p50/p95/p99, requêtes SQL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+        parser.add_argument('--iterations', type=int, default=50, help="Itérations par scénario et par worker")
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--base-url', help="Serveur déjà lancé (ex. http://127.0.0.1:8000) ; sinon client en processus")
+        parser.add_argument('--output', help="Fichier de résultats JSON (par défaut benchmarks/results/)")
+        parser.add_argument('--compare', help="Fichier de résultats antérieur à comparer")
+        parser.add_argument('--no-save', action='store_true')
+        parser.add_argument(
+            '--session-strategy', choices=list(settings.SESSION_ENGINES),
+            help="Stratégie de session à mesurer (client en processus ; pour --base-url, configurer le serveur)",
+        )
+        parser.add_argument(
+            '--conn-max-age', type=int,
+            help="CONN_MAX_AGE à mesurer (0 : une connexion par requête ; client en processus). "
+                 "Le pool psycopg se mesure en lançant la commande avec DB_POOL=True",
+        )
+
+    def handle(self, *args, **options):
+        products = list(Product.objects.filter(slug__startswith=f'{PREFIX}-', is_active=True)
+                        .values('id', 'slug', 'pricing_type'))
+        users = list(User.objects.filter(username__startswith=f'{PREFIX}-').order_by('id')[:options['concurrency']])
+        if not products or len(users) < options['concurrency']:
+            raise CommandError("Données absentes : lancez d'abord `manage.py generate_benchmark_data`")
+
+        shared = {
+            'slugs': [p['slug'] for p in products],
+            'paid_ids': [p['id'] for p in products if p['pricing_type'] == 'paid'],
+        }
+        download_product = Product.objects.filter(
+            slug__startswith=f'{PREFIX}-', video_sequences__isnull=True,
+            collection__isnull=True, personal_development_section__isnull=True,
+        ).first()
+
+        results = {}
+        overrides = {
+            'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver'],  # hôte du client de test
+            'RATE_LIMIT_ENABLED': False,  # toutes les requêtes viennent du même client
+        }
+        if options['session_strategy']:
+            overrides['SESSION_ENGINE'] = settings.SESSION_ENGINES[options['session_strategy']]
+        self.stdout.write(f"Sessions : {overrides.get('SESSION_ENGINE', settings.SESSION_ENGINE)}")
+        # Les connexions de chaque thread sont créées à partir de ce dictionnaire
+        db_settings = connections.settings['default']
+        initial_max_age = db_settings['CONN_MAX_AGE']
+        if options['conn_max_age'] is not None:
+            db_settings['CONN_MAX_AGE'] = options['conn_max_age']
+        pool = 'pool' in db_settings.get('OPTIONS', {})
+        self.stdout.write(f"Connexions : CONN_MAX_AGE={db_settings['CONN_MAX_AGE']}, pool={'oui' if pool else 'non'}")
+        self.lock = threading.Lock()
+        connection_created.connect(self.count_connection)
+        try:
+            with override_settings(**overrides):
+                for name in options['scenarios']:
+                    self.connections_opened = 0
+                    results[name] = self.run_scenario(name, users, shared, download_product, options)
+                    results[name]['connections_opened'] = self.connections_opened
+                    self.print_stats(name, results[name])
+        finally:
+            connection_created.disconnect(self.count_connection)
+            db_settings['CONN_MAX_AGE'] = initial_max_age
+
+        if not options['no_save']:
+            path = save_results('views', results, options['output'])
+            self.stdout.write(f"\nRésultats enregistrés dans {path}")
+
+        if options['compare']:
+            self.print_comparison(compare_results(options['compare'], results))
+
+    def count_connection(self, sender, connection, **kwargs):
+        # Avec le pool psycopg, compte les emprunts au pool (sans nouvelle connexion TCP)
+        with self.lock:
+            self.connections_opened += 1
+
+    def run_scenario(self, name, users, shared, download_product, options):
+        scenario = SCENARIOS[name]
+
+        def worker(index):
+            rng = random.Random(options['seed'] + index)
+            user = users[index]
+            state = dict(shared, user=user)
+            client = HttpClient(options['base_url']) if options['base_url'] else InProcessClient()
+            if name in AUTHENTICATED:
+                client.login(user)
+            if name in PREFILLED_CART:
+                client.request('GET', '/login/')  # cookie CSRF pour les POST
+                state['cart_ids'] = rng.sample(shared['paid_ids'], 3)
+                for product_id in state['cart_ids']:
+                    client.request('POST', f'/add-to-cart/{product_id}/', {'quantity': 1})
+            if name == 'downloads':
+                download = Download.objects.create(
+                    user=user, product=download_product, download_url=f'/media/{MEDIA_FILES["product"]}',
+                    max_downloads=10 ** 6, expires_at=timezone.now() + timezone.timedelta(days=1),
+                )
+                state['download_token'] = download.download_token
+            try:
+                for _ in range(options['warmup']):
+                    scenario(client, state, rng)
+                samples = []
+                for _ in range(options['iterations']):
+                    samples.extend(
+                        (elapsed, queries, status) for status, elapsed, queries in scenario(client, state, rng)
+                    )
+                return samples
+            finally:
+                connections.close_all()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            per_worker = list(executor.map(worker, range(options['concurrency'])))
+        wall_time = time.perf_counter() - start
+        return summarize([sample for samples in per_worker for sample in samples], wall_time)
+
+    def print_stats(self, name, stats):
+        queries = stats['avg_queries'] if stats['avg_queries'] is not None else '-'
+        self.stdout.write(
+            f"{name:<16} {stats['requests']:>6} req  {stats['throughput_rps']:>8} req/s  "
+            f"p50 {stats['p50_ms']:>8} ms  p95 {stats['p95_ms']:>8} ms  p99 {stats['p99_ms']:>8} ms  "
+            f"SQL {queries:>6}  connexions {stats.get('connections_opened', '-'):>5}  erreurs {stats['errors']}"
+        )
+
+    def print_comparison(self, report):
+        self.stdout.write("\nComparaison avec le résultat précédent :")
+        for scenario, metrics in report.items():
+            for key in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'avg_queries', 'connections_opened'):
+                if key in metrics:
+                    old, new, delta = metrics[key]
+                    self.stdout.write(f"  {scenario:<16} {key:<15} {old:>10} → {new:>10} ({delta:+}%)")
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.recommendations import DEFAULT_WEIGHTS, build_recommendations
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les recommandations « produits similaires » (à lancer chaque nuit, ex. via cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=8, help="Nombre de voisins conservés par produit")
+        parser.add_argument('--co-purchase-weight', type=float, default=DEFAULT_WEIGHTS['co_purchase'])
+        parser.add_argument('--category-weight', type=float, default=DEFAULT_WEIGHTS['category'])
+        parser.add_argument('--type-weight', type=float, default=DEFAULT_WEIGHTS['product_type'])
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = build_recommendations(options['top_k'], {
+            'co_purchase': options['co_purchase_weight'],
+            'category': options['category_weight'],
+            'product_type': options['type_weight'],
+        })
+        self.stdout.write(self.style.SUCCESS(
+            f"{count} recommandations enregistrées en {time.perf_counter() - start:.1f}s"
+        ))
@@ -0,0 +1,39 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = "Compare les notes produit incrémentales avec un recalcul complet depuis les avis approuvés"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Corrige les produits en écart")
+
+    def handle(self, *args, **options):
+        checked = drifted = 0
+        products = Product.rating_totals_queryset().only('slug', 'rating', 'rating_sum', 'rating_count').order_by('pk')
+        for product in products.iterator(chunk_size=500):
+            checked += 1
+            expected_sum = product.computed_rating_sum or 0
+            expected_count = product.computed_rating_count
+            expected_rating = round(Decimal(expected_sum) / expected_count, 2) if expected_count else Decimal('0')
+            # Les moteurs arrondissent différemment la moyenne : tolérance d'un centième
+            if (
+                (product.rating_sum, product.rating_count) == (expected_sum, expected_count)
+                and abs(product.rating - expected_rating) <= Decimal('0.01')
+            ):
+                continue
+            drifted += 1
+            self.stdout.write(self.style.WARNING(
+                f"  {product.slug} : somme {product.rating_sum}/{expected_sum}, "
+                f"avis {product.rating_count}/{expected_count}, note {product.rating}/{expected_rating}"
+            ))
+            if options['fix']:
+                product.recompute_rating()
+
+        summary = f"{checked} produits vérifiés, {drifted} en écart"
+        if drifted and options['fix']:
+            summary += " (corrigés)"
+        self.stdout.write(self.style.SUCCESS(summary) if not drifted or options['fix'] else self.style.WARNING(summary))
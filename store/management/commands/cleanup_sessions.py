@@ -0,0 +1,37 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Supprime les sessions expirées : celles du moteur configuré et les lignes restées "
+        "dans la table django_session après un changement de SESSION_STRATEGY"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        expired = Session.objects.filter(expire_date__lt=timezone.now())
+        if options['dry_run']:
+            self.stdout.write(f"{expired.count()} sessions expirées en base (moteur : {settings.SESSION_ENGINE})")
+            return
+
+        # Moteurs db / cached_db : traités par lots ci-dessous. Le cache expire ses entrées
+        # lui-même et les cookies signés n'ont rien côté serveur.
+        if not settings.SESSION_ENGINE.endswith('db'):
+            import_module(settings.SESSION_ENGINE).SessionStore.clear_expired()
+
+        # Suppression par lots pour ne pas verrouiller la table longtemps
+        deleted = 0
+        while True:
+            keys = list(expired.values_list('session_key', flat=True)[:options['batch_size']])
+            if not keys:
+                break
+            deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"{deleted} sessions expirées supprimées de la base"))
@@ -0,0 +1,29 @@
+import os
+
+from django.contrib.auth.management.commands import createsuperuser
+from django.core.management.base import CommandError
+
+from store.accounts import email_in_use
+
+
+class Command(createsuperuser.Command):
+    """createsuperuser qui refuse un email déjà utilisé, casse ignorée (index unique lower(email))"""
+
+    EMAIL_TAKEN = "Un compte utilise déjà cette adresse email."
+
+    def handle(self, *args, **options):
+        # --email, ou DJANGO_SUPERUSER_EMAIL sans saisie : vérifié avant la création
+        email = options.get('email')
+        if email is None and not options['interactive']:
+            email = os.environ.get('DJANGO_SUPERUSER_EMAIL')
+        if email and email_in_use(email):
+            raise CommandError(self.EMAIL_TAKEN)
+        return super().handle(*args, **options)
+
+    def get_input_data(self, field, message, default=None):
+        value = super().get_input_data(field, message, default)
+        if field.name == 'email' and value and email_in_use(value):
+            self.stderr.write(f"Error: {self.EMAIL_TAKEN}")
+            # None : createsuperuser redemande l'email
+            return None
+        return value
@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from store.models import Product, Order, Download, Review, CinetPayTransaction
+
+
+# Marqueurs d'utilisation d'un index dans la sortie EXPLAIN selon le moteur
+INDEX_MARKERS = {
+    'postgresql': ('Index Scan', 'Index Only Scan', 'Bitmap Index Scan'),
+    'sqlite': ('USING INDEX', 'USING COVERING INDEX', 'USING INTEGER PRIMARY KEY', 'USING PRIMARY KEY'),
+}
+
+
+def hot_queries():
+    """Requêtes fréquentes issues de store/views.py : (libellé, queryset)"""
+    product = Product.objects.order_by('pk').first()
+    user = User.objects.order_by('pk').first()
+    product_id = product.pk if product else 1
+    category_id = product.category_id if product else 1
+    user_id = user.pk if user else 1
+    now = timezone.now()
+
+    return [
+        ('home: produits mis en avant',
+         Product.objects.filter(is_active=True, is_featured=True)[:6]),
+        ('home: nouveaux produits',
+         Product.objects.filter(is_active=True, is_new=True)[:4]),
+        ('home: produits populaires',
+         Product.objects.filter(is_active=True, is_popular=True)[:4]),
+        ('home: avis approuvés récents',
+         Review.objects.filter(is_approved=True).order_by('-created_at')[:6]),
+        ('product_detail: produits similaires',
+         Product.objects.filter(category_id=category_id, is_active=True).exclude(id=product_id)[:4]),
+        ('product_detail: avis approuvés',
+         Review.objects.filter(product_id=product_id, is_approved=True)[:10]),
+        ('category_detail: produits de la catégorie',
+         Product.objects.filter(category_id=category_id, is_active=True)[:12]),
+        ('my_orders: commandes du client',
+         Order.objects.filter(user_id=user_id).order_by('-created_at', '-id')[:11]),
+        ('account: téléchargements du client',
+         Download.objects.filter(user_id=user_id).order_by('-created_at')[:5]),
+        ('admin_orders: commandes par statut',
+         Order.objects.filter(status='paid').order_by('-created_at', '-id')[:21]),
+        ('admin_dashboard: chiffre d\'affaires',
+         Order.objects.filter(status='paid', created_at__gte=now - timedelta(days=30))),
+        ('cinetpay: transactions en attente expirées',
+         CinetPayTransaction.objects.filter(
+             Q(status='INITIATED') | Q(status='PENDING'), expires_at__lt=now
+         )),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Exécute EXPLAIN sur les requêtes fréquentes des vues et indique si un index est utilisé"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plan',
+            action='store_true',
+            help="Affiche le plan d'exécution complet de chaque requête",
+        )
+
+    def handle(self, *args, **options):
+        markers = INDEX_MARKERS.get(connection.vendor, ())
+        if not markers:
+            self.stderr.write(f"Moteur non pris en charge : {connection.vendor}")
+            return
+
+        self.stdout.write(f"Moteur : {connection.vendor}\n")
+        missing = 0
+        for label, queryset in hot_queries():
+            plan = queryset.explain()
+            uses_index = any(marker in plan for marker in markers)
+            if uses_index:
+                self.stdout.write(self.style.SUCCESS(f"[INDEX] {label}"))
+            else:
+                missing += 1
+                self.stdout.write(self.style.WARNING(f"[SCAN ] {label}"))
+            if options['verbose_plan'] or not uses_index:
+                for line in plan.splitlines():
+                    self.stdout.write(f"        {line}")
+
+        if missing:
+            self.stdout.write(self.style.WARNING(f"\n{missing} requête(s) sans index"))
+        else:
+            self.stdout.write(self.style.SUCCESS("\nToutes les requêtes utilisent un index"))
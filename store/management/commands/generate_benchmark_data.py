@@ -0,0 +1,205 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from store.models import Category, Product, Order, OrderItem, Review, VideoSequence, Download, PurchaseEntitlement
+
+
+PREFIX = 'bench'
+BENCH_PASSWORD = 'Bench-password-1'
+
+WORDS = [
+    'python', 'django', 'marketing', 'finance', 'leadership', 'excel', 'design',
+    'photographie', 'communication', 'productivité', 'entrepreneuriat', 'anglais',
+    'comptabilité', 'vente', 'data', 'cuisine', 'musique', 'santé', 'écriture', 'web',
+]
+
+# Fichiers factices partagés par tous les produits générés
+MEDIA_FILES = {
+    'cover': f'{PREFIX}/cover.jpg',
+    'product': f'{PREFIX}/product.pdf',
+    'video': f'{PREFIX}/sequence.mp4',
+}
+
+
+class Command(BaseCommand):
+    help = "Génère un catalogue synthétique reproductible pour les benchmarks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--orders', type=int, default=2000)
+        parser.add_argument('--reviews', type=int, default=1000)
+        parser.add_argument('--sequences', type=int, default=1000, help="Nombre total de séquences vidéo")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--clear', action='store_true', help="Supprime d'abord les données de benchmark existantes")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+
+        if options['clear']:
+            self.clear()
+
+        self.write_media_files()
+
+        with transaction.atomic():
+            categories = Category.objects.bulk_create([
+                Category(name=f'Catégorie {i} {rng.choice(WORDS)}', slug=f'{PREFIX}-categorie-{i}')
+                for i in range(options['categories'])
+            ], batch_size=batch_size)
+
+            products = []
+            for i in range(options['products']):
+                price = Decimal(rng.choice([0, 2500, 5000, 7500, 10000, 15000, 25000]))
+                title = ' '.join(rng.sample(WORDS, 3)).capitalize()
+                products.append(Product(
+                    title=f'{title} {i}',
+                    slug=f'{PREFIX}-produit-{i}',
+                    description=' '.join(rng.choices(WORDS, k=60)),
+                    short_description=' '.join(rng.choices(WORDS, k=12)),
+                    category=rng.choice(categories),
+                    product_type=rng.choice(['formation', 'livre', 'ebook', 'video']),
+                    price_fcfa=price,
+                    price_eur=(price / Decimal('655.957')).quantize(Decimal('0.01')),
+                    pricing_type='free' if price == 0 else 'paid',
+                    cover_image=MEDIA_FILES['cover'],
+                    product_file=MEDIA_FILES['product'],
+                    is_featured=rng.random() < 0.05,
+                    is_new=rng.random() < 0.1,
+                    is_popular=rng.random() < 0.1,
+                    views_count=rng.randint(0, 5000),
+                    sales_count=rng.randint(0, 300),
+                ))
+            products = Product.objects.bulk_create(products, batch_size=batch_size)
+            paid_products = [p for p in products if p.pricing_type == 'paid']
+            formations = [p for p in products if p.product_type == 'formation'] or products
+
+            VideoSequence.objects.bulk_create([
+                VideoSequence(
+                    product=rng.choice(formations),
+                    title=f'Séquence {i}',
+                    video_file=MEDIA_FILES['video'],
+                    duration=rng.randint(3, 45),
+                    order=i % 20,
+                    is_preview=rng.random() < 0.15,
+                )
+                for i in range(options['sequences'])
+            ], batch_size=batch_size)
+            # bulk_create n'émet pas de signaux : agrégats vidéo recalculés ici
+            for product in Product.video_aggregates_queryset().filter(pk__in=[p.pk for p in formations]):
+                product.refresh_video_aggregates()
+
+            password = make_password(BENCH_PASSWORD)
+            users = User.objects.bulk_create([
+                User(username=f'{PREFIX}-user-{i}', email=f'{PREFIX}-user-{i}@example.com', password=password)
+                for i in range(options['users'])
+            ], batch_size=batch_size)
+
+            now = timezone.now()
+            orders, order_products = [], []
+            for i in range(options['orders']):
+                user = rng.choice(users)
+                items = rng.sample(paid_products, k=min(len(paid_products), rng.randint(1, 3)))
+                subtotal = sum(p.price_fcfa for p in items)
+                status = rng.choices(['paid', 'pending', 'cancelled'], weights=[70, 25, 5])[0]
+                created = now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+                orders.append(Order(
+                    order_number=f'BENCH-{i:08d}',
+                    user=user,
+                    subtotal_fcfa=subtotal,
+                    subtotal_eur=sum(p.price_eur for p in items),
+                    total_fcfa=subtotal * Decimal('1.18'),
+                    total_eur=sum(p.price_eur for p in items) * Decimal('1.18'),
+                    status=status,
+                    customer_email=user.email,
+                    customer_name=user.username,
+                    paid_at=created if status == 'paid' else None,
+                ))
+                order_products.append((items, created))
+            orders = Order.objects.bulk_create(orders, batch_size=batch_size)
+
+            order_items, downloads, entitlements = [], [], {}
+            for order, (items, created) in zip(orders, order_products):
+                for product in items:
+                    order_items.append(OrderItem(
+                        order=order, product=product, price_fcfa=product.price_fcfa, price_eur=product.price_eur,
+                    ))
+                    if order.status == 'paid':
+                        entitlements.setdefault((order.user_id, product.pk), PurchaseEntitlement(
+                            user_id=order.user_id, product_id=product.pk, order=order,
+                        ))
+                        downloads.append(Download(
+                            user=order.user, product=product, order=order,
+                            download_url=f'/media/{MEDIA_FILES["product"]}',
+                            download_token=f'{PREFIX}{order.pk:010d}{product.pk:010d}',
+                            expires_at=now + timedelta(days=30),
+                        ))
+            OrderItem.objects.bulk_create(order_items, batch_size=batch_size)
+            Download.objects.bulk_create(downloads, batch_size=batch_size)
+            PurchaseEntitlement.objects.bulk_create(entitlements.values(), batch_size=batch_size)
+            # auto_now_add ignore la valeur fournie : dates de commande réparties sur un an
+            for order, (items, created) in zip(orders, order_products):
+                order.created_at = created
+            Order.objects.bulk_update(orders, ['created_at'], batch_size=batch_size)
+
+            reviews, seen = [], set()
+            for _ in range(options['reviews']):
+                key = (rng.choice(products).pk, rng.choice(users).pk)
+                if key in seen:
+                    continue
+                seen.add(key)
+                reviews.append(Review(
+                    product_id=key[0], user_id=key[1], rating=rng.randint(1, 5),
+                    title=rng.choice(WORDS).capitalize(), comment=' '.join(rng.choices(WORDS, k=20)),
+                    is_approved=rng.random() < 0.8,
+                ))
+            Review.objects.bulk_create(reviews, batch_size=batch_size)
+            for product in Product.objects.filter(pk__in={review.product_id for review in reviews}):
+                product.recompute_rating()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(categories)} catégories, {len(products)} produits, {options['sequences']} séquences, "
+            f"{len(users)} utilisateurs, {len(orders)} commandes, {len(order_items)} articles, "
+            f"{len(reviews)} avis générés"
+        ))
+
+    def clear(self):
+        with transaction.atomic():
+            Order.objects.filter(order_number__startswith='BENCH-').delete()
+            Product.objects.filter(slug__startswith=f'{PREFIX}-').delete()
+            Category.objects.filter(slug__startswith=f'{PREFIX}-').delete()
+            User.objects.filter(username__startswith=f'{PREFIX}-').delete()
+
+    def write_media_files(self):
+        """Crée les fichiers factices référencés par les produits générés"""
+        for key, name in MEDIA_FILES.items():
+            path = Path(settings.MEDIA_ROOT) / name
+            # La couverture doit être une vraie image pour la génération des déclinaisons
+            # (remplace aussi le fichier factice laissé par une version précédente)
+            if key == 'cover' and not self.is_image(path):
+                path.parent.mkdir(parents=True, exist_ok=True)
+                Image.new('RGB', (600, 900), (70, 110, 160)).save(path, 'JPEG', quality=85)
+            elif not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(b'0' * 1024)
+
+    @staticmethod
+    def is_image(path):
+        try:
+            with Image.open(path) as image:
+                image.verify()
+        except (OSError, SyntaxError):
+            return False
+        return True
@@ -0,0 +1,162 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from store.images import forget_variants_ready, generate_variants, is_variant
+
+
+DEFAULT_DIRECTORIES = ['products', 'collections', 'video_thumbnails', 'categories', 'sections']
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp', '.tif', '.tiff'}
+MANIFEST_VERSION = 1
+
+
+def _init_worker(niceness):
+    """Initialisation d'un processus du pool : priorité basse pour ne pas gêner les workers web"""
+    django.setup()
+    if niceness and hasattr(os, 'nice'):
+        os.nice(niceness)
+
+
+def _process(name, force):
+    """Exécuté dans un processus du pool ; les erreurs sont renvoyées en texte (toujours sérialisables)"""
+    try:
+        original, written = generate_variants(name, force=force)
+        return name, original, written, None
+    except Exception as exc:
+        return name, 0, {}, f"{type(exc).__name__}: {exc}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère par lots les variantes manquantes des images existantes de MEDIA_ROOT "
+        "(pool de processus, reprise après interruption grâce au manifeste)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directories', nargs='+', default=DEFAULT_DIRECTORIES,
+                            help="Sous-dossiers de MEDIA_ROOT à parcourir")
+        parser.add_argument('--workers', type=int, default=max((os.cpu_count() or 2) - 1, 1),
+                            help="Processus de génération (0 : dans ce processus)")
+        parser.add_argument('--niceness', type=int, default=10, help="Incrément de priorité des processus du pool")
+        parser.add_argument('--manifest', help="Fichier manifeste (par défaut MEDIA_ROOT/.image-variants.json)")
+        parser.add_argument('--checkpoint', type=int, default=50,
+                            help="Nombre d'images entre deux enregistrements du manifeste")
+        parser.add_argument('--limit', type=int, help="Nombre maximal d'images traitées dans ce lancement")
+        parser.add_argument('--force', action='store_true', help="Régénère toutes les variantes")
+
+    def handle(self, *args, **options):
+        manifest_path = options['manifest'] or os.path.join(settings.MEDIA_ROOT, '.image-variants.json')
+        manifest = {} if options['force'] else self.load_manifest(manifest_path)
+
+        pending, skipped = [], 0
+        for name, stat in self.scan(options['directories']):
+            entry = manifest.get(name)
+            if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+                skipped += 1
+            else:
+                pending.append(name)
+        if options['limit'] is not None:
+            pending = pending[:options['limit']]
+        self.stdout.write(f"{len(pending)} images à traiter, {skipped} déjà traitées d'après le manifeste")
+
+        totals = {'done': 0, 'existing': 0, 'errors': 0, 'original': 0, 'variants': 0, 'served': 0}
+        start = time.perf_counter()
+        try:
+            for name, original, written, error in self.run(pending, options):
+                if error:
+                    totals['errors'] += 1
+                    self.stderr.write(f"  {name} : {error}")
+                    continue
+                if written:
+                    totals['done'] += 1
+                    totals['original'] += original
+                    totals['variants'] += sum(written.values())
+                    # Octets envoyés à la place de l'original sur les listes : la carte WebP
+                    totals['served'] += next(
+                        (size for target, size in written.items() if target.endswith('.card.webp')), original
+                    )
+                else:
+                    totals['existing'] += 1
+                stat = os.stat(os.path.join(settings.MEDIA_ROOT, name))
+                manifest[name] = {'mtime': stat.st_mtime, 'size': stat.st_size, 'variants': sum(written.values())}
+                if (totals['done'] + totals['existing']) % options['checkpoint'] == 0:
+                    self.save_manifest(manifest_path, manifest)
+                    self.print_progress(totals, len(pending), start)
+        except KeyboardInterrupt:
+            self.stderr.write("Interruption : manifeste enregistré, relancez la commande pour reprendre")
+            raise
+        finally:
+            self.save_manifest(manifest_path, manifest)
+            # Le cache des processus du pool n'est pas celui des workers web
+            forget_variants_ready(pending)
+
+        elapsed = time.perf_counter() - start
+        saved = totals['original'] - totals['served']
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['done']} images traitées, {totals['existing']} déjà complètes, {totals['errors']} erreurs "
+            f"en {elapsed:.1f}s ({self.rate(totals, elapsed):.1f} images/s)"
+        ))
+        self.stdout.write(
+            f"Originaux : {self.megabytes(totals['original'])}, variantes écrites : {self.megabytes(totals['variants'])}, "
+            f"économie par affichage (carte WebP) : {self.megabytes(saved)}"
+        )
+
+    def scan(self, directories):
+        """(nom relatif à MEDIA_ROOT, stat) des originaux, variantes exclues"""
+        for directory in directories:
+            root = os.path.join(settings.MEDIA_ROOT, directory)
+            for dirpath, _dirnames, filenames in os.walk(root):
+                for filename in sorted(filenames):
+                    if os.path.splitext(filename)[1].lower() not in IMAGE_EXTENSIONS or is_variant(filename):
+                        continue
+                    path = os.path.join(dirpath, filename)
+                    name = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+                    yield name, os.stat(path)
+
+    def run(self, names, options):
+        if options['workers'] <= 0:
+            for name in names:
+                yield _process(name, options['force'])
+            return
+        # Pas de connexion SQL héritée par les processus du pool
+        connections.close_all()
+        executor = ProcessPoolExecutor(
+            max_workers=options['workers'], initializer=_init_worker, initargs=(options['niceness'],),
+        )
+        try:
+            futures = [executor.submit(_process, name, options['force']) for name in names]
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def load_manifest(self, path):
+        try:
+            with open(path) as fh:
+                data = json.load(fh)
+        except (FileNotFoundError, ValueError):
+            return {}
+        return data.get('images', {}) if data.get('version') == MANIFEST_VERSION else {}
+
+    def save_manifest(self, path, manifest):
+        # Écriture atomique : un arrêt brutal ne laisse pas de manifeste tronqué
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as fh:
+            json.dump({'version': MANIFEST_VERSION, 'images': manifest}, fh)
+        os.replace(tmp, path)
+
+    def print_progress(self, totals, total, start):
+        count = totals['done'] + totals['existing']
+        self.stdout.write(f"  {count}/{total} ({self.rate(totals, time.perf_counter() - start):.1f} images/s)")
+
+    def rate(self, totals, elapsed):
+        return (totals['done'] + totals['existing']) / elapsed if elapsed else 0.0
+
+    def megabytes(self, size):
+        return f"{size / 1024 / 1024:.1f} Mo"
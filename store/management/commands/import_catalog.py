@@ -0,0 +1,401 @@
+import csv
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+
+from store.media import content_name, hash_content
+from store.models import Category, Product, VideoSequence, BookCollection, PersonalDevelopmentSection
+
+
+LOOKUP_CHUNK = 500
+
+# Ordre d'import : les liens pointent toujours vers un type déjà traité.
+# « links » : colonne du manifeste -> (clé étrangère, type référencé par son slug)
+KINDS = {
+    'categories': {
+        'model': Category,
+        'fields': ['name', 'description', 'is_active'],
+        'files': {'image': 'categories'},
+    },
+    'collections': {
+        'model': BookCollection,
+        'fields': ['title', 'description', 'price_fcfa', 'price_eur', 'discount_percentage', 'is_featured', 'is_active'],
+        'files': {'cover_image': 'collections'},
+    },
+    'sections': {
+        'model': PersonalDevelopmentSection,
+        'fields': ['name', 'description', 'sub_section', 'order', 'is_active'],
+        'files': {'image': 'sections'},
+    },
+    'products': {
+        'model': Product,
+        'fields': [
+            'title', 'description', 'short_description', 'product_type', 'price_fcfa', 'price_eur', 'pricing_type',
+            'file_type', 'file_size', 'duration', 'level', 'language', 'is_featured', 'is_new', 'is_popular',
+            'is_active', 'meta_title', 'meta_description',
+        ],
+        'files': {'cover_image': 'products', 'product_file': 'product_files'},
+        'links': {
+            'category': ('category', 'categories'),
+            'collection': ('collection', 'collections'),
+            'section': ('personal_development_section', 'sections'),
+        },
+    },
+    'sequences': {
+        'model': VideoSequence,
+        # Pas de slug : une séquence est identifiée par son produit et son ordre
+        'key': ('product', 'order'),
+        'fields': ['title', 'description', 'duration', 'order', 'is_preview', 'is_active'],
+        'files': {'video_file': 'video_sequences', 'thumbnail': 'video_thumbnails'},
+        'links': {'product': ('product', 'products')},
+    },
+}
+IMAGE_DIRECTORIES = ['categories', 'collections', 'sections', 'products', 'video_thumbnails']
+
+
+class RowError(Exception):
+    pass
+
+
+def _store_file(source, directory, dry_run):
+    """
+    Copie le fichier dans le stockage adressé par contenu (store.media) :
+    un fichier déjà importé n'est ni recopié ni dupliqué.
+    Retourne (nom dans le stockage, taille, copié ?).
+    """
+    name = f'{directory}/{os.path.basename(source)}'
+    with open(source, 'rb') as fh:
+        content = File(fh, name)
+        if dry_run:
+            digest, size = hash_content(content)
+            name = content_name(name, digest)
+            return name, size, not default_storage.exists(name)
+        name, _digest, size, copied = default_storage.store(name, content)
+    return name, size, copied
+
+
+class Command(BaseCommand):
+    help = (
+        "Importe un catalogue d'éditeur (catalog.json et/ou <type>.csv + fichiers médias) : "
+        "catégories, collections, sections, produits et séquences vidéo, par lots, idempotent sur le slug"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help="Fichier JSON ou dossier contenant catalog.json et/ou "
+                                           + ', '.join(f'{kind}.csv' for kind in KINDS))
+        parser.add_argument('--media-dir', help="Racine des chemins de fichiers du manifeste (par défaut : dossier source)")
+        parser.add_argument('--workers', type=int, default=min(8, (os.cpu_count() or 2) * 2),
+                            help="Threads de copie et de hachage des fichiers (0 : dans ce thread)")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--update', action='store_true',
+                            help="Réécrit les lignes existantes (slug connu) au lieu de les ignorer")
+        parser.add_argument('--dry-run', action='store_true', help="Valide le manifeste sans rien écrire")
+        parser.add_argument('--no-variants', action='store_true',
+                            help="Ne lance pas generate_image_variants après l'import")
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.errors = 0
+        # slug (ou clé composée) -> pk, par type
+        self.keys = {kind: {} for kind in KINDS}
+        manifest, media_dir = self.load(options['source'])
+        media_dir = options['media_dir'] or media_dir
+        total_rows = sum(len(rows) for rows in manifest.values())
+        self.stdout.write(f"{total_rows} lignes à importer ({', '.join(f'{k} : {len(v)}' for k, v in manifest.items() if v)})")
+
+        start = time.perf_counter()
+        files = self.store_files(manifest, media_dir)
+
+        touched_products = set()
+        with transaction.atomic():
+            for kind in KINDS:
+                if manifest[kind]:
+                    touched_products |= self.import_kind(kind, manifest[kind], files)
+            # bulk_create / bulk_update n'émettent pas de signaux : agrégats vidéo recalculés ici
+            touched = sorted(touched_products)
+            for offset in range(0, len(touched), LOOKUP_CHUNK):
+                for product in Product.video_aggregates_queryset().filter(pk__in=touched[offset:offset + LOOKUP_CHUNK]):
+                    product.refresh_video_aggregates()
+            if options['dry_run']:
+                transaction.set_rollback(True)
+
+        elapsed = time.perf_counter() - start
+        style = self.style.SUCCESS if not self.errors else self.style.WARNING
+        self.stdout.write(style(
+            f"{total_rows} lignes en {elapsed:.1f}s ({total_rows / elapsed if elapsed else 0:.0f} lignes/s), "
+            f"{self.errors} erreurs" + (" — simulation, rien n'a été enregistré" if options['dry_run'] else '')
+        ))
+
+        if not options['dry_run'] and not options['no_variants'] and any(files.values()):
+            # Les signaux de déclinaison d'image ne sont pas émis par bulk_create
+            call_command('generate_image_variants', directories=IMAGE_DIRECTORIES, stdout=self.stdout)
+
+    # Lecture du manifeste
+
+    def load(self, source):
+        """({type: [(numéro de ligne, ligne)]}, dossier des médias)"""
+        manifest = {kind: [] for kind in KINDS}
+        if os.path.isdir(source):
+            media_dir = source
+            json_path = os.path.join(source, 'catalog.json')
+            csv_paths = {kind: os.path.join(source, f'{kind}.csv') for kind in KINDS}
+        elif os.path.isfile(source):
+            media_dir = os.path.dirname(os.path.abspath(source))
+            json_path, csv_paths = source, {}
+        else:
+            raise CommandError(f"Source introuvable : {source}")
+
+        if os.path.isfile(json_path):
+            with open(json_path, encoding='utf-8') as fh:
+                try:
+                    data = json.load(fh)
+                except ValueError as exc:
+                    raise CommandError(f"{json_path} : JSON invalide ({exc})")
+            unknown = set(data) - set(KINDS)
+            if unknown:
+                raise CommandError(f"{json_path} : types inconnus {', '.join(sorted(unknown))}")
+            for kind, rows in data.items():
+                manifest[kind].extend((f'{os.path.basename(json_path)}#{i}', row) for i, row in enumerate(rows, 1))
+        for kind, path in csv_paths.items():
+            if os.path.isfile(path):
+                with open(path, encoding='utf-8-sig', newline='') as fh:
+                    reader = csv.DictReader(fh)
+                    manifest[kind].extend((f'{kind}.csv:{reader.line_num}', row) for row in reader)
+        if not any(manifest.values()):
+            raise CommandError(f"Aucune ligne trouvée dans {source}")
+        return manifest, media_dir
+
+    # Fichiers
+
+    def store_files(self, manifest, media_dir):
+        """Copie et hache chaque fichier distinct une seule fois ; {(chemin, dossier): nom stocké ou exception}"""
+        tasks = sorted({
+            (row[column], directory)
+            for kind, rows in manifest.items()
+            for _line, row in rows
+            for column, directory in KINDS[kind]['files'].items()
+            if row.get(column)
+        })
+        results = {}
+        if not tasks:
+            return results
+        start = time.perf_counter()
+
+        def run(task):
+            path, directory = task
+            try:
+                return task, _store_file(os.path.join(media_dir, path), directory, self.options['dry_run'])
+            except OSError as exc:
+                return task, exc
+
+        if self.options['workers'] > 0:
+            with ThreadPoolExecutor(max_workers=self.options['workers'], thread_name_prefix='import-catalog') as pool:
+                outcomes = list(pool.map(run, tasks))
+        else:
+            outcomes = [run(task) for task in tasks]
+
+        copied = reused = size_copied = 0
+        for task, outcome in outcomes:
+            results[task] = outcome
+            if isinstance(outcome, Exception):
+                continue
+            _name, size, was_copied = outcome
+            copied += was_copied
+            reused += not was_copied
+            size_copied += size if was_copied else 0
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Fichiers : {copied} {'à copier' if self.options['dry_run'] else 'copiés'} "
+            f"({filesizeformat(size_copied)}), {reused} déjà présents, "
+            f"{sum(isinstance(o, Exception) for _t, o in outcomes)} introuvables, en {elapsed:.1f}s"
+        )
+        return results
+
+    # Lignes
+
+    def import_kind(self, kind, rows, files):
+        """Crée (et met à jour avec --update) les lignes d'un type ; retourne les pk des produits concernés"""
+        spec = KINDS[kind]
+        model = spec['model']
+        start = time.perf_counter()
+        for column, (_field, target) in spec.get('links', {}).items():
+            self.resolve_keys(target, {row[column] for _line, row in rows if row.get(column)})
+
+        built = []
+        for line, row in rows:
+            try:
+                built.append((line, self.build(kind, spec, row, files)))
+            except (RowError, ValidationError) as exc:
+                self.row_error(line, exc)
+
+        existing = self.existing_keys(kind, [self.key(kind, instance) for _line, instance in built])
+        to_create, to_update, seen, skipped = [], [], set(), 0
+        now = timezone.now()
+        for line, instance in built:
+            key = self.key(kind, instance)
+            if key in seen:
+                self.row_error(line, RowError(f"doublon dans le manifeste : {key}"))
+                continue
+            seen.add(key)
+            if model is Product:
+                instance.composite_type = instance._compute_composite_type(False)
+            if key not in existing:
+                if self.options['update'] and instance._import_fields != set(self.import_fields(spec)):
+                    # Colonnes absentes tolérées par build() pour une mise à jour : une création les exige
+                    try:
+                        self.full_clean(spec, instance)
+                    except ValidationError as exc:
+                        seen.discard(key)
+                        self.row_error(line, exc)
+                        continue
+                to_create.append(instance)
+            elif self.options['update']:
+                instance.pk = existing[key]
+                to_update.append(instance)
+            else:
+                skipped += 1
+
+        batch_size = self.options['batch_size']
+        model.objects.bulk_create(to_create, batch_size=batch_size)
+        # Seules les colonnes fournies par la ligne sont comparées et réécrites : une colonne absente
+        # du manifeste conserve la valeur en base. composite_type est recalculé avec les agrégats vidéo.
+        groups = defaultdict(list)
+        for instance in to_update:
+            groups[tuple(field for field in self.import_fields(spec) if field in instance._import_fields)].append(instance)
+        to_update = []
+        for fields, instances in groups.items():
+            changed = self.changed(model, instances, fields)
+            skipped += len(instances) - len(changed)
+            if not changed:
+                continue
+            for instance in changed:
+                instance.updated_at = now
+            # Un UPDATE ... CASE par lot : des lots plus petits restent linéaires
+            model.objects.bulk_update(changed, [*fields, 'updated_at'], batch_size=min(batch_size, 100))
+            to_update += changed
+        if 'key' not in spec:
+            # Clés des lignes créées, pour les types suivants (pk non renvoyé par toutes les bases)
+            self.resolve_keys(kind, {instance.slug for instance in to_create})
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"  {kind:<12} {len(to_create):>6} créés  {len(to_update):>6} mis à jour  {skipped:>6} inchangés  "
+            f"{len(rows) - len(seen):>4} erreurs  ({len(rows) / elapsed if elapsed else 0:.0f} lignes/s)"
+        )
+
+        if model is Product:
+            return {self.keys['products'][instance.slug] for instance in [*to_create, *to_update]}
+        if model is VideoSequence:
+            return {instance.product_id for instance in [*to_create, *to_update]}
+        return set()
+
+    def changed(self, model, instances, fields):
+        """Instances dont au moins un champ importé diffère de la ligne en base"""
+        model_fields = [model._meta.get_field(field) for field in fields]
+        current = {}
+        pks = [instance.pk for instance in instances]
+        for offset in range(0, len(pks), LOOKUP_CHUNK):
+            rows = model.objects.filter(pk__in=pks[offset:offset + LOOKUP_CHUNK])
+            for row in rows.values('pk', *(field.attname for field in model_fields)):
+                current[row.pop('pk')] = row
+        # get_prep_value : valeur telle qu'enregistrée (nom de fichier, Decimal...)
+        return [
+            instance for instance in instances
+            if any(
+                field.get_prep_value(getattr(instance, field.attname)) != current[instance.pk][field.attname]
+                for field in model_fields
+            )
+        ]
+
+    def import_fields(self, spec):
+        """Champs du modèle renseignables par le manifeste"""
+        return [*spec['fields'], *spec['files'], *(field for field, _target in spec.get('links', {}).values())]
+
+    def full_clean(self, spec, instance, exclude=()):
+        # Liens déjà résolus par build() ; unicité traitée par slug au moment de l'écriture
+        instance.full_clean(
+            exclude=[*(field for field, _target in spec.get('links', {}).values()), *exclude],
+            validate_unique=False, validate_constraints=False,
+        )
+
+    def build(self, kind, spec, row, files):
+        model = spec['model']
+        values = {}
+        # Champs dont la ligne contient la colonne (même vide) : les seuls réécrits par --update
+        supplied = {name for name in spec['fields'] if name in row}
+        supplied |= {column for column in spec['files'] if column in row}
+        supplied |= {field for column, (field, _target) in spec.get('links', {}).items() if column in row}
+        for name in spec['fields']:
+            if row.get(name) not in (None, ''):
+                try:
+                    values[name] = model._meta.get_field(name).to_python(row[name])
+                except ValidationError as exc:
+                    raise ValidationError({name: exc.messages})
+        if 'key' not in spec:
+            values['slug'] = row.get('slug') or ''
+        for column, (field, target) in spec.get('links', {}).items():
+            if row.get(column):
+                if row[column] not in self.keys[target]:
+                    raise RowError(f"{column} inconnu(e) : {row[column]}")
+                values[f'{field}_id'] = self.keys[target][row[column]]
+        for column, directory in spec['files'].items():
+            if row.get(column):
+                stored = files[(row[column], directory)]
+                if isinstance(stored, Exception):
+                    raise RowError(f"{column} : {stored}")
+                values[column] = stored[0]
+                if column == 'product_file' and not values.get('file_size'):
+                    values['file_size'] = filesizeformat(stored[1])
+                    supplied.add('file_size')
+        instance = model(**values)
+        instance._import_fields = supplied
+        # Avec --update, une ligne partielle peut viser une ligne existante : colonnes absentes non validées ici
+        missing = [field for field in self.import_fields(spec) if field not in supplied] if self.options['update'] else []
+        self.full_clean(spec, instance, exclude=missing)
+        return instance
+
+    def key(self, kind, instance):
+        if kind == 'sequences':
+            return instance.product_id, instance.order
+        return instance.slug
+
+    def existing_keys(self, kind, keys):
+        """{clé: pk} des lignes déjà en base"""
+        if kind != 'sequences':
+            self.resolve_keys(kind, set(keys))
+            return {key: self.keys[kind][key] for key in keys if key in self.keys[kind]}
+        existing = {}
+        product_ids = sorted({product_id for product_id, _order in keys})
+        for offset in range(0, len(product_ids), LOOKUP_CHUNK):
+            rows = VideoSequence.objects.filter(product_id__in=product_ids[offset:offset + LOOKUP_CHUNK])
+            for pk, product_id, order in rows.values_list('pk', 'product_id', 'order'):
+                existing.setdefault((product_id, order), pk)
+        return existing
+
+    def resolve_keys(self, kind, slugs):
+        """Complète self.keys[kind] avec les slugs présents en base, par paquets"""
+        missing = sorted(slugs - self.keys[kind].keys())
+        model = KINDS[kind]['model']
+        for offset in range(0, len(missing), LOOKUP_CHUNK):
+            self.keys[kind].update(
+                model.objects.filter(slug__in=missing[offset:offset + LOOKUP_CHUNK]).values_list('slug', 'pk')
+            )
+
+    def row_error(self, line, exc):
+        self.errors += 1
+        if isinstance(exc, ValidationError):
+            message = '; '.join(f"{field} : {' '.join(errors)}" for field, errors in exc.message_dict.items())
+        else:
+            message = str(exc)
+        self.stderr.write(f"  {line} : {message}")
@@ -0,0 +1,99 @@
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import F, Q
+from django.template.defaultfilters import filesizeformat
+
+from store.models import VideoSequence
+from store.video import PackagingError, ffmpeg_available, package_sequences
+from .generate_image_variants import _init_worker
+
+
+def _process(sequence_ids, force, threads, preview_seconds):
+    """Exécuté dans un processus du pool ; les erreurs sont renvoyées en texte (toujours sérialisables)"""
+    try:
+        return sequence_ids, package_sequences(sequence_ids, force, threads, preview_seconds), None
+    except (PackagingError, OSError) as exc:
+        return sequence_ids, {}, f"{type(exc).__name__}: {exc}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Empaquette les séquences vidéo en HLS multi-débit et produit les extraits d'aperçu "
+        "(ffmpeg, pool de processus à priorité basse)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sequences', nargs='+', type=int, help="Identifiants des séquences à traiter")
+        parser.add_argument('--workers', type=int, default=max((os.cpu_count() or 2) // 4, 1),
+                            help="Processus d'empaquetage en parallèle (0 : dans ce processus)")
+        parser.add_argument('--threads', type=int, default=0, help="Threads ffmpeg par vidéo (0 : automatique)")
+        parser.add_argument('--niceness', type=int, default=10, help="Incrément de priorité des processus du pool")
+        parser.add_argument('--preview-seconds', type=int, default=settings.VIDEO_PREVIEW_SECONDS)
+        parser.add_argument('--limit', type=int, help="Nombre maximal de fichiers sources traités dans ce lancement")
+        parser.add_argument('--force', action='store_true', help="Réempaquette même les séquences à jour")
+
+    def handle(self, *args, **options):
+        if not ffmpeg_available():
+            raise CommandError(
+                f"ffmpeg / ffprobe introuvables ({settings.FFMPEG_BINARY}, {settings.FFPROBE_BINARY}) : "
+                "installez-les ou renseignez FFMPEG_BINARY et FFPROBE_BINARY"
+            )
+        sequences = VideoSequence.objects.filter(is_active=True).exclude(video_file='')
+        if options['sequences']:
+            sequences = sequences.filter(pk__in=options['sequences'])
+        if not options['force']:
+            sequences = sequences.filter(
+                ~Q(packaged_source=F('video_file')) | Q(hls_playlist='') | Q(is_preview=True, preview_clip='')
+            )
+        # Un seul passage ffmpeg par fichier source, partagé par les séquences qui le réutilisent
+        groups = defaultdict(list)
+        for pk, name in sequences.order_by('pk').values_list('pk', 'video_file'):
+            groups[name].append(pk)
+        tasks = list(groups.values())[:options['limit']]
+        self.stdout.write(f"{sum(len(ids) for ids in tasks)} séquences à empaqueter ({len(tasks)} fichiers sources)")
+
+        totals = defaultdict(int)
+        start = time.perf_counter()
+        for sequence_ids, stats, error in self.run(tasks, options):
+            if error:
+                totals['errors'] += 1
+                self.stderr.write(f"  séquences {', '.join(map(str, sequence_ids))} : {error}")
+                continue
+            for key in ('sequences', 'source_bytes', 'hls_bytes', 'preview_bytes'):
+                totals[key] += stats.get(key, 0)
+            totals['sources'] += 1
+            self.stdout.write(
+                f"  séquences {', '.join(map(str, sequence_ids))} : source {filesizeformat(stats['source_bytes'])}, "
+                f"HLS {filesizeformat(stats['hls_bytes'])}, aperçu {filesizeformat(stats['preview_bytes'])} "
+                f"en {stats['seconds']:.1f}s"
+            )
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['sequences']} séquences ({totals['sources']} sources) empaquetées, {totals['errors']} erreurs "
+            f"en {elapsed:.1f}s"
+        ))
+
+    def run(self, tasks, options):
+        args = (options['force'], options['threads'], options['preview_seconds'])
+        if options['workers'] <= 0:
+            for sequence_ids in tasks:
+                yield _process(sequence_ids, *args)
+            return
+        # Pas de connexion SQL héritée par les processus du pool
+        connections.close_all()
+        executor = ProcessPoolExecutor(
+            max_workers=options['workers'], initializer=_init_worker, initargs=(options['niceness'],),
+        )
+        try:
+            futures = [executor.submit(_process, sequence_ids, *args) for sequence_ids in tasks]
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
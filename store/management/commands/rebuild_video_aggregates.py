@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = "Recalcule les agrégats de séquences vidéo dénormalisés sur les produits"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        checked = updated = 0
+        for product in Product.video_aggregates_queryset().order_by('pk').iterator(chunk_size=options['batch_size']):
+            checked += 1
+            if product.refresh_video_aggregates():
+                updated += 1
+                self.stdout.write(f"  {product.slug} : agrégats corrigés")
+        self.stdout.write(self.style.SUCCESS(f"{checked} produits vérifiés, {updated} mis à jour"))
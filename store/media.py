@@ -0,0 +1,92 @@
+"""
+Stockage des médias adressé par contenu.
+
+Chaque fichier téléversé est haché (SHA-256) en un seul passage sur ses
+morceaux, puis enregistré sous `dossier/<empreinte>.<ext>`. Un contenu déjà
+présent n'est pas réécrit : le nom existant est renvoyé et les champs des
+modèles référencent le même fichier. L'empreinte contenue dans le nom sert
+d'ETag fort, sans relire le fichier.
+"""
+import hashlib
+import os
+import re
+import uuid
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+from .images import is_variant
+
+
+CHUNK_SIZE = 1024 * 1024
+# Fichiers produits hors téléversement, référencés par leur nom (playlists HLS et segments)
+DERIVED_PREFIXES = ('hls/',)
+_CONTENT_NAME_RE = re.compile(r'^([0-9a-f]{64})(\.[a-z0-9]{1,10})?$')
+
+
+def hash_content(content):
+    """(empreinte SHA-256, taille) d'un fichier Django, relu depuis le début"""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in content.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+        size += len(chunk)
+    content.seek(0)
+    return digest.hexdigest(), size
+
+
+def content_name(name, digest):
+    """Nom adressé par contenu dans le dossier de `name`"""
+    directory, filename = os.path.split(name)
+    ext = os.path.splitext(filename)[1].lower()
+    if not re.fullmatch(r'\.[a-z0-9]{1,10}', ext):
+        ext = ''
+    return f'{directory}/{digest}{ext}' if directory else f'{digest}{ext}'
+
+
+def content_digest(name):
+    """Empreinte SHA-256 contenue dans un nom adressé par contenu, sinon None (fichiers antérieurs)"""
+    match = _CONTENT_NAME_RE.match(os.path.basename(name or ''))
+    return match.group(1) if match else None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def store(self, name, content, max_length=None):
+        """Enregistre `content` une seule fois ; retourne (nom, empreinte, taille, écrit ?)"""
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest, size = hash_content(content)
+        target = content_name(name, digest)
+        if self.exists(target):
+            return target, digest, size, False
+        return super().save(target, content, max_length=max_length), digest, size, True
+
+    def save(self, name, content, max_length=None):
+        # Les déclinaisons d'images et les rendus vidéo gardent leur nom
+        if is_variant(name) or name.startswith(DERIVED_PREFIXES):
+            return super().save(name, content, max_length=max_length)
+        return self.store(name, content, max_length=max_length)[0]
+
+    def get_available_name(self, name, max_length=None):
+        # Un nom adressé par contenu déjà pris désigne le même contenu : jamais de suffixe
+        if content_digest(name):
+            return name
+        return super().get_available_name(name, max_length=max_length)
+
+    def _save(self, name, content):
+        if not content_digest(name):
+            return super()._save(name, content)
+        # Deux téléversements simultanés du même contenu passent tous deux le test exists() :
+        # écriture sous un nom temporaire puis remplacement atomique, au lieu d'un doublon
+        # renommé <empreinte>_XXXX.ext
+        directory, filename = os.path.split(name)
+        temporary = super()._save(os.path.join(directory, f'.{filename}.{uuid.uuid4().hex}.part'), content)
+        try:
+            os.replace(self.path(temporary), self.path(name))
+        except OSError:
+            self.delete(temporary)
+            raise
+        return name
@@ -0,0 +1,224 @@
+"""
+Métriques par requête : nombre de requêtes SQL, temps base de données,
+temps de rendu des templates, temps total et taille de la réponse.
+
+Les mesures sont collectées par QueryMetricsMiddleware (store/middleware.py)
+puis agrégées par vue dans des histogrammes exportés au format Prometheus.
+
+Le registre vit dans la mémoire du processus : chaque worker gunicorn ou
+uvicorn a le sien et /metrics/ n'expose que celui du worker qui répond.
+Une collecte Prometheus ne voit donc qu'un worker à la fois ; pour une vue
+globale, cibler chaque worker ou agréger sur plusieurs collectes.
+"""
+import contextvars
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.db import connections
+from django.template.base import Template
+
+from .jsonlog import dropped_counts
+
+
+# Bornes supérieures des histogrammes
+DURATION_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS_BYTES = (1024, 10240, 51200, 102400, 512000, 1048576)
+
+_IN_LIST_RE = re.compile(r'IN \((?:%s|\?)(?:, (?:%s|\?))*\)')
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+\b')
+
+_current_metrics = contextvars.ContextVar('store_request_metrics', default=None)
+
+
+def sql_shape(sql):
+    """Forme normalisée d'une requête SQL (littéraux et listes IN effacés)"""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    return _IN_LIST_RE.sub('IN (...)', sql)
+
+
+class RequestMetrics:
+    """Mesures collectées pendant le traitement d'une requête"""
+
+    def __init__(self):
+        self.query_count = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        # Utilisé comme execute_wrapper sur chaque connexion
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.query_count += 1
+            self.shapes[sql_shape(sql)] += 1
+
+    def repeated_queries(self, threshold):
+        """Formes SQL exécutées plus de `threshold` fois (motif N+1)"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+    def activate(self):
+        return _current_metrics.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current_metrics.reset(token)
+
+
+def wrap_queries(metrics):
+    """
+    Pose `metrics` comme execute_wrapper sur les connexions du thread courant ;
+    retourne l'ExitStack qui le retire. Sous ASGI, à appeler dans le thread
+    de sync_to_async de la requête, là où l'ORM async exécute ses requêtes.
+    """
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(metrics))
+    return stack
+
+
+def install_template_timer():
+    """
+    Mesure le temps passé dans Template.render (une seule fois par processus).
+    Remplace Template.render pour tout le processus : posé seulement en DEBUG
+    ou avec QUERY_METRICS_TEMPLATES.
+    """
+    if getattr(Template.render, 'is_store_metrics_timer', False):
+        return
+    original_render = Template.render
+
+    def render(self, context):
+        metrics = _current_metrics.get()
+        # Les {% include %} passent aussi par ici : seul le rendu racine est chronométré
+        if metrics is None or metrics.template_depth:
+            if metrics is None:
+                return original_render(self, context)
+            metrics.template_depth += 1
+            try:
+                return original_render(self, context)
+            finally:
+                metrics.template_depth -= 1
+        metrics.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return original_render(self, context)
+        finally:
+            metrics.template_time += time.perf_counter() - start
+            metrics.template_depth -= 1
+
+    render.is_store_metrics_timer = True
+    Template.render = render
+
+
+class Histogram:
+    """Histogramme cumulatif à bornes fixes"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self):
+        running = 0
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            running += count
+            yield bound, running
+
+
+class MetricsRegistry:
+    """Agrégation thread-safe des mesures par vue"""
+
+    SERIES = {
+        'duration_ms': DURATION_BUCKETS_MS,
+        'db_time_ms': DURATION_BUCKETS_MS,
+        'template_ms': DURATION_BUCKETS_MS,
+        'queries': QUERY_COUNT_BUCKETS,
+        'response_bytes': SIZE_BUCKETS_BYTES,
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+        self._n_plus_one = Counter()
+
+    def observe(self, view_name, metrics, total_time, response_size, n_plus_one=False):
+        values = {
+            'duration_ms': total_time * 1000,
+            'db_time_ms': metrics.db_time * 1000,
+            'template_ms': metrics.template_time * 1000,
+            'queries': metrics.query_count,
+            'response_bytes': response_size,
+        }
+        with self._lock:
+            series = self._views.get(view_name)
+            if series is None:
+                series = {name: Histogram(buckets) for name, buckets in self.SERIES.items()}
+                self._views[view_name] = series
+            for name, value in values.items():
+                series[name].observe(value)
+            if n_plus_one:
+                self._n_plus_one[view_name] += 1
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+            self._n_plus_one.clear()
+
+    def snapshot(self):
+        """Résumé par vue : nombre d'appels et moyennes"""
+        with self._lock:
+            return {
+                view: {
+                    'requests': series['duration_ms'].count,
+                    **{
+                        f'avg_{name}': round(histogram.total / histogram.count, 2) if histogram.count else 0
+                        for name, histogram in series.items()
+                    },
+                    'n_plus_one': self._n_plus_one[view],
+                }
+                for view, series in self._views.items()
+            }
+
+    def render_prometheus(self):
+        """Export au format texte Prometheus"""
+        lines = []
+        with self._lock:
+            for name in self.SERIES:
+                metric = f'store_view_{name}'
+                lines.append(f'# TYPE {metric} histogram')
+                for view, series in sorted(self._views.items()):
+                    histogram = series[name]
+                    for bound, count in histogram.cumulative():
+                        lines.append(f'{metric}_bucket{{view="{view}",le="{bound}"}} {count}')
+                    lines.append(f'{metric}_sum{{view="{view}"}} {histogram.total:.3f}')
+                    lines.append(f'{metric}_count{{view="{view}"}} {histogram.count}')
+            lines.append('# TYPE store_view_n_plus_one_total counter')
+            for view, count in sorted(self._n_plus_one.items()):
+                lines.append(f'store_view_n_plus_one_total{{view="{view}"}} {count}')
+        lines.append('# TYPE store_log_records_dropped_total counter')
+        for filename, count in sorted(dropped_counts().items()):
+            lines.append(f'store_log_records_dropped_total{{file="{filename}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,124 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .metrics import RequestMetrics, install_template_timer, registry, wrap_queries
+from .routers import STICKY_COOKIE_NAME, replica_configured
+
+logger = logging.getLogger(__name__)
+
+
+class QueryMetricsMiddleware:
+    """
+    Instrumentation par requête : nombre de requêtes SQL, temps base de
+    données, rendu des templates, temps total et taille de la réponse.
+
+    Activée par QUERY_METRICS_ENABLED ; désactivée, Django retire le
+    middleware de la chaîne au démarrage et il ne coûte rien. Le temps de
+    rendu n'est mesuré qu'en DEBUG ou avec QUERY_METRICS_TEMPLATES.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.n_plus_one_threshold = getattr(settings, 'QUERY_METRICS_N_PLUS_ONE_THRESHOLD', 10)
+        if settings.DEBUG or getattr(settings, 'QUERY_METRICS_TEMPLATES', False):
+            install_template_timer()
+        # Sous ASGI, la chaîne reste async de bout en bout
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = metrics.activate()
+        start = time.perf_counter()
+        try:
+            with wrap_queries(metrics):
+                response = self.get_response(request)
+        finally:
+            RequestMetrics.deactivate(token)
+        return self.process(request, response, metrics, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = metrics.activate()
+        start = time.perf_counter()
+        # Les vues async exécutent leurs requêtes dans le thread de sync_to_async propre à la
+        # requête (ThreadSensitiveContext) : le wrapper est posé sur les connexions de ce thread
+        stack = await sync_to_async(wrap_queries)(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            RequestMetrics.deactivate(token)
+        return self.process(request, response, metrics, time.perf_counter() - start)
+
+    def process(self, request, response, metrics, total_time):
+        view_name = request.resolver_match.view_name if request.resolver_match else 'unresolved'
+        response_size = 0 if response.streaming else len(response.content)
+
+        repeated = metrics.repeated_queries(self.n_plus_one_threshold)
+        for shape, count in repeated:
+            logger.warning(
+                "N+1 probable sur %s (%s) : requête répétée %d fois : %s",
+                view_name, request.path, count, shape,
+            )
+
+        registry.observe(view_name, metrics, total_time, response_size, n_plus_one=bool(repeated))
+        logger.debug(
+            "%s %s queries=%d db=%.1fms templates=%.1fms total=%.1fms size=%d",
+            view_name, request.path, metrics.query_count, metrics.db_time * 1000,
+            metrics.template_time * 1000, total_time * 1000, response_size,
+        )
+
+        response['Server-Timing'] = (
+            f"db;dur={metrics.db_time * 1000:.1f};desc=\"{metrics.query_count} queries\", "
+            f"tpl;dur={metrics.template_time * 1000:.1f}, "
+            f"total;dur={total_time * 1000:.1f}"
+        )
+        return response
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Après une requête d'écriture, pose un cookie court qui maintient les
+    lectures du visiteur sur la base principale (voir store/routers.py).
+    Retiré de la chaîne quand aucun réplica n'est configuré.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sticky_seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+        # Sous ASGI, la chaîne reste async de bout en bout
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process(request, await self.get_response(request))
+
+    def process(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            response.set_cookie(
+                STICKY_COOKIE_NAME, '1', max_age=self.sticky_seconds, httponly=True, samesite='Lax',
+                secure=settings.SESSION_COOKIE_SECURE,
+            )
+        return response
@@ -0,0 +1,63 @@
+# Generated by Django 5.2 on 2026-10-19 07:58
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def populate_video_aggregates(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    products = Product.objects.annotate(
+        computed_sequences=Count('video_sequences'),
+        computed_active=Count('video_sequences', filter=Q(video_sequences__is_active=True)),
+        computed_minutes=Sum('video_sequences__duration', filter=Q(video_sequences__is_active=True)),
+        computed_previews=Count(
+            'video_sequences',
+            filter=Q(video_sequences__is_active=True, video_sequences__is_preview=True)
+        ),
+    )
+    for product in products:
+        if product.computed_sequences:
+            composite_type = 'video_sequences'
+        elif product.collection_id:
+            composite_type = 'collection'
+        elif product.personal_development_section_id:
+            composite_type = 'personal_development'
+        else:
+            composite_type = 'simple'
+        Product.objects.filter(pk=product.pk).update(
+            video_sequence_count=product.computed_active,
+            video_total_minutes=product.computed_minutes or 0,
+            video_preview_count=product.computed_previews,
+            composite_type=composite_type,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_query_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='composite_type',
+            field=models.CharField(choices=[('simple', 'Simple'), ('video_sequences', 'Séquences vidéo'), ('collection', 'Collection'), ('personal_development', 'Développement personnel')], default='simple', max_length=20, verbose_name='Type de produit composé'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='video_preview_count',
+            field=models.PositiveIntegerField(default=0, verbose_name="Séquences d'aperçu"),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='video_sequence_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Séquences vidéo actives'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='video_total_minutes',
+            field=models.PositiveIntegerField(default=0, verbose_name='Durée totale des séquences (minutes)'),
+        ),
+        migrations.RunPython(populate_video_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-19 07:59
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def populate_rating_totals(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    approved = Q(reviews__is_approved=True)
+    products = Product.objects.annotate(
+        computed_sum=Sum('reviews__rating', filter=approved),
+        computed_count=Count('reviews', filter=approved),
+    )
+    for product in products:
+        rating_sum = product.computed_sum or 0
+        count = product.computed_count
+        Product.objects.filter(pk=product.pk).update(
+            rating_sum=rating_sum,
+            rating_count=count,
+            rating=round(Decimal(rating_sum) / count, 2) if count else Decimal('0'),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_product_video_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, verbose_name='Somme des notes'),
+        ),
+        migrations.RunPython(populate_rating_totals, migrations.RunPython.noop),
+    ]
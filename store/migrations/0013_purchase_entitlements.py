@@ -0,0 +1,45 @@
+# Generated by Django 5.2 on 2026-10-19 08:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_entitlements(apps, schema_editor):
+    OrderItem = apps.get_model('store', 'OrderItem')
+    PurchaseEntitlement = apps.get_model('store', 'PurchaseEntitlement')
+    seen = set()
+    entitlements = []
+    items = OrderItem.objects.filter(order__status='paid').order_by('order__created_at')
+    for user_id, product_id, order_id in items.values_list('order__user_id', 'product_id', 'order_id').iterator():
+        if (user_id, product_id) not in seen:
+            seen.add((user_id, product_id))
+            entitlements.append(PurchaseEntitlement(user_id=user_id, product_id=product_id, order_id=order_id))
+    PurchaseEntitlement.objects.bulk_create(entitlements, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0012_product_recommendation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PurchaseEntitlement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granted_at', models.DateTimeField(auto_now_add=True, verbose_name='Accordé le')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entitlements', to='store.order', verbose_name='Commande')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entitlements', to='store.product', verbose_name='Produit')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entitlements', to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': "Droit d'accès",
+                'verbose_name_plural': "Droits d'accès",
+                'constraints': [models.UniqueConstraint(fields=('user', 'product'), name='entitlement_user_product_uniq')],
+            },
+        ),
+        migrations.RunPython(populate_entitlements, migrations.RunPython.noop),
+    ]
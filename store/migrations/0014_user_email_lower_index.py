@@ -0,0 +1,57 @@
+# Generated by Django 5.2 on 2026-10-19 09:12
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import Lower
+
+
+# Index posés sur la table des utilisateurs (application auth) : créés par
+# l'éditeur de schéma pour obtenir le SQL propre à chaque base
+INDEXES = [
+    models.UniqueConstraint(Lower('email'), condition=Q(email__gt=''), name='auth_user_email_lower_uniq'),
+    models.Index(Lower('username'), name='auth_user_username_lower_idx'),
+]
+
+
+def _user_model(apps):
+    return apps.get_model(settings.AUTH_USER_MODEL)
+
+
+def create_indexes(apps, schema_editor):
+    User = _user_model(apps)
+    duplicates = list(
+        User.objects.filter(email__gt='').values(email_lower=Lower('email'))
+        .annotate(total=Count('pk')).filter(total__gt=1).values_list('email_lower', flat=True)[:20]
+    )
+    if duplicates:
+        raise RuntimeError(
+            "Emails présents sur plusieurs comptes (casse ignorée), à fusionner avant la migration : "
+            + ', '.join(duplicates)
+        )
+    for index in INDEXES:
+        if isinstance(index, models.UniqueConstraint):
+            schema_editor.add_constraint(User, index)
+        else:
+            schema_editor.add_index(User, index)
+
+
+def drop_indexes(apps, schema_editor):
+    User = _user_model(apps)
+    for index in INDEXES:
+        if isinstance(index, models.UniqueConstraint):
+            schema_editor.remove_constraint(User, index)
+        else:
+            schema_editor.remove_index(User, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0013_purchase_entitlements'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
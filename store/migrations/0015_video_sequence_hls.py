@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-19 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0014_user_email_lower_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videosequence',
+            name='hls_playlist',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Playlist HLS'),
+        ),
+        migrations.AddField(
+            model_name='videosequence',
+            name='packaged_source',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Fichier source empaqueté'),
+        ),
+        migrations.AddField(
+            model_name='videosequence',
+            name='preview_clip',
+            field=models.CharField(blank=True, max_length=255, verbose_name="Extrait d'aperçu"),
+        ),
+    ]
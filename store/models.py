@@ -1,23 +1,24 @@
-from django.db import models
+from django.db import models, transaction
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models.functions import Cast
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.template.defaultfilters import filesizeformat
 from django.utils import timezone
 import uuid
 import os
 from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
 
 
 def product_image_path(instance, filename):
-    """Génère le chemin pour les images de produits"""
-    ext = filename.split('.')[-1]
-    filename = f"{instance.id}_{uuid.uuid4().hex[:8]}.{ext}"
+    """Dossier des images de produits (le stockage nomme le fichier d'après son contenu)"""
     return os.path.join('products', filename)
 
 
 def product_file_path(instance, filename):
-    """Génère le chemin pour les fichiers de produits"""
-    ext = filename.split('.')[-1]
-    filename = f"{instance.id}_{uuid.uuid4().hex[:8]}.{ext}"
+    """Dossier des fichiers de produits (le stockage nomme le fichier d'après son contenu)"""
     return os.path.join('product_files', filename)
 
 
@@ -124,6 +125,24 @@ class Product(models.Model):
     downloads_count = models.PositiveIntegerField(default=0, verbose_name="Nombre de téléchargements")
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00, verbose_name="Note moyenne")
     rating_count = models.PositiveIntegerField(default=0, verbose_name="Nombre d'avis")
+    rating_sum = models.PositiveIntegerField(default=0, verbose_name="Somme des notes")
+    
+    # Agrégats des séquences vidéo (maintenus par les signaux de VideoSequence)
+    COMPOSITE_TYPES = [
+        ('simple', 'Simple'),
+        ('video_sequences', 'Séquences vidéo'),
+        ('collection', 'Collection'),
+        ('personal_development', 'Développement personnel'),
+    ]
+    video_sequence_count = models.PositiveIntegerField(default=0, verbose_name="Séquences vidéo actives")
+    video_total_minutes = models.PositiveIntegerField(default=0, verbose_name="Durée totale des séquences (minutes)")
+    video_preview_count = models.PositiveIntegerField(default=0, verbose_name="Séquences d'aperçu")
+    composite_type = models.CharField(
+        max_length=20,
+        choices=COMPOSITE_TYPES,
+        default='simple',
+        verbose_name="Type de produit composé"
+    )
     
     # SEO
     meta_title = models.CharField(max_length=200, blank=True, verbose_name="Titre SEO")
@@ -137,6 +156,13 @@ class Product(models.Model):
         verbose_name = "Produit"
         verbose_name_plural = "Produits"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['category', 'is_active', '-created_at'], name='product_category_active_idx'),
+            # Index partiels pour les blocs de la page d'accueil
+            models.Index(fields=['-created_at'], condition=models.Q(is_active=True, is_featured=True), name='product_featured_idx'),
+            models.Index(fields=['-created_at'], condition=models.Q(is_active=True, is_new=True), name='product_new_idx'),
+            models.Index(fields=['-created_at'], condition=models.Q(is_active=True, is_popular=True), name='product_popular_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -144,19 +170,95 @@ class Product(models.Model):
     def get_absolute_url(self):
         return f'/product/{self.slug}/'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Fichier d'origine conservé : un fichier remplacé (nouvelle empreinte) fait recalculer file_size
+        if 'product_file' not in instance.get_deferred_fields():
+            instance._loaded_product_file = instance.product_file.name
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Les séquences vidéo priment ; sinon le type dépend de la collection / section
+        self.composite_type = self._compute_composite_type(self.composite_type == 'video_sequences')
+        file_loaded = 'product_file' not in self.get_deferred_fields()
+        if file_loaded and self.product_file and (
+            not self.file_size or self.product_file.name != getattr(self, '_loaded_product_file', None)
+        ):
+            # Taille du fichier téléversé, ou du fichier déjà stocké (sans relecture)
+            try:
+                self.file_size = filesizeformat(self.product_file.size)
+            except OSError:
+                pass
+        super().save(*args, **kwargs)
+        if file_loaded:
+            self._loaded_product_file = self.product_file.name
+
+    def download_filename(self):
+        """Nom proposé au téléchargement : le fichier stocké est nommé d'après son empreinte"""
+        return f"{self.slug}{os.path.splitext(self.product_file.name)[1]}"
+
     def get_price_display(self):
         return f"{self.price_fcfa} FCFA / {self.price_eur} EUR"
 
+    def _compute_composite_type(self, has_sequences):
+        if has_sequences:
+            return 'video_sequences'
+        elif self.collection_id:
+            return 'collection'
+        elif self.personal_development_section_id:
+            return 'personal_development'
+        return 'simple'
+
+    VIDEO_AGGREGATE_ANNOTATIONS = ('computed_sequences', 'computed_active', 'computed_minutes', 'computed_previews')
+
+    @classmethod
+    def video_aggregates_queryset(cls):
+        """Produits annotés avec les agrégats recalculés depuis leurs séquences"""
+        return cls.objects.annotate(
+            computed_sequences=models.Count('video_sequences'),
+            computed_active=models.Count('video_sequences', filter=models.Q(video_sequences__is_active=True)),
+            computed_minutes=models.Sum('video_sequences__duration', filter=models.Q(video_sequences__is_active=True)),
+            computed_previews=models.Count(
+                'video_sequences',
+                filter=models.Q(video_sequences__is_active=True, video_sequences__is_preview=True)
+            ),
+        )
+
+    def refresh_video_aggregates(self):
+        """
+        Recalcule les agrégats des séquences vidéo et les enregistre s'ils ont
+        changé. Une instance issue de video_aggregates_queryset() est déjà annotée.
+        """
+        if hasattr(self, 'computed_active'):
+            computed = {name: getattr(self, name) for name in self.VIDEO_AGGREGATE_ANNOTATIONS}
+        else:
+            computed = Product.video_aggregates_queryset().filter(pk=self.pk).values(
+                *self.VIDEO_AGGREGATE_ANNOTATIONS
+            ).first()
+            if computed is None:
+                return False
+        values = {
+            'video_sequence_count': computed['computed_active'],
+            'video_total_minutes': computed['computed_minutes'] or 0,
+            'video_preview_count': computed['computed_previews'],
+            'composite_type': self._compute_composite_type(computed['computed_sequences'] > 0),
+        }
+        if all(getattr(self, field) == value for field, value in values.items()):
+            return False
+        for field, value in values.items():
+            setattr(self, field, value)
+        self.updated_at = timezone.now()
+        Product.objects.filter(pk=self.pk).update(updated_at=self.updated_at, **values)
+        return True
+
     def get_total_video_count(self):
         """Retourne le nombre total de séquences vidéo"""
-        return self.video_sequences.filter(is_active=True).count()
+        return self.video_sequence_count
 
     def get_total_duration(self):
         """Retourne la durée totale de la formation"""
-        total_minutes = self.video_sequences.filter(is_active=True).aggregate(
-            total=models.Sum('duration')
-        )['total'] or 0
-        return total_minutes
+        return self.video_total_minutes
 
     def get_total_duration_display(self):
         """Retourne la durée totale formatée"""
@@ -169,8 +271,57 @@ class Product(models.Model):
 
     def has_preview_sequence(self):
         """Vérifie si la formation a une séquence d'aperçu"""
-        return self.video_sequences.filter(is_preview=True, is_active=True).exists()
-    
+        return self.video_preview_count > 0
+    
+    @classmethod
+    def rating_totals_queryset(cls):
+        """Produits annotés avec la somme et le nombre d'avis approuvés recalculés"""
+        approved = models.Q(reviews__is_approved=True)
+        return cls.objects.annotate(
+            computed_rating_sum=models.Sum('reviews__rating', filter=approved),
+            computed_rating_count=models.Count('reviews', filter=approved),
+        )
+
+    def recompute_rating(self):
+        """Recalcul complet de la note à partir des avis approuvés"""
+        totals = Product.rating_totals_queryset().filter(pk=self.pk).values(
+            'computed_rating_sum', 'computed_rating_count'
+        ).first()
+        if totals is None:
+            return
+        self.rating_sum = totals['computed_rating_sum'] or 0
+        self.rating_count = totals['computed_rating_count']
+        self.rating = (
+            (Decimal(self.rating_sum) / self.rating_count).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            if self.rating_count else Decimal('0')
+        )
+        self.save(update_fields=['rating_sum', 'rating_count', 'rating', 'updated_at'])
+
+    @classmethod
+    def apply_rating_delta(cls, product_id, sum_delta, count_delta):
+        """
+        Met à jour la somme, le nombre d'avis approuvés et la note moyenne en
+        une seule requête UPDATE avec F(), sans relire ni réagréger les avis.
+        """
+        if not sum_delta and not count_delta:
+            return
+        new_sum = models.F('rating_sum') + sum_delta
+        new_count = models.F('rating_count') + count_delta
+        cls.objects.filter(pk=product_id).update(
+            # updated_at sert de clé aux fragments de template en cache
+            updated_at=timezone.now(),
+            rating_sum=new_sum,
+            rating_count=new_count,
+            rating=models.Case(
+                models.When(
+                    rating_count__gt=-count_delta,
+                    then=Cast(Cast(new_sum, models.FloatField()) / new_count, models.DecimalField(max_digits=3, decimal_places=2)),
+                ),
+                default=models.Value(0),
+                output_field=models.DecimalField(max_digits=3, decimal_places=2),
+            ),
+        )
+
     def increment_downloads(self):
         """Incrémente le nombre de téléchargements"""
         self.downloads_count += 1
@@ -189,22 +340,11 @@ class Product(models.Model):
     
     def is_composite_product(self):
         """Vérifier si le produit est composé de plusieurs éléments"""
-        return (
-            self.video_sequences.exists() or 
-            self.collection is not None or 
-            self.personal_development_section is not None
-        )
+        return self.composite_type != 'simple'
     
     def get_composite_type(self):
         """Obtenir le type de produit composé"""
-        if self.video_sequences.exists():
-            return "video_sequences"
-        elif self.collection:
-            return "collection"
-        elif self.personal_development_section:
-            return "personal_development"
-        else:
-            return "simple"
+        return self.composite_type
 
 
 class Order(models.Model):
@@ -251,6 +391,10 @@ class Order(models.Model):
         verbose_name = "Commande"
         verbose_name_plural = "Commandes"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='order_status_created_idx'),
+        ]
 
     def __str__(self):
         return f"Commande {self.order_number}"
@@ -277,6 +421,112 @@ class OrderItem(models.Model):
         return f"{self.product.title} x {self.quantity}"
 
 
+class PurchaseEntitlement(models.Model):
+    """Droit d'accès d'un utilisateur à un produit acheté (index utilisateur × produit)"""
+    # Commande revenue en attente, annulée ou remboursée
+    REVOKING_STATUSES = ('pending', 'cancelled', 'refunded')
+    # Paiement terminé devenu échoué, annulé ou remboursé
+    REVOKING_PAYMENT_STATUSES = ('failed', 'cancelled', 'refunded')
+    CACHE_TIMEOUT = 300
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='entitlements', verbose_name="Utilisateur")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='entitlements', verbose_name="Produit")
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='entitlements', verbose_name="Commande")
+    granted_at = models.DateTimeField(auto_now_add=True, verbose_name="Accordé le")
+
+    class Meta:
+        verbose_name = "Droit d'accès"
+        verbose_name_plural = "Droits d'accès"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='entitlement_user_product_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} → {self.product_id}"
+
+    @staticmethod
+    def cache_key(user_id, product_id):
+        return f'entitlement:{user_id}:{product_id}'
+
+    @classmethod
+    def grant(cls, user_id, product_ids, order_id):
+        """Accorde l'accès (idempotent) et invalide le cache des produits concernés"""
+        cls.objects.bulk_create(
+            [cls(user_id=user_id, product_id=product_id, order_id=order_id) for product_id in product_ids],
+            ignore_conflicts=True,
+        )
+        cache.delete_many([cls.cache_key(user_id, product_id) for product_id in product_ids])
+
+    @classmethod
+    def grant_for_order(cls, order):
+        product_ids = list(order.items.values_list('product_id', flat=True).distinct())
+        if product_ids:
+            cls.grant(order.user_id, product_ids, order.pk)
+
+    @classmethod
+    def revoke_for_order(cls, order):
+        """Retire les droits issus de la commande (repris d'une autre commande payée par forget())"""
+        cls.objects.filter(order=order).delete()
+
+    @classmethod
+    def revoke_for_payment(cls, payment):
+        """Paiement terminé qui échoue ou est remboursé : retire les droits, sauf si un autre paiement de la commande est terminé"""
+        if getattr(payment, '_loaded_status', None) != 'completed' or payment.status not in cls.REVOKING_PAYMENT_STATUSES:
+            return
+        if not Payment.objects.filter(order_id=payment.order_id, status='completed').exists():
+            cls.objects.filter(order_id=payment.order_id).delete()
+
+    @classmethod
+    def revoke_for_item(cls, item):
+        """Article supprimé : retire le droit qu'il accordait, si la commande ne contient plus ce produit"""
+        if not OrderItem.objects.filter(order_id=item.order_id, product_id=item.product_id).exists():
+            cls.objects.filter(order_id=item.order_id, product_id=item.product_id).delete()
+
+    @classmethod
+    def forget(cls, user_id, product_id):
+        """
+        Après la suppression d'un droit (remboursement, commande ou article
+        supprimé) : invalide le cache, puis, une fois la transaction validée,
+        reprend le droit d'une autre commande payée encore existante.
+        """
+        cache.delete(cls.cache_key(user_id, product_id))
+
+        def restore():
+            other_order_id = OrderItem.objects.filter(
+                order__user_id=user_id, order__status='paid', product_id=product_id,
+            ).values_list('order_id', flat=True).first()
+            if other_order_id is not None:
+                cls.grant(user_id, [product_id], other_order_id)
+        transaction.on_commit(restore)
+
+    @staticmethod
+    def cache_is_shared():
+        # Un cache local au processus ne peut pas être invalidé dans les autres workers
+        return not isinstance(caches['default'], LocMemCache)
+
+    @classmethod
+    def user_owns(cls, user, product):
+        """
+        L'utilisateur a-t-il acheté ce produit ? Une requête indexée au plus,
+        mémorisée sur l'utilisateur pour la requête HTTP et en cache si positive.
+        """
+        if not user.is_authenticated:
+            return False
+        product_id = getattr(product, 'pk', product)
+        memo = user.__dict__.setdefault('_entitlements', {})
+        if product_id not in memo:
+            key = cls.cache_key(user.pk, product_id)
+            owned = cache.get(key)
+            if owned is None:
+                owned = cls.objects.filter(user_id=user.pk, product_id=product_id).exists()
+                # Seuls les droits positifs sont mis en cache : un achat est visible immédiatement.
+                # Pas de cache local au processus : un remboursement doit valoir pour tous les workers
+                if owned and cls.cache_is_shared():
+                    cache.set(key, True, cls.CACHE_TIMEOUT)
+            memo[product_id] = owned
+        return memo[product_id]
+
+
 class Payment(models.Model):
     """Paiement"""
     PAYMENT_METHODS = [
@@ -325,6 +575,13 @@ class Payment(models.Model):
     def __str__(self):
         return f"Paiement {self.payment_id}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Statut chargé : un passage de 'completed' à 'refunded' retire les droits d'accès
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
 
 class Download(models.Model):
     """Téléchargement"""
@@ -352,6 +609,9 @@ class Download(models.Model):
         verbose_name = "Téléchargement"
         verbose_name_plural = "Téléchargements"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='download_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"Téléchargement {self.product.title} - {self.user.username}"
@@ -396,10 +656,61 @@ class Review(models.Model):
         verbose_name_plural = "Avis"
         ordering = ['-created_at']
         unique_together = ['product', 'user', 'order']
+        indexes = [
+            models.Index(fields=['product', 'is_approved', '-created_at'], name='review_product_approved_idx'),
+            # Avis approuvés les plus récents (page d'accueil)
+            models.Index(fields=['-created_at'], condition=models.Q(is_approved=True), name='review_approved_recent_idx'),
+        ]
 
     def __str__(self):
         return f"Avis de {self.user.username} sur {self.product.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # État initial conservé pour calculer la variation de note à l'enregistrement
+        if not {'product_id', 'rating', 'is_approved'} & instance.get_deferred_fields():
+            instance._rating_state = instance.rating_state()
+        return instance
+
+    def rating_state(self):
+        """(produit, note) si l'avis compte dans la note moyenne, sinon None"""
+        return (self.product_id, self.rating) if self.is_approved else None
+
+    @classmethod
+    def bulk_set_approved(cls, queryset, approved):
+        """
+        Approuve ou désapprouve un ensemble d'avis en une requête et répercute
+        les variations sur les notes produit (queryset.update n'émet pas de signaux).
+        """
+        with transaction.atomic():
+            pks = list(
+                queryset.filter(is_approved=not approved).select_for_update().values_list('pk', flat=True)
+            )
+            if not pks:
+                return 0
+            changed = cls.objects.filter(pk__in=pks)
+            deltas = list(changed.order_by().values('product_id').annotate(
+                total=models.Sum('rating'), count=models.Count('id')
+            ))
+            changed.update(is_approved=approved, updated_at=timezone.now())
+            sign = 1 if approved else -1
+            for delta in deltas:
+                Product.apply_rating_delta(delta['product_id'], sign * delta['total'], sign * delta['count'])
+        return len(pks)
+
+    def apply_rating_change(self, previous, current):
+        """Répercute le passage de l'état `previous` à `current` sur les produits"""
+        if previous == current:
+            return
+        if previous and current and previous[0] == current[0]:
+            Product.apply_rating_delta(current[0], current[1] - previous[1], 0)
+            return
+        if previous:
+            Product.apply_rating_delta(previous[0], -previous[1], -1)
+        if current:
+            Product.apply_rating_delta(current[0], current[1], 1)
+
 
 class VideoSequence(models.Model):
     """Séquence vidéo d'une formation"""
@@ -412,6 +723,10 @@ class VideoSequence(models.Model):
     order = models.PositiveIntegerField(default=0, verbose_name="Ordre")
     is_preview = models.BooleanField(default=False, verbose_name="Aperçu gratuit")
     is_active = models.BooleanField(default=True, verbose_name="Actif")
+    # Produits par package_videos (noms dans le stockage des médias)
+    hls_playlist = models.CharField(max_length=255, blank=True, verbose_name="Playlist HLS")
+    preview_clip = models.CharField(max_length=255, blank=True, verbose_name="Extrait d'aperçu")
+    packaged_source = models.CharField(max_length=255, blank=True, verbose_name="Fichier source empaqueté")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Créé le")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Modifié le")
 
@@ -423,6 +738,14 @@ class VideoSequence(models.Model):
     def __str__(self):
         return f"{self.product.title} - {self.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Produit d'origine conservé : une séquence déplacée met à jour les deux formations
+        if 'product_id' not in instance.get_deferred_fields():
+            instance._loaded_product_id = instance.product_id
+        return instance
+
     def get_duration_display(self):
         """Retourne la durée formatée"""
         hours = self.duration // 60
@@ -431,6 +754,54 @@ class VideoSequence(models.Model):
             return f"{hours}h {minutes}min"
         return f"{minutes}min"
 
+    def is_packaged(self):
+        """Rendus HLS à jour : produits à partir du fichier vidéo actuel"""
+        return bool(self.hls_playlist) and self.packaged_source == self.video_file.name
+
+    def hls_url(self):
+        return self.video_file.storage.url(self.hls_playlist) if self.is_packaged() else ''
+
+    def has_preview_clip(self):
+        return self.is_packaged() and bool(self.preview_clip)
+
+    def hls_url_for(self, user):
+        """
+        Rendus HLS de la séquence complète, réservés aux séquences d'aperçu et
+        aux acheteurs du produit. Une séquence d'aperçu dotée d'un extrait court
+        est lue par son extrait.
+        """
+        if self.has_preview_clip():
+            return ''
+        if not self.is_preview and not PurchaseEntitlement.user_owns(user, self.product_id):
+            return ''
+        return self.hls_url()
+
+    def preview_url(self):
+        """Extrait court si disponible, sinon la vidéo complète"""
+        if self.has_preview_clip():
+            return self.video_file.storage.url(self.preview_clip)
+        return self.video_file.url if self.video_file else ''
+
+
+class ProductRecommendation(models.Model):
+    """Voisin pré-calculé d'un produit (reconstruit par build_recommendations)"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommendations', verbose_name="Produit")
+    recommended = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+', verbose_name="Produit recommandé")
+    rank = models.PositiveSmallIntegerField(verbose_name="Rang")
+    score = models.FloatField(verbose_name="Score")
+
+    class Meta:
+        verbose_name = "Recommandation"
+        verbose_name_plural = "Recommandations"
+        ordering = ['product', 'rank']
+        constraints = [
+            # Sert aussi d'index pour la page produit : WHERE product_id = %s ORDER BY rank
+            models.UniqueConstraint(fields=['product', 'rank'], name='recommendation_product_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} → {self.recommended_id} (#{self.rank})"
+
 
 class BookCollection(models.Model):
     """Collection de livres"""
@@ -460,13 +831,28 @@ class BookCollection(models.Model):
     def __str__(self):
         return self.title
     
+    @classmethod
+    def book_aggregates_queryset(cls):
+        """Collections annotées avec le nombre de livres et la somme de leurs prix individuels"""
+        return cls.objects.annotate(
+            books_total=models.Count('books'),
+            books_price_fcfa=models.Sum('books__price_fcfa', default=Decimal('0')),
+            books_price_eur=models.Sum('books__price_eur', default=Decimal('0')),
+        )
+    
     def get_books_count(self):
+        if hasattr(self, 'books_total'):
+            return self.books_total
         return self.books.count()
     
     def get_total_individual_price_fcfa(self):
+        if hasattr(self, 'books_price_fcfa'):
+            return self.books_price_fcfa
         return sum(book.price_fcfa for book in self.books.all())
     
     def get_total_individual_price_eur(self):
+        if hasattr(self, 'books_price_eur'):
+            return self.books_price_eur
         return sum(book.price_eur for book in self.books.all())
     
     def get_savings_fcfa(self):
@@ -510,7 +896,14 @@ class PersonalDevelopmentSection(models.Model):
     def __str__(self):
         return self.name
     
+    @classmethod
+    def book_aggregates_queryset(cls):
+        """Sections annotées avec leur nombre de livres"""
+        return cls.objects.annotate(books_total=models.Count('books'))
+    
     def get_books_count(self):
+        if hasattr(self, 'books_total'):
+            return self.books_total
         return self.books.count()
 
 
@@ -600,6 +993,9 @@ class CinetPayTransaction(models.Model):
         verbose_name = "Transaction CinetPay"
         verbose_name_plural = "Transactions CinetPay"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='cinetpay_status_expires_idx'),
+        ]
     
     def __str__(self):
         return f"CinetPay - {self.customer_name} - {self.amount_fcfa} FCFA"
@@ -0,0 +1,139 @@
+import base64
+from datetime import datetime
+
+from django.db import connections
+from django.db.models import Q
+
+
+class KeysetPage:
+    """Page de résultats obtenue par pagination par curseur"""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    @property
+    def next_cursor(self):
+        if not self.has_next_page:
+            return ''
+        return self.paginator.encode_cursor(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous_page:
+            return ''
+        return self.paginator.encode_cursor(self.object_list[0])
+
+
+class KeysetPaginator:
+    """
+    Pagination par curseur (keyset) sur le couple (created_at, id) décroissant.
+
+    Contrairement au Paginator de Django, aucune clause OFFSET n'est utilisée :
+    chaque page filtre sur la dernière ligne affichée, si bien qu'une page
+    profonde coûte autant que la première.
+    """
+
+    def __init__(self, queryset, per_page, field='created_at', count_limit=None):
+        self.queryset = queryset.order_by(f'-{field}', '-id')
+        self.per_page = per_page
+        self.field = field
+        # None : pas de comptage ; sinon comptage borné à count_limit lignes
+        self.count_limit = count_limit
+        self._count = None
+
+    def encode_cursor(self, obj):
+        value = getattr(obj, self.field)
+        raw = f"{value.isoformat()}|{obj.pk}"
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Retourne (valeur, id) ou None si le curseur est invalide"""
+        if not cursor:
+            return None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            raw = base64.urlsafe_b64decode(padded.encode()).decode()
+            value, pk = raw.rsplit('|', 1)
+            return datetime.fromisoformat(value), int(pk)
+        except (ValueError, UnicodeDecodeError):
+            return None
+
+    def get_page(self, after=None, before=None):
+        """Retourne la page suivant le curseur `after` ou précédant `before`"""
+        after_key = self.decode_cursor(after)
+        before_key = self.decode_cursor(before)
+
+        if before_key and not after_key:
+            value, pk = before_key
+            rows = list(
+                self.queryset.filter(
+                    Q(**{f'{self.field}__gt': value}) |
+                    Q(**{self.field: value, 'id__gt': pk})
+                ).order_by(self.field, 'id')[:self.per_page + 1]
+            )
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            rows.reverse()
+            return KeysetPage(rows, self, has_next=True, has_previous=has_previous)
+
+        queryset = self.queryset
+        if after_key:
+            value, pk = after_key
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__lt': value}) |
+                Q(**{self.field: value, 'id__lt': pk})
+            )
+        rows = list(queryset[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return KeysetPage(rows[:self.per_page], self, has_next=has_next, has_previous=bool(after_key))
+
+    @property
+    def count(self):
+        """Nombre (approximatif) de résultats, ou None si le comptage est désactivé"""
+        if self.count_limit is None:
+            return None
+        if self._count is None:
+            self._count = self._estimate_count()
+        return self._count
+
+    @property
+    def count_is_truncated(self):
+        return self.count is not None and self.count >= self.count_limit
+
+    def _estimate_count(self):
+        model = self.queryset.model
+        connection = connections[self.queryset.db]
+        # Sans filtre, PostgreSQL fournit une estimation gratuite via les statistiques
+        if connection.vendor == 'postgresql' and not self.queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                    [model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= 0:
+                return row[0]
+        # Sinon, comptage borné : on ne parcourt jamais plus de count_limit lignes
+        limited = self.queryset.order_by().values('pk')[:self.count_limit]
+        return model._default_manager.using(self.queryset.db).filter(pk__in=limited).count()
@@ -0,0 +1,135 @@
+"""
+Limitation de débit par seau à jetons, stockée dans le cache (RATE_LIMITS).
+
+Chaque seau est tenu par une seule clé entière : l'heure théorique d'arrivée
+(GCRA, équivalent exact d'un seau à jetons). Une requête coûte un
+`cache.incr`, atomique en mémoire locale comme dans Redis ; le seau se vide
+au rythme `rate` et tolère une rafale de `burst` requêtes. La clé est par
+utilisateur connecté, sinon par adresse IP ; les adresses de
+RATE_LIMIT_EXEMPT_IPS (passerelle de paiement pour le webhook) ne sont
+jamais limitées.
+
+Les limites ne sont globales qu'avec un cache partagé (REDIS_URL) : avec le
+repli LocMemCache, chaque processus tient ses propres seaux et la limite
+effective est multipliée par le nombre de workers.
+
+    @rate_limit('search')
+    async def product_search(request): ...
+"""
+import math
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+_PERIODS = {'s': 1, 'm': 60, 'h': 3600}
+_KEY_PREFIX = 'ratelimit:'
+
+
+def parse_rate(rate):
+    """'30/m' → nombre de requêtes par seconde"""
+    count, period = rate.split('/')
+    return int(count) / _PERIODS[period]
+
+
+def client_ip(request):
+    """Adresse du client, lue derrière les proxies de confiance"""
+    header = getattr(settings, 'RATE_LIMIT_CLIENT_IP_HEADER', None)
+    hops = getattr(settings, 'RATE_LIMIT_TRUSTED_PROXIES', 1)
+    if header and hops > 0 and request.META.get(header):
+        # Les maillons de gauche sont fournis par le client : seul compte celui ajouté
+        # par le plus éloigné des `hops` proxies de confiance, en partant de la droite
+        addresses = [address.strip() for address in request.META[header].split(',')]
+        if len(addresses) >= hops and addresses[-hops]:
+            return addresses[-hops]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def client_id(request):
+    if request.user.is_authenticated:
+        return f'u{request.user.pk}'
+    return 'ip' + client_ip(request)
+
+
+def consume(bucket, identity, now=None):
+    """
+    Prend un jeton dans le seau `bucket` de `identity`.
+    Retourne 0 si la requête passe, sinon le délai d'attente en secondes.
+    """
+    rate, burst = settings.RATE_LIMITS[bucket]
+    interval = round(1000 / parse_rate(rate))  # ms entre deux jetons
+    tolerance = interval * burst
+    now = int((now if now is not None else time.time()) * 1000)
+    key = f'{_KEY_PREFIX}{bucket}:{identity}'
+    timeout = math.ceil((tolerance + interval) / 1000)
+
+    if cache.add(key, now + interval, timeout):
+        return 0
+    try:
+        arrival = cache.incr(key, interval)
+    except ValueError:
+        # Clé expirée entre add() et incr()
+        cache.set(key, now + interval, timeout)
+        return 0
+    if arrival - interval < now:
+        # Seau resté inactif, donc plein : l'heure théorique repart de maintenant.
+        # Deux requêtes simultanées peuvent toutes deux passer ici : tolérance acceptée
+        cache.set(key, now + interval, timeout)
+        return 0
+    if arrival - now <= tolerance:
+        # incr() ne prolonge pas la clé : sans touch(), elle expirerait avant l'heure
+        # théorique et rendrait une rafale complète à un client resté à la limite
+        cache.touch(key, timeout)
+        return 0
+    # Refusée : le jeton est rendu et le seau, encore actif, garde sa clé
+    cache.decr(key, interval)
+    cache.touch(key, timeout)
+    return (arrival - tolerance - now) / 1000
+
+
+def _check(request, bucket):
+    # Un seau n'est consommé qu'une fois par requête (vues qui en appellent une autre)
+    consumed = request.__dict__.setdefault('_rate_limit_buckets', set())
+    if bucket in consumed or not getattr(settings, 'RATE_LIMIT_ENABLED', True):
+        return None
+    if client_ip(request) in getattr(settings, 'RATE_LIMIT_EXEMPT_IPS', {}).get(bucket, ()):
+        return None
+    consumed.add(bucket)
+    wait = consume(bucket, client_id(request))
+    if not wait:
+        return None
+    message = "Trop de requêtes, veuillez réessayer dans quelques instants."
+    if request.path.startswith('/api/'):
+        response = JsonResponse({'error': message}, status=429)
+    else:
+        response = HttpResponse(message, status=429, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(max(1, math.ceil(wait)))
+    return response
+
+
+def rate_limit(bucket, methods=None):
+    """Décorateur de vue (synchrone ou async) ; `methods` restreint la limite, ex. ('POST',)"""
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                if methods is None or request.method in methods:
+                    # request.user se résout de façon synchrone (backends social_core)
+                    response = await sync_to_async(_check)(request, bucket)
+                    if response is not None:
+                        return response
+                return await view(request, *args, **kwargs)
+            return wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if methods is None or request.method in methods:
+                response = _check(request, bucket)
+                if response is not None:
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,107 @@
+"""
+Construction hors ligne des recommandations « produits similaires ».
+
+La similarité de co-achat (cosinus entre colonnes de la matrice
+commandes × produits, calculée sous forme creuse) est mélangée à la similarité de catégorie et de
+type de produit ; les K meilleurs voisins de chaque produit sont stockés
+dans ProductRecommendation.
+"""
+import numpy as np
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Product, OrderItem, ProductRecommendation
+
+
+DEFAULT_WEIGHTS = {'co_purchase': 0.7, 'category': 0.2, 'product_type': 0.1}
+
+# Départage les ex æquo (produits jamais co-achetés) par popularité
+POPULARITY_WEIGHT = 1e-3
+
+
+def co_purchase_similarity(product_ids):
+    """
+    Similarité cosinus de co-achat au format creux CSR : (indptr, indices,
+    valeurs float32), diagonale incluse. Les paires sont comptées par la base
+    (auto-jointure des lignes de commande) : seules les paires réellement
+    co-achetées sont chargées, jamais de matrice n × n.
+    """
+    index = {pk: i for i, pk in enumerate(product_ids)}
+    pairs = (
+        OrderItem.objects.filter(order__status='paid').order_by()
+        .values('product_id', 'order__items__product_id')
+        .annotate(orders=Count('order_id', distinct=True))
+        .values_list('product_id', 'order__items__product_id', 'orders')
+    )
+    rows, columns, counts = [], [], []
+    for product_id, other_id, orders in pairs.iterator():
+        if product_id in index and other_id in index:
+            rows.append(index[product_id])
+            columns.append(index[other_id])
+            counts.append(orders)
+    rows = np.array(rows, dtype=np.int64)
+    columns = np.array(columns, dtype=np.int64)
+    counts = np.array(counts, dtype=np.float32)
+
+    n = len(product_ids)
+    # Diagonale : nombre de commandes de chaque produit
+    norms = np.zeros(n, dtype=np.float32)
+    diagonal = rows == columns
+    norms[rows[diagonal]] = np.sqrt(counts[diagonal])
+    norms[norms == 0] = 1.0
+
+    order = np.argsort(rows, kind='stable')
+    rows, columns = rows[order], columns[order]
+    values = counts[order] / norms[rows] / norms[columns]
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=n))])
+    return indptr, columns, values
+
+
+def build_recommendations(top_k=8, weights=None, row_chunk=512):
+    """Recalcule et remplace toutes les recommandations ; retourne le nombre de lignes écrites"""
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    products = list(Product.objects.filter(is_active=True).order_by('pk')
+                    .values_list('pk', 'category_id', 'product_type', 'sales_count'))
+    recommendations = []
+    if len(products) > 1:
+        ids = np.array([p[0] for p in products])
+        _, categories = np.unique([p[1] for p in products], return_inverse=True)
+        _, types = np.unique([p[2] for p in products], return_inverse=True)
+        sales = np.log1p(np.array([p[3] for p in products], dtype=np.float32))
+        popularity = POPULARITY_WEIGHT * sales / (sales.max() or 1.0)
+
+        indptr, columns, values = co_purchase_similarity(ids.tolist())
+        k = min(top_k, len(products) - 1)
+        for start in range(0, len(products), row_chunk):
+            stop = min(start + row_chunk, len(products))
+            # Seul un bloc de lignes est densifié : mémoire bornée par row_chunk × n
+            similarity = np.zeros((stop - start, len(products)), dtype=np.float32)
+            similarity[
+                np.repeat(np.arange(stop - start), np.diff(indptr[start:stop + 1])),
+                columns[indptr[start]:indptr[stop]],
+            ] = values[indptr[start]:indptr[stop]]
+            scores = (
+                weights['co_purchase'] * similarity
+                + weights['category'] * (categories[start:stop, None] == categories[None, :])
+                + weights['product_type'] * (types[start:stop, None] == types[None, :])
+                + popularity[None, :]
+            )
+            scores[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind='stable')
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            for row in range(stop - start):
+                recommendations.extend(
+                    ProductRecommendation(
+                        product_id=int(ids[start + row]), recommended_id=int(ids[column]),
+                        rank=rank, score=round(float(score), 6),
+                    )
+                    for rank, (column, score) in enumerate(zip(top[row], top_scores[row]), start=1)
+                )
+
+    with transaction.atomic():
+        ProductRecommendation.objects.all().delete()
+        ProductRecommendation.objects.bulk_create(recommendations, batch_size=1000)
+    return len(recommendations)
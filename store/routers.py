@@ -0,0 +1,82 @@
+"""
+Routage entre la base principale et un réplica en lecture (DATABASE_REPLICA_URL).
+
+Tout passe par la base principale, sauf les lectures faites dans une vue
+décorée par `read_from_replica` (catalogue, recherche, statistiques). Un
+visiteur qui vient d'écrire (requête POST, PUT...) relit la base principale
+pendant REPLICA_STICKY_SECONDS : le cookie posé par
+ReplicaStickinessMiddleware lui évite de ne pas voir ses propres écritures
+à cause du retard de réplication.
+"""
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_ALIAS = 'replica'
+STICKY_COOKIE_NAME = 'db_primary'
+
+_read_alias = ContextVar('read_alias', default=DEFAULT_DB_ALIAS)
+
+# Toujours lus sur la base principale, même dans une vue du catalogue : la session,
+# le compte et les droits d'accès changent sans requête POST du visiteur (connexion,
+# webhook de paiement) et le cookie de relecture ne les couvre pas
+PRIMARY_READ_APPS = {'auth', 'sessions', 'social_django'}
+PRIMARY_READ_MODELS = {'store.purchaseentitlement'}
+
+
+def replica_configured():
+    return REPLICA_ALIAS in connections
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_READ_APPS or model._meta.label_lower in PRIMARY_READ_MODELS:
+            return DEFAULT_DB_ALIAS
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Le réplica contient les mêmes données que la base principale
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Le schéma du réplica vient de la réplication, pas des migrations
+        return db == DEFAULT_DB_ALIAS
+
+
+def _use_replica(request):
+    return (request.method in ('GET', 'HEAD') and STICKY_COOKIE_NAME not in request.COOKIES
+            and replica_configured())
+
+
+def read_from_replica(view):
+    """Décorateur de vue (synchrone ou async) : lectures sur le réplica, sauf juste après une écriture du visiteur"""
+    # La variable de contexte suit aussi les appels sync_to_async de l'ORM async
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if not _use_replica(request):
+                return await view(request, *args, **kwargs)
+            token = _read_alias.set(REPLICA_ALIAS)
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _read_alias.reset(token)
+        return wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _use_replica(request):
+            return view(request, *args, **kwargs)
+        token = _read_alias.set(REPLICA_ALIAS)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+    return wrapper
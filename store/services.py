@@ -1,6 +1,7 @@
 import requests
 import json
 import logging
+import time
 from django.conf import settings
 from django.utils import timezone
 from .models import Payment, Order, Download
@@ -99,12 +100,14 @@ class CinetPayService:
                 'Accept': 'application/json'
             }
             
+            start = time.perf_counter()
             response = requests.post(
                 self.api_url,
                 json=payload,
                 headers=headers,
                 timeout=30
             )
+            latency_ms = round((time.perf_counter() - start) * 1000, 1)
             
             response_data = response.json()
             
@@ -121,6 +124,11 @@ class CinetPayService:
                 payment.gateway_response = response_data
                 payment.save()
                 
+                logger.info("Paiement CinetPay initié", extra={
+                    'event': 'cinetpay.initiate', 'order_number': order.order_number,
+                    'transaction_id': transaction.transaction_id, 'status': 'PENDING', 'latency_ms': latency_ms,
+                })
+                
                 return {
                     'success': True,
                     'transaction_id': transaction.transaction_id,
@@ -136,7 +144,10 @@ class CinetPayService:
                 transaction.save()
                 
                 error_message = response_data.get('message', 'Erreur lors de l\'initiation du paiement')
-                logger.error(f"Erreur CinetPay: {error_message}")
+                logger.error("Erreur CinetPay : %s", error_message, extra={
+                    'event': 'cinetpay.initiate', 'order_number': order.order_number,
+                    'transaction_id': transaction.transaction_id, 'status': 'FAILED', 'latency_ms': latency_ms,
+                })
                 
                 return {
                     'success': False,
@@ -145,7 +156,9 @@ class CinetPayService:
                 }
                 
         except Exception as e:
-            logger.error(f"Erreur lors de l'initiation du paiement CinetPay: {str(e)}")
+            logger.exception("Erreur lors de l'initiation du paiement CinetPay : %s", e, extra={
+                'event': 'cinetpay.initiate', 'order_number': order.order_number,
+            })
             return {
                 'success': False,
                 'error': str(e),
@@ -216,7 +229,9 @@ class CinetPayService:
                 'Accept': 'application/json'
             }
             
+            start = time.perf_counter()
             response = requests.post(status_url, json=payload, headers=headers, timeout=30)
+            latency_ms = round((time.perf_counter() - start) * 1000, 1)
             response_data = response.json()
             
             if response.status_code == 200:
@@ -240,6 +255,12 @@ class CinetPayService:
                 transaction.gateway_response = response_data
                 transaction.save()
                 
+                logger.info("Statut CinetPay vérifié", extra={
+                    'event': 'cinetpay.check', 'order_number': transaction.order.order_number,
+                    'transaction_id': transaction.transaction_id, 'status': transaction.status,
+                    'latency_ms': latency_ms,
+                })
+                
                 return {
                     'success': True,
                     'status': transaction.status,
@@ -252,7 +273,9 @@ class CinetPayService:
             }
             
         except requests.exceptions.RequestException as e:
-            logger.error(f"Erreur lors de la vérification du statut CinetPay: {str(e)}")
+            logger.error("Erreur lors de la vérification du statut CinetPay : %s", e, extra={
+                'event': 'cinetpay.check', 'transaction_id': transaction.transaction_id,
+            })
             return {
                 'success': False,
                 'error': 'Erreur de connexion'
@@ -268,6 +291,7 @@ class CinetPayService:
         Returns:
             dict: Résultat du traitement
         """
+        start = time.perf_counter()
         try:
             from .models import CinetPayTransaction
             
@@ -318,13 +342,22 @@ class CinetPayService:
             transaction.gateway_response = webhook_data
             transaction.save()
             
+            logger.info("Webhook CinetPay traité", extra={
+                'event': 'cinetpay.webhook', 'order_number': transaction.order.order_number,
+                'transaction_id': transaction.transaction_id, 'status': status,
+                'latency_ms': round((time.perf_counter() - start) * 1000, 1),
+            })
+            
             return {
                 'success': True,
                 'message': f'Webhook traité avec succès. Statut: {status}'
             }
             
         except Exception as e:
-            logger.error(f"Erreur lors du traitement du webhook CinetPay: {str(e)}")
+            logger.exception("Erreur lors du traitement du webhook CinetPay : %s", e, extra={
+                'event': 'cinetpay.webhook', 'transaction_id': webhook_data.get('transaction_id'),
+                'latency_ms': round((time.perf_counter() - start) * 1000, 1),
+            })
             return {
                 'success': False,
                 'error': str(e)
@@ -354,7 +387,9 @@ class CinetPayService:
                     item.product.increment_downloads()
                     
         except Exception as e:
-            logger.error(f"Erreur lors de la création des liens de téléchargement: {str(e)}")
+            logger.exception("Erreur lors de la création des liens de téléchargement : %s", e, extra={
+                'event': 'downloads.create', 'order_number': order.order_number,
+            })
     
     def _verify_signature(self, webhook_data):
         """Vérifie la signature du webhook CinetPay (à implémenter)"""
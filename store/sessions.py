@@ -0,0 +1,69 @@
+"""
+Moteur de session adaptatif (SESSION_STRATEGY=adaptive).
+
+Les sessions anonymes légères (un petit panier) tiennent dans un cookie
+signé : aucune écriture côté serveur. Dès que la session dépasse
+SESSION_COOKIE_PAYLOAD_LIMIT ou qu'un utilisateur s'y connecte, elle passe
+dans le cache (SESSION_CACHE_ALIAS), où la déconnexion l'invalide vraiment.
+"""
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends.cache import SessionStore as CacheSessionStore
+from django.core import signing
+
+
+COOKIE_PREFIX = 'c.'
+SIGNING_SALT = 'store.sessions'
+
+
+class SessionStore(CacheSessionStore):
+
+    def _in_cookie(self, session_key=None):
+        if session_key is None:
+            session_key = self.session_key
+        return (session_key or '').startswith(COOKIE_PREFIX)
+
+    def _fits_in_cookie(self, data, payload):
+        limit = getattr(settings, 'SESSION_COOKIE_PAYLOAD_LIMIT', 1024)
+        return SESSION_KEY not in data and len(payload) <= limit
+
+    def load(self):
+        if not self._in_cookie():
+            return super().load()
+        try:
+            return signing.loads(
+                self.session_key[len(COOKIE_PREFIX):],
+                serializer=self.serializer,
+                max_age=self.get_session_cookie_age(),
+                salt=SIGNING_SALT,
+            )
+        except Exception:
+            # Signature invalide ou expirée : nouvelle session
+            self._session_key = None
+            return {}
+
+    def save(self, must_create=False):
+        data = self._get_session(no_load=must_create)
+        payload = signing.dumps(data, compress=True, salt=SIGNING_SALT, serializer=self.serializer)
+        if self._fits_in_cookie(data, payload):
+            if self.session_key and not self._in_cookie():
+                self._cache.delete(self.cache_key)
+            self._session_key = COOKIE_PREFIX + payload
+            self.modified = True
+            return
+        if self._in_cookie():
+            # Passage du cookie au cache : nouvelle clé aléatoire
+            self._session_key = None
+        super().save(must_create=must_create)
+
+    def exists(self, session_key):
+        return not self._in_cookie(session_key) and super().exists(session_key)
+
+    def delete(self, session_key=None):
+        if self._in_cookie(session_key):
+            if session_key is None:
+                self._session_key = ''
+                self._session_cache = {}
+                self.modified = True
+            return
+        super().delete(session_key)
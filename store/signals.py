@@ -0,0 +1,107 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .images import schedule_variants
+from .models import (
+    Product, VideoSequence, Review, Order, OrderItem, Payment, PurchaseEntitlement,
+    Category, BookCollection, PersonalDevelopmentSection,
+)
+
+
+@receiver(post_save, sender=VideoSequence)
+@receiver(post_delete, sender=VideoSequence)
+def update_product_video_aggregates(sender, instance, **kwargs):
+    """Maintient les agrégats de séquences vidéo du produit à jour (et de l'ancien produit si elle a été déplacée)"""
+    if kwargs.get('raw'):
+        return
+    product_ids = {instance.product_id, getattr(instance, '_loaded_product_id', instance.product_id)}
+    instance._loaded_product_id = instance.product_id
+    for product in Product.video_aggregates_queryset().filter(pk__in=product_ids):
+        if not product.refresh_video_aggregates():
+            # Agrégats inchangés (titre, description...) : invalide quand même les fragments en cache
+            Product.objects.filter(pk=product.pk).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Review)
+def update_product_rating_on_save(sender, instance, created, **kwargs):
+    """Applique la variation de note de l'avis au produit (incrémental, via F())"""
+    if kwargs.get('raw'):
+        return
+    current = instance.rating_state()
+    if created:
+        previous = None
+    elif hasattr(instance, '_rating_state'):
+        previous = instance._rating_state
+    else:
+        # État initial inconnu (instance construite à la main) : recalcul complet
+        Product.objects.get(pk=instance.product_id).recompute_rating()
+        instance._rating_state = current
+        return
+    instance.apply_rating_change(previous, current)
+    instance._rating_state = current
+
+
+@receiver(post_delete, sender=Review)
+def update_product_rating_on_delete(sender, instance, **kwargs):
+    instance.apply_rating_change(getattr(instance, '_rating_state', instance.rating_state()), None)
+
+
+@receiver(post_save, sender=Order)
+def update_purchase_entitlements(sender, instance, **kwargs):
+    """Accorde l'accès aux produits d'une commande payée, le retire si elle revient en attente, est annulée ou remboursée"""
+    if kwargs.get('raw'):
+        return
+    if instance.status == 'paid':
+        PurchaseEntitlement.grant_for_order(instance)
+    elif instance.status in PurchaseEntitlement.REVOKING_STATUSES:
+        PurchaseEntitlement.revoke_for_order(instance)
+
+
+@receiver(post_save, sender=Payment)
+def revoke_entitlements_for_payment(sender, instance, **kwargs):
+    """Paiement terminé devenu échoué, annulé ou remboursé (la commande peut rester 'paid')"""
+    if kwargs.get('raw'):
+        return
+    PurchaseEntitlement.revoke_for_payment(instance)
+    instance._loaded_status = instance.status
+
+
+@receiver(post_save, sender=OrderItem)
+def grant_entitlement_for_item(sender, instance, created, **kwargs):
+    """Article ajouté à une commande déjà payée (ex. inline de l'admin)"""
+    if created and not kwargs.get('raw') and instance.order.status == 'paid':
+        PurchaseEntitlement.grant(instance.order.user_id, [instance.product_id], instance.order_id)
+
+
+@receiver(post_delete, sender=OrderItem)
+def revoke_entitlement_for_item(sender, instance, **kwargs):
+    """Article retiré d'une commande (les droits d'une commande supprimée partent en cascade)"""
+    PurchaseEntitlement.revoke_for_item(instance)
+
+
+@receiver(post_delete, sender=PurchaseEntitlement)
+def forget_entitlement(sender, instance, **kwargs):
+    """Tout droit supprimé (remboursement, commande ou article supprimé) : cache invalidé"""
+    PurchaseEntitlement.forget(instance.user_id, instance.product_id)
+
+
+IMAGE_FIELDS = {
+    Product: 'cover_image',
+    Category: 'image',
+    BookCollection: 'cover_image',
+    PersonalDevelopmentSection: 'image',
+    VideoSequence: 'thumbnail',
+}
+
+
+def generate_image_variants(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Déclinaisons de l'image après enregistrement (ignoré si l'image n'est pas concernée)"""
+    field_name = IMAGE_FIELDS[sender]
+    if raw or (update_fields is not None and field_name not in update_fields):
+        return
+    schedule_variants(getattr(instance, field_name))
+
+
+for model in IMAGE_FIELDS:
+    post_save.connect(generate_image_variants, sender=model, dispatch_uid=f'image_variants_{model.__name__}')
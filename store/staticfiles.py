@@ -0,0 +1,16 @@
+"""
+Stockage des fichiers statiques : noms hachés par collectstatic (cache
+navigateur immuable) et variantes gzip / brotli générées une fois pour
+toutes, servies telles quelles par WhiteNoise.
+"""
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class StaticFilesStorage(CompressedManifestStaticFilesStorage):
+
+    def stored_name(self, name):
+        # Sans manifeste (collectstatic pas encore lancé : tests, poste de développement),
+        # URL non hachée plutôt qu'une erreur de rendu
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
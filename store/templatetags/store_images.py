@@ -0,0 +1,47 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from store.images import RETINA_SIZES, variant_name, variants_ready
+
+register = template.Library()
+
+
+@register.filter
+def has_variants(field):
+    """
+    Les variantes de l'image existent-elles ? À ajouter à la clé des
+    {% cache %} contenant {% picture %} : elles sont générées après
+    l'enregistrement, sans modifier updated_at.
+
+        {% cache 3600 product_card product.pk product.updated_at product.cover_image|has_variants %}
+    """
+    return bool(field) and variants_ready(field.name, field.storage)
+
+
+@register.simple_tag
+def picture(field, size, **attrs):
+    """
+    <picture> WebP + JPEG à la taille demandée (et 2x pour les écrans haute
+    densité) ; l'original tant que les variantes ne sont pas générées.
+
+        {% picture product.cover_image 'card' alt=product.title class="w-full h-48" %}
+    """
+    if not field:
+        return ''
+    attrs.setdefault('decoding', 'async')
+    if size != 'detail':
+        attrs.setdefault('loading', 'lazy')
+    if not variants_ready(field.name, field.storage):
+        return format_html('<img src="{}"{}>', field.url, flatatt(attrs))
+
+    def srcset(fmt):
+        urls = [f'{field.storage.url(variant_name(field.name, size, fmt))} 1x']
+        if size in RETINA_SIZES:
+            urls.append(f'{field.storage.url(variant_name(field.name, RETINA_SIZES[size], fmt))} 2x')
+        return ', '.join(urls)
+
+    return format_html(
+        '<picture class="contents"><source type="image/webp" srcset="{}"><img src="{}" srcset="{}"{}></picture>',
+        srcset('webp'), field.storage.url(variant_name(field.name, size, 'jpg')), srcset('jpg'), flatatt(attrs),
+    )
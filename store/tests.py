@@ -1,3 +1,1353 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import logging
+import os
+import runpy
+import shutil
+import subprocess
+import tempfile
+import unittest
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, connections, router
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.template import Context, Template
+from django.urls import include, path, resolve, reverse
+from django.utils import timezone
+from PIL import Image
+from social_core.exceptions import AuthException
+from social_django.models import UserSocialAuth
+from social_django.utils import load_backend, load_strategy
+
+from . import async_views, urls as store_urls, views
+from .models import Category, Product, Order, OrderItem, Download, Payment, BookCollection, PersonalDevelopmentSection, VideoSequence, Review, PurchaseEntitlement
+from .accounts import registration_conflicts
+from .conditional import product_detail_validator
+from .images import generate_variants, variant_names
+from .jsonlog import QueueFileHandler
+from .media import ContentAddressedStorage, content_digest
+from .pagination import KeysetPaginator
+from .metrics import registry as metrics_registry
+from .middleware import QueryMetricsMiddleware
+from .ratelimit import consume
+from .recommendations import build_recommendations
+from .routers import REPLICA_ALIAS, STICKY_COOKIE_NAME, read_from_replica
+from .staticfiles import StaticFilesStorage
+from .video import ffmpeg_available, hls_command, renditions_for
+from .management.commands import explain_hot_queries
+
+
+def create_catalog(size, prefix):
+    """Crée `size` éléments liés pour chaque modèle affiché en liste dans l'admin"""
+    user = User.objects.create_user(username=f'{prefix}-client', email=f'{prefix}@example.com')
+    for i in range(size):
+        category = Category.objects.create(name=f'{prefix} cat {i}', slug=f'{prefix}-cat-{i}')
+        collection = BookCollection.objects.create(
+            title=f'{prefix} collection {i}', slug=f'{prefix}-collection-{i}', description='-',
+            cover_image='collections/x.jpg', price_fcfa=Decimal('1000'), price_eur=Decimal('2'),
+        )
+        section = PersonalDevelopmentSection.objects.create(
+            name=f'{prefix} section {i}', slug=f'{prefix}-section-{i}', description='-', sub_section='motivation',
+        )
+        product = Product.objects.create(
+            title=f'{prefix} produit {i}', slug=f'{prefix}-produit-{i}', description='-', short_description='-',
+            category=category, collection=collection, personal_development_section=section,
+            price_fcfa=Decimal('1000'), price_eur=Decimal('2'),
+            cover_image='products/x.jpg', product_file='product_files/x.pdf',
+        )
+        VideoSequence.objects.create(product=product, title=f'Séquence {i}', video_file='video_sequences/x.mp4')
+        order = Order.objects.create(
+            user=user, subtotal_fcfa=1000, subtotal_eur=2, total_fcfa=1180, total_eur=Decimal('2.36'),
+            customer_email=user.email, customer_name=user.username,
+        )
+        OrderItem.objects.create(order=order, product=product, price_fcfa=1000, price_eur=2)
+
+
+CATALOG_URL_NAMES = {pattern.name for pattern in store_urls.catalog_patterns(views)}
+
+
+class AsgiUrlconf:
+    """ROOT_URLCONF de test : catalogue routé comme derrière novalearnweb/asgi.py"""
+    urlpatterns = [
+        path('', include((
+            store_urls.catalog_patterns(async_views)
+            + [pattern for pattern in store_urls.urlpatterns if pattern.name not in CATALOG_URL_NAMES],
+            'store',
+        ))),
+        path('oauth/', include('social_django.urls', namespace='social')),
+        path('admin/', admin.site.urls),
+    ]
+
+
+class AdminChangelistQueryCountTests(TestCase):
+    """Le nombre de requêtes d'une page de liste admin ne dépend pas du nombre de lignes"""
+
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.admin_user)
+
+    def count_changelist_queries(self, model):
+        url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_changelist_query_count_is_constant(self):
+        models = [model for model in admin.site._registry if model._meta.app_label == 'store']
+
+        create_catalog(2, 'a')
+        small = {model: self.count_changelist_queries(model) for model in models}
+
+        create_catalog(8, 'b')
+        for model in models:
+            with self.subTest(model=model.__name__):
+                self.assertEqual(self.count_changelist_queries(model), small[model])
+
+    def test_count_columns_are_sortable(self):
+        create_catalog(3, 'c')
+        # Nombres de produits distincts : c-cat-2 → 0, c-cat-0 → 1, c-cat-1 → 2
+        Product.objects.filter(slug='c-produit-2').update(category=Category.objects.get(slug='c-cat-1'))
+        url = reverse('admin:store_category_changelist')
+        # La colonne product_count est la 5e de list_display
+        for order, expected in (('5', ['c-cat-2', 'c-cat-0', 'c-cat-1']), ('-5', ['c-cat-1', 'c-cat-0', 'c-cat-2'])):
+            with self.subTest(o=order):
+                response = self.client.get(url, {'o': order})
+                self.assertEqual(response.status_code, 200)
+                results = response.context['cl'].result_list
+                self.assertEqual([category.slug for category in results], expected)
+                counts = [category.product_count_annotated for category in results]
+                self.assertEqual(counts, sorted(counts, reverse=order.startswith('-')))
+
+
+class HotQueryIndexTests(TestCase):
+    """Les requêtes fréquentes des vues utilisent un index (explain_hot_queries)"""
+
+    def test_every_hot_query_uses_an_index(self):
+        create_catalog(2, 'x')
+        out = io.StringIO()
+        call_command('explain_hot_queries', stdout=out)
+        output = out.getvalue()
+        self.assertNotIn('[SCAN ]', output)
+        for label, _ in explain_hot_queries.hot_queries():
+            self.assertIn(f'[INDEX] {label}', output)
+        self.assertIn('Toutes les requêtes utilisent un index', output)
+
+    def test_full_scan_is_reported_with_its_plan(self):
+        queries = [('scan: tous les produits', Product.objects.filter(short_description='-'))]
+        out = io.StringIO()
+        with mock.patch.object(explain_hot_queries, 'hot_queries', return_value=queries):
+            call_command('explain_hot_queries', stdout=out)
+        output = out.getvalue()
+        self.assertIn('[SCAN ] scan: tous les produits', output)
+        self.assertIn('SCAN store_product', output)
+        self.assertIn('1 requête(s) sans index', output)
+
+
+@override_settings(QUERY_METRICS_ENABLED=True, QUERY_METRICS_TEMPLATES=True, QUERY_METRICS_TOKEN='jeton',
+                   QUERY_METRICS_N_PLUS_ONE_THRESHOLD=3)
+class QueryMetricsTests(TestCase):
+    """Instrumentation des requêtes : comptage SQL, N+1, Server-Timing et export Prometheus"""
+
+    def setUp(self):
+        metrics_registry.reset()
+        create_catalog(2, 'm')
+
+    def test_counts_every_query_of_the_request(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('store:product_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="(\d+) queries", tpl;dur=[\d.]+, total;dur=[\d.]+$')
+        self.assertIn(f'desc="{len(queries)} queries"', response['Server-Timing'])
+        snapshot = metrics_registry.snapshot()['store:product_list']
+        self.assertEqual((snapshot['requests'], snapshot['avg_queries']), (1, len(queries)))
+        self.assertGreater(snapshot['avg_template_ms'], 0)
+
+    def test_repeated_query_logged_as_n_plus_one(self):
+        def view(request):
+            for product in Product.objects.all()[:2]:
+                for _ in range(2):
+                    list(Category.objects.filter(pk=product.category_id))
+            return HttpResponse()
+
+        request = RequestFactory().get('/boucle/')
+        request.resolver_match = None
+        with self.assertLogs('store.middleware', 'WARNING') as logs:
+            response = QueryMetricsMiddleware(view)(request)
+        self.assertIn('5 queries', response['Server-Timing'])
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('répétée 4 fois', logs.output[0])
+        self.assertEqual(metrics_registry.snapshot()['unresolved']['n_plus_one'], 1)
+
+    def test_metrics_endpoint_requires_staff_or_token(self):
+        self.client.get(reverse('store:product_list'))
+        url = reverse('store:metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer autre').status_code, 403)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer jeton')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('store_view_queries_count{view="store:product_list"} 1', response.content.decode())
+
+        self.client.force_login(User.objects.create_user('admin-m', is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, 200)
+        with override_settings(QUERY_METRICS_ENABLED=False):
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class BenchmarkDataTests(TestCase):
+    """Catalogue synthétique reproductible de generate_benchmark_data"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def generate(self, **options):
+        sizes = dict(categories=3, products=20, users=5, orders=30, reviews=15, sequences=10, stdout=io.StringIO())
+        call_command('generate_benchmark_data', **sizes, **options)
+
+    def snapshot(self):
+        return (
+            list(Product.objects.filter(slug__startswith='bench-').order_by('slug').values_list('title', 'price_fcfa')),
+            list(Order.objects.filter(order_number__startswith='BENCH-').values_list(
+                'order_number', 'status', 'total_fcfa', 'items__product__slug',
+            ).order_by('order_number', 'items__product__slug')),
+        )
+
+    def test_generates_requested_sizes_and_consistent_rows(self):
+        self.generate()
+        self.assertEqual(Category.objects.filter(slug__startswith='bench-').count(), 3)
+        self.assertEqual(Product.objects.filter(slug__startswith='bench-').count(), 20)
+        self.assertEqual(VideoSequence.objects.filter(product__slug__startswith='bench-').count(), 10)
+        self.assertEqual(Order.objects.filter(order_number__startswith='BENCH-').count(), 30)
+        # Droits d'accès et liens de téléchargement pour les seules commandes payées
+        paid_pairs = set(OrderItem.objects.filter(order__status='paid').values_list('order__user_id', 'product_id'))
+        self.assertEqual(set(PurchaseEntitlement.objects.values_list('user_id', 'product_id')), paid_pairs)
+        self.assertFalse(Download.objects.exclude(order__status='paid').exists())
+        # Agrégats dénormalisés recalculés malgré bulk_create
+        for product in Product.objects.filter(slug__startswith='bench-'):
+            self.assertEqual(product.rating_count, product.reviews.filter(is_approved=True).count())
+        with Image.open(os.path.join(self.media_root, 'bench', 'cover.jpg')) as cover:
+            self.assertEqual(cover.size, (600, 900))
+
+    def test_same_seed_regenerates_same_catalog(self):
+        self.generate(seed=7)
+        first = self.snapshot()
+        self.generate(seed=7, clear=True)
+        self.assertEqual(self.snapshot(), first)
+        self.generate(seed=8, clear=True)
+        self.assertNotEqual(self.snapshot(), first)
+
+
+class KeysetPaginatorTests(TestCase):
+    """Pagination par curseur des commandes : ordre stable, navigation, curseurs invalides"""
+
+    def setUp(self):
+        create_catalog(5, 'k')
+        orders = Order.objects.order_by('pk')
+        base = timezone.now()
+        # Trois commandes à la même date : départagées par id
+        for order, minutes in zip(orders, (0, 10, 10, 10, 20)):
+            Order.objects.filter(pk=order.pk).update(created_at=base + timedelta(minutes=minutes))
+        self.expected = list(Order.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+        self.paginator = KeysetPaginator(Order.objects.all(), 2)
+
+    def ids(self, page):
+        return [order.pk for order in page]
+
+    def test_cursor_round_trip(self):
+        order = Order.objects.get(pk=self.expected[2])
+        cursor = self.paginator.encode_cursor(order)
+        self.assertNotIn('=', cursor)
+        self.assertEqual(self.paginator.decode_cursor(cursor), (order.created_at, order.pk))
+
+    def test_after_and_before_navigation_with_ties(self):
+        pages = [self.paginator.get_page()]
+        while pages[-1].has_next():
+            pages.append(self.paginator.get_page(after=pages[-1].next_cursor))
+        self.assertEqual([pk for page in pages for pk in self.ids(page)], self.expected)
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertFalse(pages[0].has_previous())
+        self.assertEqual(pages[-1].next_cursor, '')
+
+        # Retour en arrière depuis la dernière page : mêmes pages, même ordre
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = self.paginator.get_page(before=page.previous_cursor)
+            self.assertEqual(self.ids(page), self.ids(expected))
+            self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        first = self.ids(self.paginator.get_page())
+        tampered = [
+            'pas-un-curseur!',
+            base64.urlsafe_b64encode(b'2024-01-01T00:00:00|abc').decode(),
+            base64.urlsafe_b64encode(b'hier|12').decode(),
+            base64.urlsafe_b64encode(b'\xff\xfe\xfd').decode(),
+        ]
+        for cursor in tampered:
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(self.paginator.decode_cursor(cursor))
+                for page in (self.paginator.get_page(after=cursor), self.paginator.get_page(before=cursor)):
+                    self.assertEqual(self.ids(page), first)
+                    self.assertFalse(page.has_previous())
+
+
+class ProductVideoAggregatesTests(TestCase):
+    """Les agrégats de séquences vidéo suivent les créations, modifications et suppressions"""
+
+    def setUp(self):
+        create_catalog(1, 'v')
+        self.product = Product.objects.get(slug='v-produit-0')
+
+    def test_aggregates_follow_sequence_changes(self):
+        sequence = VideoSequence.objects.create(
+            product=self.product, title='Aperçu', video_file='video_sequences/y.mp4', duration=30, is_preview=True,
+        )
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.video_sequence_count, 2)
+        self.assertEqual(self.product.video_total_minutes, 30)
+        self.assertTrue(self.product.has_preview_sequence())
+        self.assertEqual(self.product.composite_type, 'video_sequences')
+
+        sequence.is_active = False
+        sequence.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.get_total_video_count(), 1)
+        self.assertFalse(self.product.has_preview_sequence())
+
+        self.product.video_sequences.all().delete()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.video_sequence_count, 0)
+        self.assertEqual(self.product.composite_type, 'collection')
+
+    def test_moving_a_sequence_refreshes_both_products(self):
+        create_catalog(1, 'w')
+        other = Product.objects.get(slug='w-produit-0')
+        sequence = VideoSequence.objects.get(product=self.product)
+        sequence.product = other
+        sequence.save()
+        self.product.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.product.video_sequence_count, self.product.composite_type), (0, 'collection'))
+        self.assertEqual(other.video_sequence_count, 2)
+
+        # Instance déjà enregistrée : le déplacement suivant part du nouveau produit
+        sequence.product = self.product
+        sequence.save()
+        other.refresh_from_db()
+        self.assertEqual(other.video_sequence_count, 1)
+
+    def test_composite_methods_run_no_queries(self):
+        with self.assertNumQueries(0):
+            self.product.get_total_video_count()
+            self.product.get_total_duration_display()
+            self.product.has_preview_sequence()
+            self.product.is_composite_product()
+
+
+class ProductRatingAggregationTests(TestCase):
+    """La note moyenne est maintenue de façon incrémentale par les avis"""
+
+    def setUp(self):
+        create_catalog(1, 'r')
+        self.product = Product.objects.get(slug='r-produit-0')
+        self.users = [User.objects.create_user(username=f'lecteur-{i}') for i in range(3)]
+
+    def create_review(self, user, rating, is_approved=True):
+        return Review.objects.create(
+            product=self.product, user=user, rating=rating, title='Avis', comment='-', is_approved=is_approved,
+        )
+
+    def assertRating(self, rating_sum, rating_count, rating):
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.rating_sum, self.product.rating_count), (rating_sum, rating_count))
+        self.assertAlmostEqual(float(self.product.rating), rating, places=2)
+
+    def test_create_update_delete(self):
+        first = self.create_review(self.users[0], 5)
+        self.create_review(self.users[1], 2)
+        self.create_review(self.users[2], 4, is_approved=False)
+        self.assertRating(7, 2, 3.5)
+
+        review = Review.objects.get(pk=first.pk)
+        review.rating = 3
+        review.save()
+        self.assertRating(5, 2, 2.5)
+
+        review.delete()
+        self.assertRating(2, 1, 2.0)
+
+    def test_admin_bulk_approval(self):
+        self.create_review(self.users[0], 5, is_approved=False)
+        self.create_review(self.users[1], 4, is_approved=False)
+        self.assertRating(0, 0, 0)
+
+        self.assertEqual(Review.bulk_set_approved(Review.objects.all(), True), 2)
+        self.assertRating(9, 2, 4.5)
+
+        Review.bulk_set_approved(Review.objects.filter(rating=5), False)
+        self.assertRating(4, 1, 4.0)
+
+        Review.objects.all().delete()
+        self.assertRating(0, 0, 0)
+
+    def test_add_review_view(self):
+        self.client.force_login(self.users[0])
+        url = reverse('store:add_review', args=[self.product.slug])
+        self.client.post(url, {'rating': 4, 'title': 'Bien', 'comment': 'Très bien'})
+        self.client.post(url, {'rating': 2, 'title': 'Bof', 'comment': 'Finalement'})
+        self.assertRating(2, 1, 2.0)
+
+
+class CollectionAggregatesTests(TestCase):
+    """Listes de collections et de sections : nombre de requêtes indépendant du nombre de cartes"""
+
+    def listing_queries(self, url_name):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(reverse(url_name)).status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_listing_queries_do_not_grow(self):
+        create_catalog(1, 'a')
+        baseline = {name: self.listing_queries(name) for name in ('store:book_collections', 'store:personal_development')}
+        create_catalog(4, 'b')
+        for name, count in baseline.items():
+            self.assertEqual(self.listing_queries(name), count, name)
+
+    def test_annotated_savings_match_individual_prices(self):
+        create_catalog(1, 'a')
+        collection = BookCollection.objects.get(slug='a-collection-0')
+        Product.objects.filter(collection=collection).update(price_fcfa=Decimal('1500'))
+        annotated = BookCollection.book_aggregates_queryset().get(pk=collection.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(annotated.get_books_count(), 1)
+            self.assertEqual(annotated.get_savings_fcfa(), Decimal('500'))
+        self.assertEqual(collection.get_savings_fcfa(), annotated.get_savings_fcfa())
+
+
+class ProductRecommendationTests(TestCase):
+    """Les voisins pré-calculés privilégient les produits achetés ensemble"""
+
+    def setUp(self):
+        create_catalog(4, 'p')
+        self.products = list(Product.objects.filter(slug__startswith='p-produit-').order_by('slug'))
+        user = User.objects.get(username='p-client')
+        # Produits 0 et 3 achetés ensemble, de catégories différentes
+        for _ in range(2):
+            order = Order.objects.create(
+                user=user, subtotal_fcfa=2000, subtotal_eur=4, total_fcfa=2360, total_eur=Decimal('4.72'),
+                customer_email=user.email, customer_name=user.username, status='paid',
+            )
+            for product in (self.products[0], self.products[3]):
+                OrderItem.objects.create(order=order, product=product, price_fcfa=1000, price_eur=2)
+
+    def test_co_purchased_product_ranks_first(self):
+        self.assertEqual(build_recommendations(top_k=2), 8)
+        first = self.products[0].recommendations.get(rank=1)
+        self.assertEqual(first.recommended, self.products[3])
+        self.assertFalse(self.products[0].recommendations.filter(recommended=self.products[0]).exists())
+
+    def test_product_page_uses_recommendations(self):
+        build_recommendations(top_k=2)
+        response = self.client.get(reverse('store:product_detail', args=[self.products[0].slug]))
+        self.assertEqual(response.context['similar_products'][0], self.products[3])
+
+
+class PurchaseEntitlementTests(TestCase):
+    """Les droits d'accès suivent le statut des commandes"""
+
+    def setUp(self):
+        cache.clear()
+        create_catalog(2, 'e')
+        self.user = User.objects.get(username='e-client')
+        self.order = Order.objects.filter(user=self.user).first()
+        self.product = self.order.items.get().product
+
+    def owns(self):
+        # Nouvel objet utilisateur : pas de mémorisation d'une requête précédente
+        return PurchaseEntitlement.user_owns(User.objects.get(pk=self.user.pk), self.product)
+
+    def test_grant_and_revoke_follow_order_status(self):
+        self.assertFalse(self.owns())
+        self.order.status = 'paid'
+        self.order.save()
+        self.assertTrue(self.owns())
+        self.order.status = 'refunded'
+        self.order.save()
+        self.assertFalse(self.owns())
+
+    def test_order_back_to_pending_revokes_access(self):
+        self.order.status = 'paid'
+        self.order.save()
+        self.assertTrue(self.owns())
+        self.order.status = 'pending'
+        self.order.save()
+        self.assertFalse(self.owns())
+
+    def test_failed_or_refunded_payment_revokes_access(self):
+        self.order.status = 'paid'
+        self.order.save()
+        Payment.objects.create(
+            payment_id='e-pay-1', order=self.order, payment_method='cinetpay',
+            amount_fcfa=1180, amount_eur=Decimal('2.36'), status='completed',
+        )
+        for status in ('failed', 'refunded'):
+            with self.subTest(status=status):
+                PurchaseEntitlement.grant_for_order(self.order)
+                Payment.objects.filter(payment_id='e-pay-1').update(status='completed')
+                payment = Payment.objects.get(payment_id='e-pay-1')
+                payment.status = status
+                payment.save()
+                self.assertFalse(self.owns())
+
+    def test_failed_attempt_keeps_access_of_completed_payment(self):
+        self.order.status = 'paid'
+        self.order.save()
+        for payment_id, status in (('e-pay-1', 'completed'), ('e-pay-2', 'completed')):
+            Payment.objects.create(
+                payment_id=payment_id, order=self.order, payment_method='cinetpay',
+                amount_fcfa=1180, amount_eur=Decimal('2.36'), status=status,
+            )
+        payment = Payment.objects.get(payment_id='e-pay-2')
+        payment.status = 'failed'
+        payment.save()
+        self.assertTrue(self.owns())
+
+    def test_deleting_item_or_order_revokes_access(self):
+        self.order.status = 'paid'
+        self.order.save()
+        self.assertTrue(self.owns())
+        self.order.items.get().delete()
+        self.assertFalse(self.owns())
+
+        OrderItem.objects.create(order=self.order, product=self.product, price_fcfa=1000, price_eur=2)
+        self.assertTrue(self.owns())
+        self.order.delete()
+        self.assertFalse(self.owns())
+
+    def test_access_restored_from_other_paid_order(self):
+        self.order.status = 'paid'
+        self.order.save()
+        other = Order.objects.create(
+            user=self.user, subtotal_fcfa=1000, subtotal_eur=2, total_fcfa=1180, total_eur=Decimal('2.36'),
+            customer_email=self.user.email, customer_name=self.user.username, status='paid',
+        )
+        OrderItem.objects.create(order=other, product=self.product, price_fcfa=1000, price_eur=2)
+        self.assertEqual(PurchaseEntitlement.objects.get(user=self.user, product=self.product).order, self.order)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order.delete()
+        self.assertEqual(PurchaseEntitlement.objects.get(user=self.user, product=self.product).order, other)
+
+    def test_positive_results_not_cached_in_process_local_cache(self):
+        self.order.status = 'paid'
+        self.order.save()
+        self.assertTrue(self.owns())
+        self.assertIsNone(cache.get(PurchaseEntitlement.cache_key(self.user.pk, self.product.pk)))
+
+    def test_video_sequences_access_check_is_one_query(self):
+        self.order.status = 'paid'
+        self.order.save()
+        cache.clear()
+        self.client.force_login(self.user)
+        url = reverse('store:product_video_sequences', args=[self.product.pk])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        entitlement_queries = [q for q in ctx.captured_queries if 'store_purchaseentitlement' in q['sql']]
+        self.assertEqual(len(entitlement_queries), 1)
+        self.assertFalse(any('store_orderitem' in q['sql'] for q in ctx.captured_queries))
+
+
+class ConditionalCatalogResponseTests(TestCase):
+    """Les pages du catalogue répondent 304 tant que leur contenu n'a pas changé"""
+
+    def setUp(self):
+        create_catalog(1, 'g')
+        self.product = Product.objects.get(slug='g-produit-0')
+        self.url = reverse('store:product_detail', args=[self.product.slug])
+
+    def test_not_modified_until_product_changes(self):
+        # La première visite pose le cookie CSRF, qui entre dans le validateur
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any('views_count' in q['sql'] for q in ctx.captured_queries))
+
+        self.product.title = 'Nouveau titre'
+        self.product.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_varies_with_user(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.force_login(User.objects.get(username='g-client'))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertNotIn('Last-Modified', response)
+
+    def test_validator_follows_collection_books_in_one_query(self):
+        collection = self.product.collection
+        other = Product.objects.filter(collection=collection).exclude(pk=self.product.pk).first() or self.product
+        request = RequestFactory().get(self.url)
+        request.user = AnonymousUser()
+        with self.assertNumQueries(1):
+            before = product_detail_validator(request, self.product.slug)
+        Product.objects.filter(pk=other.pk).update(updated_at=timezone.now() + timedelta(minutes=1))
+        after = product_detail_validator(request, self.product.slug)
+        self.assertNotEqual(before, after)
+        self.assertEqual(after[0], self.product.pk)
+
+    def test_collection_and_category_pages(self):
+        for url in (
+            reverse('store:category_detail', args=['g-cat-0']),
+            reverse('store:book_collection_detail', args=['g-collection-0']),
+            reverse('store:personal_development_section', args=['g-section-0']),
+        ):
+            with self.subTest(url=url):
+                # Client sans cookie (robot d'indexation)
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.client.cookies.clear()
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_if_modified_since_alone_sees_removed_book(self):
+        url = reverse('store:category_detail', args=['g-cat-0'])
+        response = self.client.get(url)
+        # Le nombre de produits entre dans le validateur : pas de Last-Modified
+        self.assertNotIn('Last-Modified', response)
+        self.client.cookies.clear()
+        Product.objects.filter(category__slug='g-cat-0').first().delete()
+        since = 'Fri, 01 Jan 2100 00:00:00 GMT'
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=since).status_code, 200)
+
+
+@override_settings(ROOT_URLCONF=AsgiUrlconf)
+class AsyncCatalogViewsTests(TestCase):
+    """Vues du catalogue async servies par le client ASGI"""
+
+    def setUp(self):
+        create_catalog(1, 'y')
+        self.product = Product.objects.get(slug='y-produit-0')
+
+    @override_settings(ROOT_URLCONF='novalearnweb.urls')
+    def test_wsgi_deployment_routes_sync_views(self):
+        # settings.ASGI n'est posé que par novalearnweb/asgi.py
+        for name, args in (('home', []), ('product_detail', [self.product.slug]), ('product_search', [])):
+            self.assertFalse(iscoroutinefunction(resolve(reverse(f'store:{name}', args=args)).func), name)
+
+    async def test_sequence_preview_reports_missing_file(self):
+        sequence = await VideoSequence.objects.aget(product=self.product)
+        self.assertTrue(iscoroutinefunction(resolve(reverse('store:sequence_video_preview', args=[sequence.pk])).func))
+        response = await self.async_client.get(reverse('store:sequence_video_preview', args=[sequence.pk]))
+        self.assertEqual((response.status_code, response.json()), (404, {'error': 'Fichier vidéo introuvable'}))
+
+    async def test_async_views_render(self):
+        response = await self.async_client.get(reverse('store:product_search'), {'q': 'y produit'})
+        self.assertEqual([p['id'] for p in response.json()['products']], [self.product.pk])
+
+        for url in (reverse('store:home'), reverse('store:product_list'),
+                    reverse('store:product_detail', args=[self.product.slug])):
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+        response = await self.async_client.get(url, headers={'if-none-match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(QUERY_METRICS_ENABLED=True)
+    async def test_query_metrics_keep_the_chain_async(self):
+        async def view(request):
+            return HttpResponse()
+        self.assertTrue(iscoroutinefunction(QueryMetricsMiddleware(view)))
+        # Requêtes exécutées dans les threads de sync_to_async, comptées quand même
+        response = await self.async_client.get(reverse('store:product_search'), {'q': 'y produit'})
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries"')
+
+
+@override_settings(SESSION_ENGINE='store.sessions', SESSION_COOKIE_PAYLOAD_LIMIT=1024)
+class AdaptiveSessionTests(TestCase):
+    """Petits paniers anonymes en cookie signé, sessions connectées dans le cache"""
+
+    def setUp(self):
+        cache.clear()
+        create_catalog(1, 's')
+        self.product = Product.objects.get(slug='s-produit-0')
+        self.session_cookie = lambda: self.client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    def update_cart(self, quantity):
+        return self.client.post(
+            reverse('store:update_cart'), {'product_id': self.product.pk, 'quantity': quantity},
+            content_type='application/json',
+        )
+
+    def test_small_anonymous_cart_lives_in_cookie(self):
+        self.client.post(reverse('store:add_to_cart', args=[self.product.pk]), {'quantity': 1})
+        self.assertTrue(self.session_cookie().startswith('c.'))
+        self.assertEqual(self.client.session['cart'], {str(self.product.pk): 1})
+
+        self.client.force_login(User.objects.get(username='s-client'))
+        self.assertFalse(self.session_cookie().startswith('c.'))
+        self.assertEqual(self.client.session['cart'], {str(self.product.pk): 1})
+
+    def test_large_session_moves_to_cache(self):
+        session = self.client.session
+        session['cart'] = {str(i): 1 for i in range(500)}
+        session.save()
+        self.assertFalse(session.session_key.startswith('c.'))
+        self.assertIn(session.cache_key, cache)
+
+    def test_unchanged_cart_is_not_rewritten(self):
+        self.update_cart(2)
+        self.assertIn(settings.SESSION_COOKIE_NAME, self.update_cart(3).cookies)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.update_cart(3).cookies)
+
+
+class ImageVariantTests(TestCase):
+    """Variantes WebP/JPEG générées après l'enregistrement et servies par {% picture %}"""
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, IMAGE_VARIANT_WORKERS=0)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        create_catalog(1, 'i')
+        self.product = Product.objects.get(slug='i-produit-0')
+
+    def upload(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (1600, 1000), 'teal').save(buffer, 'PNG')
+        self.product.cover_image = SimpleUploadedFile('couverture.png', buffer.getvalue(), content_type='image/png')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+
+    def render(self):
+        template = Template("{% load store_images %}{% picture product.cover_image 'card' alt='x' %}")
+        return template.render(Context({'product': self.product}))
+
+    def test_variants_generated_and_rendered(self):
+        self.upload()
+        storage = self.product.cover_image.storage
+        for name in variant_names(self.product.cover_image.name):
+            self.assertTrue(storage.exists(name), name)
+        with storage.open(self.product.cover_image.name.rsplit('.', 1)[0] + '.card.webp') as variant:
+            self.assertEqual(Image.open(variant).size, (640, 400))
+
+        html = self.render()
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('.card.jpg 1x', html)
+        self.assertIn('.detail.jpg 2x', html)
+        self.assertIn('loading="lazy"', html)
+
+    def test_falls_back_to_original_without_variants(self):
+        self.upload()
+        for name in variant_names(self.product.cover_image.name):
+            self.product.cover_image.storage.delete(name)
+        cache.clear()
+        self.assertIn(f'src="{self.product.cover_image.url}"', self.render())
+
+    def test_batch_command_resumes_from_manifest(self):
+        os.makedirs(os.path.join(self.media_root, 'collections'))
+        for index in range(2):
+            Image.new('RGB', (800, 600), 'navy').save(os.path.join(self.media_root, 'collections', f'c{index}.jpg'))
+        out = io.StringIO()
+        call_command('generate_image_variants', workers=0, stdout=out)
+        self.assertIn('2 images traitées', out.getvalue())
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, 'collections', 'c1.thumb.webp')))
+
+        out = io.StringIO()
+        call_command('generate_image_variants', workers=0, stdout=out)
+        self.assertIn("0 images à traiter, 2 déjà traitées", out.getvalue())
+
+
+class ProductFragmentCacheTests(TestCase):
+    """Fragments produit mis en cache par {% cache %}, invalidés par updated_at et par les variantes d'image"""
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, IMAGE_VARIANT_WORKERS=0)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        create_catalog(1, 'f')
+        self.product = Product.objects.get(slug='f-produit-0')
+        self.url = reverse('store:product_list')
+
+    def test_card_cached_until_product_saved(self):
+        self.assertContains(self.client.get(self.url), 'f produit 0')
+        # update() ne touche pas updated_at : le fragment en cache est resservi
+        Product.objects.filter(pk=self.product.pk).update(title='Titre modifié')
+        self.assertContains(self.client.get(self.url), 'f produit 0')
+        self.product.refresh_from_db()
+        self.product.save()
+        self.assertContains(self.client.get(self.url), 'Titre modifié')
+
+    def test_card_refreshed_once_variants_exist(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (800, 600), 'teal').save(buffer, 'JPEG')
+        # Sans exécution des callbacks on_commit : variantes pas encore générées
+        self.product.cover_image = SimpleUploadedFile('couverture.jpg', buffer.getvalue(), content_type='image/jpeg')
+        self.product.save()
+        response = self.client.get(self.url)
+        self.assertContains(response, f'src="{self.product.cover_image.url}"')
+        self.assertNotContains(response, '.card.webp')
+
+        generate_variants(self.product.cover_image.name)
+        self.assertContains(self.client.get(self.url), '.card.webp')
+
+
+class ReplicaRoutingTests(TestCase):
+    """Lectures du catalogue sur le réplica, écritures et relecture immédiate sur la base principale"""
+    # Le réplica est ajouté dans setUpClass, après la préparation des bases par le runner
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        # Deux bases SQLite distinctes : ce qui n'existe que sur le réplica révèle le routage
+        cls.replica_dir = tempfile.mkdtemp()
+        connections.settings[REPLICA_ALIAS] = dict(
+            connections.settings['default'], NAME=os.path.join(cls.replica_dir, 'replica.sqlite3'),
+        )
+        with override_settings(DATABASE_ROUTERS=[]):
+            call_command('migrate', database=REPLICA_ALIAS, verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA_ALIAS].close()
+        del connections[REPLICA_ALIAS]
+        del connections.settings[REPLICA_ALIAS]
+        shutil.rmtree(cls.replica_dir, ignore_errors=True)
+
+    def setUp(self):
+        category = Category.objects.using(REPLICA_ALIAS).create(name='Réplica', slug='replica')
+        Product.objects.using(REPLICA_ALIAS).bulk_create([Product(
+            title='Produit répliqué', slug='produit-replique', description='-', short_description='-',
+            category=category, price_fcfa=Decimal('1000'), price_eur=Decimal('2'),
+            cover_image='products/x.jpg', product_file='product_files/x.pdf',
+        )])
+
+    def search(self):
+        response = self.client.get(reverse('store:product_search'), {'q': 'répliqué'})
+        return [product['title'] for product in response.json()['products']]
+
+    def test_catalog_reads_replica_until_visitor_writes(self):
+        self.assertEqual(self.search(), ['Produit répliqué'])
+
+        response = self.client.post(reverse('store:contact'), {})
+        self.assertIn(STICKY_COOKIE_NAME, response.cookies)
+        self.assertEqual(self.search(), [])
+
+    def test_session_user_and_entitlement_reads_stay_on_primary(self):
+        user = User.objects.create_user('acheteur', 'acheteur@example.com', 'Secret123')
+        routed = {}
+
+        @read_from_replica
+        def view(request):
+            routed.update({model: router.db_for_read(model) for model in (Product, User, Session, PurchaseEntitlement)})
+            # Compte créé sur la base principale seulement (retard de réplication)
+            routed['user_found'] = User.objects.filter(pk=user.pk).exists()
+
+        view(RequestFactory().get('/'))
+        self.assertEqual(routed.pop(Product), REPLICA_ALIAS)
+        self.assertEqual(routed, {User: 'default', Session: 'default', PurchaseEntitlement: 'default', 'user_found': True})
+
+    def test_view_count_incremented_on_primary(self):
+        # Réplica en retard : le compteur lu (3) ne doit pas écraser celui de la base principale (10)
+        product = Product.objects.using(REPLICA_ALIAS).get(slug='produit-replique')
+        Product.objects.using(REPLICA_ALIAS).filter(pk=product.pk).update(views_count=3)
+        Category.objects.using('default').create(pk=product.category_id, name='Réplica', slug='replica')
+        product.views_count = 10
+        product.save_base(using='default', raw=True, force_insert=True)
+
+        self.assertEqual(self.client.get(reverse('store:product_detail', args=[product.slug])).status_code, 200)
+        self.assertEqual(Product.objects.using('default').get(pk=product.pk).views_count, 11)
+
+    def test_writes_go_to_primary(self):
+        Category.objects.create(name='Principale', slug='principale')
+        self.assertTrue(Category.objects.using('default').filter(slug='principale').exists())
+        self.assertFalse(Category.objects.using(REPLICA_ALIAS).filter(slug='principale').exists())
+
+
+class DatabaseConnectionSettingsTests(unittest.TestCase):
+    """DB_CONN_MAX_AGE, DJANGO_ASGI et DB_POOL appliqués à DATABASES par novalearnweb/settings.py"""
+
+    POSTGRES_URL = 'postgres://nova:secret@db:5432/nova'
+
+    def load_settings(self, **env):
+        environ = {key: value for key, value in os.environ.items() if not key.startswith(('DB_', 'DJANGO_ASGI'))}
+        environ.pop('DATABASE_REPLICA_URL', None)
+        # Sans load_dotenv : un .env local ne doit pas remplir les variables retirées
+        with mock.patch.dict(os.environ, {**environ, **env}, clear=True), mock.patch('dotenv.load_dotenv'):
+            return runpy.run_path(str(settings.BASE_DIR / 'novalearnweb' / 'settings.py'))
+
+    def test_persistent_connections_under_wsgi_only(self):
+        self.assertEqual(self.load_settings()['DATABASES']['default']['CONN_MAX_AGE'], 60)
+        self.assertTrue(self.load_settings()['DATABASES']['default']['CONN_HEALTH_CHECKS'])
+        self.assertEqual(self.load_settings(DJANGO_ASGI='True')['DATABASES']['default']['CONN_MAX_AGE'], 0)
+        self.assertIsNone(self.load_settings(DB_CONN_MAX_AGE='None')['DATABASES']['default']['CONN_MAX_AGE'])
+
+    def test_pool_replaces_persistent_connections_on_postgresql(self):
+        databases = self.load_settings(
+            DATABASE_URL=self.POSTGRES_URL, DATABASE_REPLICA_URL=self.POSTGRES_URL,
+            DB_POOL='True', DB_POOL_MAX_SIZE='20',
+        )['DATABASES']
+        for alias in ('default', 'replica'):
+            with self.subTest(alias=alias):
+                self.assertEqual(databases[alias]['CONN_MAX_AGE'], 0)
+                self.assertEqual(databases[alias]['OPTIONS']['pool'], {'min_size': 2, 'max_size': 20, 'timeout': 10})
+
+    def test_pool_ignored_on_sqlite(self):
+        database = self.load_settings(DB_POOL='True')['DATABASES']['default']
+        self.assertEqual(database['CONN_MAX_AGE'], 60)
+        self.assertNotIn('pool', database.get('OPTIONS', {}))
+
+
+class StaticFilesStorageTests(unittest.TestCase):
+    """Noms hachés après collectstatic, noms d'origine tant qu'il n'y a pas de manifeste"""
+
+    def setUp(self):
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root, ignore_errors=True)
+
+    def storage(self):
+        return StaticFilesStorage(location=self.static_root, base_url='/static/')
+
+    def test_without_manifest_serves_unhashed_name(self):
+        storage = self.storage()
+        self.assertEqual(storage.url('css/style.css'), '/static/css/style.css')
+        # {% static %} sur un poste sans collectstatic : pas d'erreur de rendu
+        template = Template("{% load static %}{% static 'css/style.css' %}")
+        with override_settings(STATIC_ROOT=self.static_root, STATIC_URL='/static/'):
+            self.assertEqual(template.render(Context()), '/static/css/style.css')
+
+    def test_with_manifest_serves_hashed_name(self):
+        with open(os.path.join(self.static_root, 'staticfiles.json'), 'w') as manifest:
+            json.dump({'version': '1.1', 'paths': {'css/style.css': 'css/style.0123456789ab.css'}}, manifest)
+        storage = self.storage()
+        self.assertEqual(storage.url('css/style.css'), '/static/css/style.0123456789ab.css')
+        # Fichier absent du manifeste : erreur, comme ManifestStaticFilesStorage
+        with self.assertRaises(ValueError):
+            storage.url('css/absent.css')
+
+
+class QueueFileHandlerTests(TestCase):
+    """Journal de paiement : JSON structuré, écrit hors du thread appelant, file bornée"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.path = os.path.join(self.directory, 'payments.log')
+
+    def make_logger(self, handler):
+        logger = logging.getLogger(f'store.tests.{self.id()}')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        return logger
+
+    def test_structured_record_written_by_listener(self):
+        handler = QueueFileHandler(self.path)
+        self.make_logger(handler).info("Webhook %s", 'traité', extra={'order_number': 'NL-1', 'latency_ms': 12.5})
+        handler.close()
+        with open(self.path) as fh:
+            record = json.loads(fh.readline())
+        self.assertEqual(record['message'], 'Webhook traité')
+        self.assertEqual(record['order_number'], 'NL-1')
+        self.assertEqual(record['latency_ms'], 12.5)
+
+    def test_reopens_file_after_external_rotation(self):
+        handler = QueueFileHandler(self.path)
+        logger = self.make_logger(handler)
+        logger.info("avant")
+        handler.listener.stop()
+        os.rename(self.path, self.path + '.1')  # logrotate
+        handler._start_listener()
+        logger.info("après")
+        handler.close()
+        with open(self.path) as fh:
+            self.assertEqual([json.loads(line)['message'] for line in fh], ['après'])
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = QueueFileHandler(self.path, queue_size=1)
+        handler.listener.stop()  # écriture suspendue : la file se remplit
+        handler._running = False
+        logger = self.make_logger(handler)
+        for index in range(5):
+            logger.warning("message %d", index)
+        self.assertEqual(handler.dropped, 4)
+        handler.close()
+
+
+@override_settings(RATE_LIMITS={'search': ('1/s', 3), 'test': ('1/s', 3)}, RATE_LIMIT_ENABLED=True)
+class RateLimitTests(TestCase):
+    """Seau à jetons dans le cache : rafale tolérée, puis 429 avec Retry-After"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bucket_refills_over_time(self):
+        now = 1_000_000.0
+        self.assertEqual([consume('test', 'a', now) for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(consume('test', 'a', now), 1.0)
+        self.assertEqual(consume('test', 'b', now), 0)
+        self.assertEqual(consume('test', 'a', now + 1), 0)
+        self.assertEqual([consume('test', 'a', now + 10) for _ in range(3)], [0, 0, 0])
+
+    def test_key_outlives_accepted_requests(self):
+        # Client à la limite (une requête par seconde après la rafale) : la clé ne doit pas
+        # expirer 4 s après sa création et rendre une nouvelle rafale
+        clock = [1_000_000.0]
+        with mock.patch('time.time', lambda: clock[0]):
+            self.assertEqual([consume('test', 'a') for _ in range(3)], [0, 0, 0])
+            for _ in range(4):
+                clock[0] += 1
+                self.assertEqual(consume('test', 'a'), 0)
+            self.assertTrue(consume('test', 'a'))
+
+    @override_settings(RATE_LIMIT_CLIENT_IP_HEADER='HTTP_X_FORWARDED_FOR', RATE_LIMIT_TRUSTED_PROXIES=1)
+    def test_forwarded_for_uses_trusted_proxy_entry(self):
+        url = reverse('store:product_search')
+        statuses = [
+            self.client.get(url, {'q': 'xx'}, HTTP_X_FORWARDED_FOR=f'10.0.0.{i}, 203.0.113.7').status_code
+            for i in range(4)
+        ]
+        self.assertEqual(statuses, [200, 200, 200, 429])
+        response = self.client.get(url, {'q': 'xx'}, HTTP_X_FORWARDED_FOR='203.0.113.8')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(RATE_LIMITS={'webhook': ('1/s', 3)}, RATE_LIMIT_EXEMPT_IPS={'webhook': ['198.51.100.10']})
+    def test_payment_gateway_is_exempt_from_webhook_limit(self):
+        url = reverse('store:cinetpay_webhook')
+        statuses = [self.client.post(url, '{}', content_type='application/json', REMOTE_ADDR='198.51.100.10').status_code
+                    for _ in range(5)]
+        self.assertNotIn(429, statuses)
+        statuses = [self.client.post(url, '{}', content_type='application/json', REMOTE_ADDR='203.0.113.9').status_code
+                    for _ in range(4)]
+        self.assertEqual(statuses[-1], 429)
+
+    def test_view_returns_429_with_retry_after(self):
+        url = reverse('store:product_search')
+        for _ in range(3):
+            self.assertEqual(self.client.get(url, {'q': 'xx'}).status_code, 200)
+        response = self.client.get(url, {'q': 'xx'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertIn('error', response.json())
+
+
+class EmailLoginTests(TestCase):
+    """Connexion et inscription par email, casse ignorée, via l'index lower(email)"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', 'Alice@Example.com', 'Secret123')
+
+    def test_login_with_email_in_any_case(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('store:login'), {'username': 'ALICE@example.COM', 'password': 'Secret123'})
+        self.assertRedirects(response, reverse('store:home'), fetch_redirect_response=False)
+        self.assertIn('LOWER("auth_user"."email")', queries.captured_queries[0]['sql'])
+
+    def test_registration_conflicts_in_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(registration_conflicts('ALICE', 'other@example.com'), (True, False))
+        self.assertEqual(registration_conflicts('bob', 'alice@EXAMPLE.com'), (False, True))
+        self.assertEqual(registration_conflicts('bob', 'bob@example.com'), (False, False))
+
+    def test_email_is_unique_ignoring_case(self):
+        response = self.client.post(reverse('store:register'), {
+            'username': 'alice2', 'email': 'ALICE@example.com', 'password': 'Secret123',
+            'confirm_password': 'Secret123', 'terms': 'on',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(User.objects.filter(username='alice2').exists())
+        with self.assertRaises(IntegrityError):
+            User.objects.create_user('alice3', 'alice@example.COM', 'Secret123')
+
+    def test_social_signup_with_existing_email_is_associated(self):
+        request = RequestFactory().get('/')
+        request.session = self.client.session
+        strategy = load_strategy(request)
+        backend = load_backend(strategy, 'google-oauth2', redirect_uri=None)
+        response = {'email': 'ALICE@example.com', 'email_verified': True, 'name': 'Alice', 'sub': 'google-1'}
+        user = backend.authenticate(request, backend=backend, strategy=strategy, response=response)
+        self.assertEqual(user, self.user)
+        self.assertFalse(user.is_new)
+        self.assertEqual(User.objects.count(), 1)
+        self.assertTrue(UserSocialAuth.objects.filter(user=self.user, provider='google-oauth2').exists())
+        # Adresse inconnue : compte créé normalement
+        response = {'email': 'bob@example.com', 'name': 'Bob', 'sub': 'google-2'}
+        self.assertTrue(backend.authenticate(request, backend=backend, strategy=strategy, response=response).is_new)
+
+    def test_social_signup_with_unverified_email_is_refused(self):
+        request = RequestFactory().get('/')
+        request.session = self.client.session
+        strategy = load_strategy(request)
+        for provider, response in (
+            ('google-oauth2', {'email': 'alice@example.com', 'email_verified': False, 'sub': 'google-3'}),
+            ('facebook', {'email': 'alice@example.com', 'id': 'fb-1', 'name': 'Alice'}),
+        ):
+            backend = load_backend(strategy, provider, redirect_uri=None)
+            with self.assertRaisesMessage(AuthException, 'Un compte existe déjà'):
+                backend.authenticate(request, backend=backend, strategy=strategy, response=response)
+        self.assertEqual(User.objects.count(), 1)
+        self.assertFalse(UserSocialAuth.objects.exists())
+
+    def test_admin_user_form_rejects_email_of_another_account(self):
+        self.client.force_login(User.objects.create_superuser('root', 'root@example.com', 'Secret123'))
+        url = reverse('admin:auth_user_change', args=[self.user.pk])
+        form = self.client.get(url).context['adminform'].form
+        data = {key: value for key, value in form.initial.items() if value is not None and key != 'password'}
+        data.update({'email': 'ROOT@example.com', 'date_joined_0': '2026-01-01', 'date_joined_1': '00:00:00'})
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('email', response.context['adminform'].form.errors)
+        # Son propre email, casse modifiée : accepté
+        data['email'] = 'ALICE@example.com'
+        self.assertEqual(self.client.post(url, data).status_code, 302)
+
+    def test_createsuperuser_rejects_email_in_use(self):
+        with self.assertRaisesMessage(CommandError, 'Un compte utilise déjà cette adresse email'):
+            call_command('createsuperuser', interactive=False, username='admin2', email='alice@EXAMPLE.com',
+                         stdout=io.StringIO())
+        self.assertFalse(User.objects.filter(username='admin2').exists())
+
+
+class ImportCatalogTests(TestCase):
+    """Import d'un catalogue d'éditeur : JSON + CSV, fichiers hachés, relance sans doublon"""
+
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.media_root = tempfile.mkdtemp()
+        for path in (self.source, self.media_root):
+            self.addCleanup(shutil.rmtree, path, ignore_errors=True)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        for name, content in (('cover.jpg', b'cover'), ('book.pdf', b'%PDF-1.4 livre'), ('lesson.mp4', b'video')):
+            with open(os.path.join(self.source, name), 'wb') as fh:
+                fh.write(content)
+        catalog = {
+            'categories': [{'slug': 'editeur', 'name': 'Éditeur'}],
+            'collections': [{'slug': 'serie', 'title': 'Série', 'description': 'd', 'cover_image': 'cover.jpg',
+                             'price_fcfa': '9000', 'price_eur': '13.72'}],
+        }
+        with open(os.path.join(self.source, 'catalog.json'), 'w') as fh:
+            json.dump(catalog, fh)
+        with open(os.path.join(self.source, 'products.csv'), 'w') as fh:
+            fh.write("slug,title,description,short_description,category,collection,price_fcfa,price_eur,"
+                     "cover_image,product_file,is_featured\n")
+            for i in range(3):
+                fh.write(f"tome-{i},Tome {i},Livre,Court,editeur,serie,3000,4.57,cover.jpg,book.pdf,{i == 0}\n")
+            fh.write("tome-x,Tome X,Livre,Court,inconnue,,3000,4.57,cover.jpg,book.pdf,False\n")
+        with open(os.path.join(self.source, 'sequences.csv'), 'w') as fh:
+            fh.write("product,order,title,video_file,duration,is_preview\n"
+                     "tome-0,1,Intro,lesson.mp4,12,True\ntome-0,2,Suite,lesson.mp4,8,False\n")
+
+    def run_import(self):
+        call_command('import_catalog', self.source, workers=2, no_variants=True, stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_import_is_idempotent_and_deduplicates_files(self):
+        self.run_import()
+        self.run_import()
+        self.assertEqual(Product.objects.filter(slug__startswith='tome-').count(), 3)
+        self.assertEqual(VideoSequence.objects.count(), 2)
+        product = Product.objects.get(slug='tome-0')
+        self.assertEqual(product.collection.slug, 'serie')
+        self.assertTrue(product.is_featured)
+        self.assertEqual((product.video_sequence_count, product.video_total_minutes), (2, 20))
+        self.assertEqual(product.composite_type, 'video_sequences')
+        self.assertEqual(Product.objects.get(slug='tome-1').composite_type, 'collection')
+        self.assertEqual(len({p.product_file.name for p in Product.objects.filter(slug__startswith='tome-')}), 1)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'product_files')), [os.path.basename(product.product_file.name)])
+        self.assertTrue(product.file_size)
+
+    def test_update_only_rewrites_supplied_columns(self):
+        self.run_import()
+        before = Product.objects.get(slug='tome-0')
+        os.remove(os.path.join(self.source, 'catalog.json'))
+        os.remove(os.path.join(self.source, 'sequences.csv'))
+        with open(os.path.join(self.source, 'products.csv'), 'w') as fh:
+            fh.write("slug,title,price_fcfa\ntome-0,Tome 0 révisé,3500\nnouveau,Nouveau,1000\n")
+        stderr = io.StringIO()
+        call_command('import_catalog', self.source, update=True, workers=0, no_variants=True,
+                     stdout=io.StringIO(), stderr=stderr)
+        product = Product.objects.get(slug='tome-0')
+        self.assertEqual((product.title, product.price_fcfa), ('Tome 0 révisé', Decimal('3500')))
+        self.assertEqual(
+            (product.cover_image.name, product.product_file.name, product.collection_id, product.is_featured),
+            (before.cover_image.name, before.product_file.name, before.collection_id, True),
+        )
+        self.assertEqual(product.composite_type, 'video_sequences')
+        # Une création exige toujours les colonnes obligatoires
+        self.assertFalse(Product.objects.filter(slug='nouveau').exists())
+        self.assertIn('products.csv:3 : description', stderr.getvalue())
+
+
+class ContentAddressedMediaTests(TestCase):
+    """Un même fichier téléversé deux fois n'est stocké qu'une fois ; son empreinte sert d'ETag"""
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        create_catalog(2, 'm')
+        self.user = User.objects.get(username='m-client')
+        self.products = list(Product.objects.filter(slug__startswith='m-produit-').order_by('slug'))
+        for product in self.products:
+            product.pricing_type = 'free'
+            product.collection = product.personal_development_section = None
+            product.file_size = ''
+            product.product_file = SimpleUploadedFile('Livre Final.PDF', b'%PDF-1.4 contenu identique')
+            product.save()
+        VideoSequence.objects.all().delete()
+
+    def test_same_content_stored_once_with_size(self):
+        first, second = self.products
+        self.assertEqual(first.product_file.name, second.product_file.name)
+        self.assertRegex(first.product_file.name, r'^product_files/[0-9a-f]{64}\.pdf$')
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'product_files')), [os.path.basename(first.product_file.name)])
+        self.assertEqual(first.file_size, '26\xa0octets')
+
+    def test_replaced_file_updates_size(self):
+        product = Product.objects.get(pk=self.products[0].pk)
+        product.product_file = SimpleUploadedFile('Livre Final v2.pdf', b'%PDF-1.4 nouvelle version, plus longue')
+        product.save()
+        product.refresh_from_db()
+        self.assertNotEqual(product.product_file.name, self.products[0].product_file.name)
+        self.assertEqual(product.file_size, '38\xa0octets')
+
+    def test_download_has_strong_etag(self):
+        self.client.force_login(self.user)
+        url = reverse('store:download_free_product', args=[self.products[0].pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.4 contenu identique')
+        self.assertIn('filename="m-produit-0.pdf"', response['Content-Disposition'])
+        etag = response['ETag']
+        self.assertEqual(etag, '"%s"' % os.path.basename(self.products[0].product_file.name)[:64])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_revalidation_is_not_counted_as_download(self):
+        self.client.force_login(self.user)
+        product = self.products[0]
+        etag = self.client.get(reverse('store:download_free_product', args=[product.pk]))['ETag']
+        download = Download.objects.get(user=self.user, product=product)
+        for url in (reverse('store:download_free_product', args=[product.pk]),
+                    reverse('store:download_file', args=[download.download_token])):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304, url)
+        product.refresh_from_db()
+        self.assertEqual(product.downloads_count, 1)
+        self.assertEqual(Download.objects.filter(user=self.user, product=product).count(), 1)
+
+    def test_concurrent_upload_of_same_content_reuses_target(self):
+        # Le second téléversement passe exists() avant que le premier n'ait écrit le fichier
+        storage = ContentAddressedStorage()
+        stored = self.products[0].product_file.name
+        with mock.patch.object(storage, 'exists', return_value=False):
+            name = storage.store('product_files/Copie.pdf', ContentFile(b'%PDF-1.4 contenu identique'))[0]
+        self.assertEqual(name, stored)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'product_files')), [os.path.basename(stored)])
+        self.assertIsNotNone(content_digest(name))
+
+
+class VideoPackagingTests(TestCase):
+    """Rendus HLS et extrait d'aperçu servis par l'API de prévisualisation une fois empaquetés"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        create_catalog(1, 'v')
+        self.sequence = VideoSequence.objects.get(product__slug='v-produit-0')
+        self.sequence.is_preview = True
+        self.sequence.video_file = SimpleUploadedFile('lecon.mp4', b'video')
+        self.sequence.save()
+        self.url = reverse('store:sequence_video_preview', args=[self.sequence.pk])
+
+    def test_preview_api_serves_packaged_renditions(self):
+        data = self.client.get(self.url).json()['sequence']
+        self.assertEqual((data['video_url'], data['hls_url']), (self.sequence.video_file.url, ''))
+
+        VideoSequence.objects.filter(pk=self.sequence.pk).update(
+            hls_playlist='hls/abc/1/master.m3u8', preview_clip='hls/abc/preview-60s/preview.mp4',
+            packaged_source=self.sequence.video_file.name,
+        )
+        data = self.client.get(self.url).json()['sequence']
+        # Séquence d'aperçu : l'extrait court est lu, pas les rendus de la séquence complète
+        self.assertEqual((data['video_url'], data['hls_url']), ('/media/hls/abc/preview-60s/preview.mp4', ''))
+        VideoSequence.objects.filter(pk=self.sequence.pk).update(preview_clip='')
+        data = self.client.get(self.url).json()['sequence']
+        self.assertEqual(data['hls_url'], '/media/hls/abc/1/master.m3u8')
+
+        # Vidéo remplacée : les anciens rendus ne sont plus servis
+        self.sequence.video_file = SimpleUploadedFile('nouvelle.mp4', b'autre video')
+        self.sequence.save()
+        data = self.client.get(self.url).json()['sequence']
+        self.assertEqual((data['video_url'], data['hls_url']), (self.sequence.video_file.url, ''))
+
+    def test_full_renditions_require_purchase(self):
+        VideoSequence.objects.filter(pk=self.sequence.pk).update(
+            is_preview=False, hls_playlist='hls/abc/1/master.m3u8', packaged_source=self.sequence.video_file.name,
+        )
+        self.assertEqual(self.client.get(self.url).json()['sequence']['hls_url'], '')
+        user = User.objects.get(username='v-client')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(self.url).json()['sequence']['hls_url'], '')
+        order = Order.objects.create(
+            user=user, subtotal_fcfa=1000, subtotal_eur=2, total_fcfa=1000, total_eur=2,
+            customer_email=user.email, customer_name=user.username, status='paid',
+        )
+        PurchaseEntitlement.grant(user.pk, [self.sequence.product_id], order.pk)
+        self.assertEqual(self.client.get(self.url).json()['sequence']['hls_url'], '/media/hls/abc/1/master.m3u8')
+
+    def test_renditions_never_upscale(self):
+        self.assertEqual([name for name, *_ in renditions_for(720)], ['360p', '720p'])
+        self.assertEqual([name for name, *_ in renditions_for(240)], ['360p'])
+        args = hls_command('in.mp4', 'out', renditions_for(1080), audio=False)
+        self.assertEqual(args[args.index('-var_stream_map') + 1], 'v:0,name:360p v:1,name:720p v:2,name:1080p')
+
+    @unittest.skipUnless(ffmpeg_available(), "ffmpeg absent")
+    def test_package_videos_command(self):
+        source = os.path.join(self.media_root, 'source.mp4')
+        subprocess.run([settings.FFMPEG_BINARY, '-loglevel', 'error', '-f', 'lavfi', '-i', 'testsrc=size=640x360:rate=25',
+                        '-t', '8', '-pix_fmt', 'yuv420p', source], check=True)
+        with open(source, 'rb') as fh:
+            self.sequence.video_file = SimpleUploadedFile('source.mp4', fh.read())
+        self.sequence.save()
+        call_command('package_videos', workers=0, preview_seconds=2, stdout=io.StringIO())
+        self.sequence.refresh_from_db()
+        self.assertTrue(self.sequence.is_packaged())
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, self.sequence.hls_playlist)))
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, self.sequence.preview_clip)))
@@ -1,16 +1,28 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
 
 app_name = 'store'
 
-urlpatterns = [
+
+def catalog_patterns(catalog):
+    """Pages du catalogue servies par le module de vues `catalog`"""
+    return [
+        path('', catalog.home, name='home'),
+        path('products/', catalog.product_list, name='product_list'),
+        path('product/<slug:slug>/', catalog.product_detail, name='product_detail'),
+        path('api/product-search/', catalog.product_search, name='product_search'),
+        path('api/sequence/<int:sequence_id>/preview/', catalog.sequence_video_preview, name='sequence_video_preview'),
+    ]
+
+
+# Vues async seulement derrière novalearnweb/asgi.py ; sous WSGI (gunicorn),
+# des vues async passeraient par async_to_sync à chaque requête
+urlpatterns = catalog_patterns(async_views if settings.ASGI else views) + [
     # Test view
     path('test/', views.test_view, name='test'),
     
     # Pages principales
-    path('', views.home, name='home'),
-    path('products/', views.product_list, name='product_list'),
-    path('product/<slug:slug>/', views.product_detail, name='product_detail'),
     path('product/<slug:slug>/review/', views.add_review, name='add_review'),
     path('category/<slug:slug>/', views.category_detail, name='category_detail'),
     
@@ -68,16 +80,17 @@ urlpatterns = [
     
         # API pour AJAX
     path('api/update-cart/', views.update_cart, name='update_cart'),
-    path('api/product-search/', views.product_search, name='product_search'),
     
     # Vidéos et séquences
     path('product/<int:product_id>/preview/', views.video_preview, name='video_preview'),
     path('product/<int:product_id>/sequences/', views.product_video_sequences, name='product_video_sequences'),
-    path('api/sequence/<int:sequence_id>/preview/', views.sequence_video_preview, name='sequence_video_preview'),
     
     # Dashboard administrateur
     path('admin/dashboard/', views.admin_dashboard, name='admin_dashboard'),
     path('admin/orders/', views.admin_orders, name='admin_orders'),
     path('admin/orders/<str:order_number>/', views.admin_order_detail, name='admin_order_detail'),
     path('admin/analytics/', views.admin_analytics, name='admin_analytics'),
+    
+    # Métriques de performance (QUERY_METRICS_ENABLED)
+    path('metrics/', views.metrics, name='metrics'),
 ] 
\ No newline at end of file
@@ -0,0 +1,209 @@
+"""
+Empaquetage HLS des séquences vidéo (ffmpeg local, hors requête).
+
+Chaque fichier source donne plusieurs rendus H.264/AAC segmentés (au plus
+la hauteur de la source) sous `hls/<empreinte>/`, avec une playlist
+maîtresse, et un extrait MP4 court (démarrage rapide) pour les séquences
+d'aperçu. Les lecteurs ne téléchargent ainsi que les segments regardés,
+au débit adapté à leur connexion.
+"""
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from .media import content_digest
+from .models import VideoSequence
+
+
+HLS_DIRECTORY = 'hls'
+SEGMENT_SECONDS = 6
+# (nom, hauteur, débit vidéo en kbit/s, débit audio en kbit/s)
+RENDITIONS = [
+    ('360p', 360, 800, 96),
+    ('720p', 720, 2800, 128),
+    ('1080p', 1080, 5000, 160),
+]
+PREVIEW_MAX_HEIGHT = 720
+
+
+class PackagingError(Exception):
+    pass
+
+
+def ffmpeg_available():
+    return bool(shutil.which(settings.FFMPEG_BINARY) and shutil.which(settings.FFPROBE_BINARY))
+
+
+def _run(args):
+    try:
+        subprocess.run(args, check=True, capture_output=True, text=True)
+    except subprocess.CalledProcessError as exc:
+        lines = (exc.stderr or '').strip().splitlines()
+        raise PackagingError(f"{os.path.basename(args[0])} : {lines[-1] if lines else f'code {exc.returncode}'}")
+    except OSError as exc:
+        raise PackagingError(f"{args[0]} : {exc}")
+
+
+def probe(path):
+    """{'height': hauteur de la vidéo, 'audio': piste audio présente ?}"""
+    try:
+        output = subprocess.run(
+            [settings.FFPROBE_BINARY, '-v', 'error', '-show_entries', 'stream=codec_type,height', '-of', 'json', path],
+            check=True, capture_output=True, text=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError) as exc:
+        raise PackagingError(f"ffprobe : {exc}")
+    streams = json.loads(output).get('streams', [])
+    heights = [stream.get('height') or 0 for stream in streams if stream.get('codec_type') == 'video']
+    if not heights:
+        raise PackagingError("aucune piste vidéo")
+    return {'height': max(heights), 'audio': any(stream.get('codec_type') == 'audio' for stream in streams)}
+
+
+def renditions_for(height):
+    """Rendus jusqu'à la hauteur de la source (le plus petit au minimum : pas d'agrandissement inutile)"""
+    return [rendition for rendition in RENDITIONS if rendition[1] <= height] or RENDITIONS[:1]
+
+
+def hls_command(source, output_dir, renditions, audio, threads=0):
+    count = len(renditions)
+    graph = f"[0:v]split={count}{''.join(f'[v{i}]' for i in range(count))};" + ';'.join(
+        f'[v{i}]scale=-2:{height}[v{i}out]' for i, (_name, height, _vb, _ab) in enumerate(renditions)
+    )
+    args = [settings.FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error', '-y', '-i', source, '-filter_complex', graph]
+    stream_map = []
+    for i, (name, _height, video_kbps, audio_kbps) in enumerate(renditions):
+        args += ['-map', f'[v{i}out]']
+        args += [f'-c:v:{i}', 'libx264', f'-b:v:{i}', f'{video_kbps}k',
+                 f'-maxrate:v:{i}', f'{video_kbps * 107 // 100}k', f'-bufsize:v:{i}', f'{video_kbps * 3 // 2}k']
+        if audio:
+            args += ['-map', '0:a:0', f'-c:a:{i}', 'aac', f'-b:a:{i}', f'{audio_kbps}k']
+            stream_map.append(f'v:{i},a:{i},name:{name}')
+        else:
+            stream_map.append(f'v:{i},name:{name}')
+    args += [
+        '-preset', 'veryfast', '-profile:v', 'main', '-threads', str(threads),
+        # Images clés alignées sur les segments : changement de rendu possible à chaque segment
+        '-sc_threshold', '0', '-force_key_frames', f'expr:gte(t,n_forced*{SEGMENT_SECONDS})',
+        '-f', 'hls', '-hls_time', str(SEGMENT_SECONDS), '-hls_playlist_type', 'vod',
+        '-hls_flags', 'independent_segments',
+        '-hls_segment_filename', os.path.join(output_dir, '%v', 'segment_%04d.ts'),
+        '-master_pl_name', 'master.m3u8', '-var_stream_map', ' '.join(stream_map),
+        os.path.join(output_dir, '%v', 'index.m3u8'),
+    ]
+    return args
+
+
+def preview_command(source, output, seconds, threads=0):
+    return [
+        settings.FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error', '-y', '-i', source, '-t', str(seconds),
+        '-map', '0:v:0', '-map', '0:a:0?',
+        '-vf', f"scale=-2:'trunc(min({PREVIEW_MAX_HEIGHT}\\,ih)/2)*2'",
+        '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23', '-c:a', 'aac', '-b:a', '128k',
+        # Index en tête de fichier : lecture dès les premiers octets reçus
+        '-movflags', '+faststart', '-threads', str(threads), output,
+    ]
+
+
+def package_prefix(name):
+    """Dossier des rendus d'un fichier source : son empreinte, ou un hachage du nom (fichiers antérieurs)"""
+    key = content_digest(name) or 'name-' + hashlib.sha256(name.encode()).hexdigest()[:32]
+    return f'{HLS_DIRECTORY}/{key}'
+
+
+def _upload_tree(local_dir, prefix, storage):
+    """Copie l'arborescence produite par ffmpeg dans le stockage, noms relatifs conservés ; taille totale"""
+    total = 0
+    for dirpath, _dirnames, filenames in os.walk(local_dir):
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            name = f"{prefix}/{os.path.relpath(path, local_dir).replace(os.sep, '/')}"
+            # FileSystemStorage renommerait le fichier au lieu de l'écraser
+            if storage.exists(name):
+                storage.delete(name)
+            with open(path, 'rb') as fh:
+                storage.save(name, File(fh))
+            total += os.path.getsize(path)
+    return total
+
+
+def _local_source(field, workdir):
+    """Chemin local du fichier vidéo (copie temporaire si le stockage n'est pas local)"""
+    try:
+        return field.storage.path(field.name)
+    except NotImplementedError:
+        path = os.path.join(workdir, 'source' + os.path.splitext(field.name)[1])
+        with field.storage.open(field.name, 'rb') as src, open(path, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        return path
+
+
+def package_sequences(sequence_ids, force=False, threads=0, preview_seconds=None):
+    """
+    Empaquette le fichier vidéo commun aux séquences `sequence_ids` (un seul
+    passage ffmpeg par source). Retourne un dict de statistiques.
+    """
+    preview_seconds = preview_seconds or settings.VIDEO_PREVIEW_SECONDS
+    sequences = list(VideoSequence.objects.filter(pk__in=sequence_ids))
+    if not sequences:
+        return {'sequences': 0, 'source_bytes': 0, 'hls_bytes': 0, 'preview_bytes': 0, 'seconds': 0.0}
+    field = sequences[0].video_file
+    name, storage = field.name, field.storage
+    prefix = package_prefix(name)
+    needs_preview = any(sequence.is_preview for sequence in sequences)
+
+    # Rendus déjà produits pour ce fichier (par une autre séquence ou un lancement précédent)
+    done = VideoSequence.objects.filter(packaged_source=name).exclude(hls_playlist='')
+    done = {} if force else (done.values('hls_playlist', 'preview_clip').order_by('-preview_clip').first() or {})
+    hls_playlist = done.get('hls_playlist', '')
+    preview_clip = done.get('preview_clip', '')
+    stats = {'sequences': len(sequences), 'source_bytes': field.size, 'hls_bytes': 0, 'preview_bytes': 0}
+
+    start = time.perf_counter()
+    if not hls_playlist or (needs_preview and not preview_clip):
+        with tempfile.TemporaryDirectory(prefix='package-video-') as workdir:
+            source = _local_source(field, workdir)
+            if not hls_playlist:
+                info = probe(source)
+                output_dir = os.path.join(workdir, 'hls')
+                os.makedirs(output_dir)
+                renditions = renditions_for(info['height'])
+                for rendition in renditions:
+                    os.makedirs(os.path.join(output_dir, rendition[0]))
+                _run(hls_command(source, output_dir, renditions, info['audio'], threads))
+                # Emplacement de la playlist maîtresse selon la version d'ffmpeg : cherchée dans l'arborescence
+                master = next((
+                    os.path.join(dirpath, 'master.m3u8')
+                    for dirpath, _dirnames, filenames in os.walk(output_dir) if 'master.m3u8' in filenames
+                ), None)
+                if master is None:
+                    raise PackagingError("playlist maîtresse absente de la sortie d'ffmpeg")
+                # Un dossier par empaquetage : les segments déjà en cache (CDN, navigateur) ne sont jamais réécrits
+                version = f'{prefix}/{timezone.now():%Y%m%d%H%M%S}'
+                stats['hls_bytes'] = _upload_tree(output_dir, version, storage)
+                hls_playlist = f"{version}/{os.path.relpath(master, output_dir).replace(os.sep, '/')}"
+            if needs_preview and not preview_clip:
+                clip_dir = os.path.join(workdir, 'preview')
+                os.makedirs(clip_dir)
+                _run(preview_command(source, os.path.join(clip_dir, 'preview.mp4'), preview_seconds, threads))
+                stats['preview_bytes'] = _upload_tree(clip_dir, f'{prefix}/preview-{preview_seconds}s', storage)
+                preview_clip = f'{prefix}/preview-{preview_seconds}s/preview.mp4'
+    stats['seconds'] = time.perf_counter() - start
+
+    # Filtre sur le fichier : une vidéo remplacée entre-temps n'hérite pas de ces rendus
+    VideoSequence.objects.filter(pk__in=[sequence.pk for sequence in sequences], video_file=name).update(
+        hls_playlist=hls_playlist, packaged_source=name, updated_at=timezone.now(),
+    )
+    if preview_clip:
+        VideoSequence.objects.filter(pk__in=[s.pk for s in sequences if s.is_preview], video_file=name).update(
+            preview_clip=preview_clip,
+        )
+    return stats
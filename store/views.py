@@ -1,20 +1,36 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
+from django.conf import settings
 from django.contrib.auth import login, logout, authenticate
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse, Http404
-from django.db.models import Q, Avg
+from django.http import JsonResponse, HttpResponse, HttpResponseNotModified, FileResponse, Http404
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Avg, Exists, OuterRef
 from django.utils import timezone
+from django.utils.http import parse_etags
 from django.core.paginator import Paginator
 import json
+import logging
 from django.contrib.auth.models import User
 from datetime import timedelta
 import uuid
 import zipfile
 import io
 import os
-from .models import Category, Product, Order, OrderItem, Payment, Download, Review, VideoSequence, BookCollection, PersonalDevelopmentSection, Contact
+from .models import Category, Product, Order, OrderItem, Payment, Download, Review, VideoSequence, BookCollection, PersonalDevelopmentSection, Contact, PurchaseEntitlement
 from .forms import ReviewForm
+from .pagination import KeysetPaginator
+from .accounts import find_user_by_email, registration_conflicts
+from .cart import get_cart, save_cart
+from .images import variant_url
+from .media import content_digest
+from .ratelimit import rate_limit
+from .routers import read_from_replica
+from .metrics import registry as metrics_registry
+from .conditional import (
+    catalog_condition, product_detail_validator, category_detail_validator,
+    book_collection_validator, personal_development_section_validator,
+)
 from decimal import Decimal
 from django.contrib.admin.views.decorators import staff_member_required
 from django.db.models import Sum, Count, Avg
@@ -22,12 +38,15 @@ from django.db.models.functions import TruncDate, TruncMonth
 from datetime import datetime, timedelta
 from django.utils import timezone
 
+logger = logging.getLogger(__name__)
+
 
 def test_view(request):
     """Test view to check template loading"""
     return render(request, 'store/test.html')
 
 
+@read_from_replica
 def home(request):
     """Page d'accueil"""
     try:
@@ -82,8 +101,8 @@ def home(request):
         return render(request, 'store/home.html', context)
 
 
-def product_list(request):
-    """Liste des produits"""
+def _filter_products(request):
+    """Produits actifs filtrés et triés selon les paramètres de la liste des produits"""
     products = Product.objects.filter(is_active=True).select_related('category')
     
     # Filtres
@@ -114,6 +133,19 @@ def product_list(request):
     else:
         products = products.order_by('-created_at')
     
+    return products, {
+        'current_category': category,
+        'current_type': product_type,
+        'current_search': search,
+        'current_sort': sort,
+    }
+
+
+@read_from_replica
+def product_list(request):
+    """Liste des produits"""
+    products, filters = _filter_products(request)
+    
     # Pagination
     paginator = Paginator(products, 12)
     page_number = request.GET.get('page')
@@ -124,28 +156,33 @@ def product_list(request):
     context = {
         'page_obj': page_obj,
         'categories': categories,
-        'current_category': category,
-        'current_type': product_type,
-        'current_search': search,
-        'current_sort': sort,
+        **filters,
     }
     
     return render(request, 'store/product_list.html', context)
 
 
+@read_from_replica
+@catalog_condition(product_detail_validator)
 def product_detail(request, slug):
     """Détail d'un produit"""
     product = get_object_or_404(Product, slug=slug, is_active=True)
     
-    # Incrémenter le compteur de vues
-    product.views_count += 1
-    product.save(update_fields=['views_count'])
-    
-    # Produits similaires
-    similar_products = Product.objects.filter(
-        category=product.category,
-        is_active=True
-    ).exclude(id=product.id)[:4]
+    # Incrémenter le compteur de vues sur la base principale, sans réécrire la valeur lue sur le réplica
+    Product.objects.filter(pk=product.pk).update(views_count=F('views_count') + 1)
+    
+    # Produits similaires : voisins pré-calculés par build_recommendations
+    similar_products = [
+        recommendation.recommended
+        for recommendation in product.recommendations.filter(
+            recommended__is_active=True
+        ).select_related('recommended')[:4]
+    ]
+    if not similar_products:
+        similar_products = Product.objects.filter(
+            category=product.category,
+            is_active=True
+        ).exclude(id=product.id)[:4]
     
     # Avis approuvés
     reviews = Review.objects.filter(
@@ -155,6 +192,7 @@ def product_detail(request, slug):
     
     context = {
         'product': product,
+        'is_owned': PurchaseEntitlement.user_owns(request.user, product),
         'similar_products': similar_products,
         'reviews': reviews,
     }
@@ -173,6 +211,7 @@ def add_review(request, slug):
     if form.is_valid():
         data = form.cleaned_data
         # Un avis par user/prod (hors commande spécifique)
+        # La note moyenne du produit est mise à jour par le signal post_save de Review
         Review.objects.update_or_create(
             product=product,
             user=request.user,
@@ -185,18 +224,14 @@ def add_review(request, slug):
             },
         )
 
-        # Recalcule la note moyenne et le nombre d'avis
-        approved_qs = product.reviews.filter(is_approved=True)
-        product.rating_count = approved_qs.count()
-        product.rating = approved_qs.aggregate(avg=Avg('rating'))['avg'] or 0
-        product.save(update_fields=['rating', 'rating_count'])
-
         messages.success(request, 'Merci pour votre avis !')
     else:
         messages.error(request, "Formulaire invalide. Veuillez corriger les champs.")
     return redirect('store:product_detail', slug=slug)
 
 
+@read_from_replica
+@catalog_condition(category_detail_validator)
 def category_detail(request, slug):
     """Détail d'une catégorie"""
     category = get_object_or_404(Category, slug=slug, is_active=True)
@@ -220,12 +255,12 @@ def category_detail(request, slug):
 
 def cart(request):
     """Panier"""
-    cart_data = request.session.get('cart', {})
+    cart_data = get_cart(request)
     cart_items = []
     total_fcfa = 0
     total_eur = 0
     
-    for product_id, quantity in cart_data.items():
+    for product_id, quantity in list(cart_data.items()):
         try:
             product = Product.objects.get(id=product_id, is_active=True)
             
@@ -252,8 +287,7 @@ def cart(request):
             # Supprimer le produit invalide du panier
             del cart_data[product_id]
     
-    request.session['cart'] = cart_data
-    request.session.modified = True
+    save_cart(request, cart_data)
     
     # Calculer la TVA (18%) et le total avec TVA
     tax_fcfa = total_fcfa * Decimal('0.18')
@@ -286,10 +320,9 @@ def add_to_cart(request, product_id):
         
         quantity = int(request.POST.get('quantity', 1))
         
-        cart_data = request.session.get('cart', {})
+        cart_data = get_cart(request)
         cart_data[str(product_id)] = cart_data.get(str(product_id), 0) + quantity
-        request.session['cart'] = cart_data
-        request.session.modified = True
+        save_cart(request, cart_data)
         
         messages.success(request, f'{product.title} ajouté au panier.')
         
@@ -303,11 +336,10 @@ def add_to_cart(request, product_id):
 
 def remove_from_cart(request, product_id):
     """Retirer du panier"""
-    cart_data = request.session.get('cart', {})
+    cart_data = get_cart(request)
     if str(product_id) in cart_data:
         del cart_data[str(product_id)]
-        request.session['cart'] = cart_data
-        request.session.modified = True
+        save_cart(request, cart_data)
         messages.success(request, 'Produit retiré du panier.')
     
     return redirect('store:cart')
@@ -316,7 +348,7 @@ def remove_from_cart(request, product_id):
 @login_required
 def checkout(request):
     """Finaliser la commande"""
-    cart_data = request.session.get('cart', {})
+    cart_data = get_cart(request)
     
     if not cart_data:
         messages.warning(request, 'Votre panier est vide.')
@@ -326,7 +358,7 @@ def checkout(request):
     total_fcfa = 0
     total_eur = 0
     
-    for product_id, quantity in cart_data.items():
+    for product_id, quantity in list(cart_data.items()):
         try:
             product = Product.objects.get(id=product_id, is_active=True)
             
@@ -352,6 +384,8 @@ def checkout(request):
         except Product.DoesNotExist:
             del cart_data[product_id]
     
+    save_cart(request, cart_data)
+    
     # Calculer la TVA (18%) et le total avec TVA
     tax_fcfa = total_fcfa * Decimal('0.18')
     tax_eur = total_eur * Decimal('0.18')
@@ -382,8 +416,7 @@ def checkout(request):
             )
         
         # Vider le panier
-        request.session['cart'] = {}
-        request.session.modified = True
+        save_cart(request, {})
         
         # Rediriger directement vers la page de paiement CinetPay
         return redirect('store:payment', order_number=order.order_number)
@@ -548,7 +581,37 @@ def order_detail(request, order_number):
     return render(request, 'store/order_detail.html', context)
 
 
+def _product_file_etag(product):
+    """ETag fort tiré de l'empreinte de contenu du fichier du produit, ou None"""
+    digest = content_digest(product.product_file.name)
+    return f'"{digest}"' if digest else None
+
+
+def _product_file_not_modified(request, product):
+    """304 si le client a déjà ce fichier (If-None-Match), sinon None"""
+    # Les produits composés sont servis en archive ZIP, sans ETag
+    if product.is_composite_product():
+        return None
+    etag = _product_file_etag(product)
+    if etag and etag in parse_etags(request.headers.get('If-None-Match', '')):
+        return HttpResponseNotModified(headers={'ETag': etag})
+    return None
+
+
+def _product_file_response(request, product):
+    """Fichier du produit en streaming, avec son ETag fort"""
+    etag = _product_file_etag(product)
+    response = FileResponse(
+        product.product_file.open('rb'), as_attachment=True,
+        filename=product.download_filename(), content_type='application/octet-stream',
+    )
+    if etag:
+        response['ETag'] = etag
+    return response
+
+
 @login_required
+@rate_limit('download')
 def download_file(request, token):
     """Téléchargement de fichier"""
     try:
@@ -568,6 +631,11 @@ def download_file(request, token):
             messages.error(request, "Vous avez atteint le nombre maximum de téléchargements.")
             return redirect('store:my_downloads')
         
+        # Revalidation conditionnelle : ni téléchargement compté ni fichier renvoyé
+        not_modified = _product_file_not_modified(request, download.product)
+        if not_modified is not None:
+            return not_modified
+        
         # Incrémenter le compteur de téléchargements du produit
         download.product.increment_downloads()
         
@@ -576,9 +644,7 @@ def download_file(request, token):
             return download_compressed_product(request, download.product, download)
         else:
             # Retourner le fichier simple
-            response = HttpResponse(download.product.product_file, content_type='application/octet-stream')
-            response['Content-Disposition'] = f'attachment; filename="{download.product.product_file.name.split("/")[-1]}"'
-            return response
+            return _product_file_response(request, download.product)
         
     except Download.DoesNotExist:
         messages.error(request, "Lien de téléchargement invalide.")
@@ -602,10 +668,20 @@ def account(request):
 @login_required
 def my_orders(request):
     """Mes commandes"""
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
+    orders = Order.objects.filter(user=request.user).prefetch_related(
+        'items__product__category'
+    )
+    
+    # Pagination par curseur
+    paginator = KeysetPaginator(orders, 10)
+    page_obj = paginator.get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
     
     context = {
-        'orders': orders,
+        'orders': page_obj,
+        'page_obj': page_obj,
     }
     
     return render(request, 'store/my_orders.html', context)
@@ -623,6 +699,7 @@ def my_downloads(request):
     return render(request, 'store/my_downloads.html', context)
 
 
+@rate_limit('login', methods=('POST',))
 def login_view(request):
     """Connexion"""
     if request.method == 'POST':
@@ -632,14 +709,9 @@ def login_view(request):
         # Permettre la connexion via email ou nom d'utilisateur
         user = None
         if identifier:
-            if '@' in identifier:
-                try:
-                    user_obj = User.objects.get(email__iexact=identifier)
-                    user = authenticate(request, username=user_obj.username, password=password)
-                except User.DoesNotExist:
-                    user = None
-            else:
-                user = authenticate(request, username=identifier, password=password)
+            # Recherche par email via l'index lower(email) ; un nom d'utilisateur peut aussi contenir « @ »
+            user_obj = find_user_by_email(identifier) if '@' in identifier else None
+            user = authenticate(request, username=user_obj.username if user_obj else identifier, password=password)
         
         if user is not None:
             login(request, user)
@@ -678,14 +750,22 @@ def register_view(request):
             messages.error(request, "Le mot de passe doit faire au moins 8 caractères, contenir une majuscule et un chiffre.")
         elif not terms:
             messages.error(request, "Vous devez accepter les conditions d'utilisation.")
-        elif User.objects.filter(username__iexact=username).exists():
-            messages.error(request, "Ce nom d'utilisateur existe déjà.")
-        elif User.objects.filter(email__iexact=email).exists():
-            messages.error(request, "Cette adresse email existe déjà.")
         else:
-            user = User.objects.create_user(username=username, email=email, password=password)
-            messages.success(request, 'Compte créé avec succès. Vous pouvez maintenant vous connecter.')
-            return redirect('store:login')
+            username_taken, email_taken = registration_conflicts(username, email)
+            if username_taken:
+                messages.error(request, "Ce nom d'utilisateur existe déjà.")
+            elif email_taken:
+                messages.error(request, "Cette adresse email existe déjà.")
+            else:
+                try:
+                    with transaction.atomic():
+                        User.objects.create_user(username=username, email=email, password=password)
+                except IntegrityError:
+                    # Inscription concurrente : l'index unique a tranché
+                    messages.error(request, "Ce nom d'utilisateur ou cette adresse email existe déjà.")
+                else:
+                    messages.success(request, 'Compte créé avec succès. Vous pouvez maintenant vous connecter.')
+                    return redirect('store:login')
     
     return render(request, 'store/register.html')
 
@@ -704,21 +784,34 @@ def update_cart(request):
         product_id = data.get('product_id')
         quantity = int(data.get('quantity', 1))
         
-        cart_data = request.session.get('cart', {})
+        cart_data = get_cart(request)
         
         if quantity > 0:
             cart_data[str(product_id)] = quantity
         else:
             cart_data.pop(str(product_id), None)
         
-        request.session['cart'] = cart_data
-        request.session.modified = True
+        save_cart(request, cart_data)
         
         return JsonResponse({'success': True})
     
     return JsonResponse({'success': False})
 
 
+def _search_result(product):
+    """Produit tel que renvoyé par la recherche AJAX"""
+    return {
+        'id': product.id,
+        'title': product.title,
+        'price_fcfa': float(product.price_fcfa),
+        'price_eur': float(product.price_eur),
+        'image_url': variant_url(product.cover_image, 'thumb'),
+        'url': product.get_absolute_url(),
+    }
+
+
+@rate_limit('search')
+@read_from_replica
 def product_search(request):
     """Recherche de produits via AJAX"""
     query = request.GET.get('q', '')
@@ -731,16 +824,7 @@ def product_search(request):
         title__icontains=query
     ).select_related('category')[:10]
     
-    results = []
-    for product in products:
-        results.append({
-            'id': product.id,
-            'title': product.title,
-            'price_fcfa': float(product.price_fcfa),
-            'price_eur': float(product.price_eur),
-            'image_url': product.cover_image.url if product.cover_image else '',
-            'url': product.get_absolute_url(),
-        })
+    results = [_search_result(product) for product in products]
     
     return JsonResponse({'products': results})
 
@@ -761,51 +845,65 @@ def video_preview(request, product_id):
     context = {
         'product': product,
         'preview_sequence': preview_sequence,
+        'hls_url': preview_sequence.hls_url_for(request.user) if preview_sequence else '',
     }
     
     return render(request, 'store/video_preview.html', context)
 
 
+def _missing_video_response(sequence):
+    """Réponse 404 si la séquence n'a pas de fichier vidéo lisible, sinon None (accès disque)"""
+    # Vérifier que la séquence a un fichier vidéo
+    if not sequence.video_file:
+        return JsonResponse({
+            'error': 'Aucun fichier vidéo disponible pour cette séquence'
+        }, status=404)
+    
+    # Vérifier que le fichier existe physiquement
+    if not os.path.exists(sequence.video_file.path):
+        return JsonResponse({
+            'error': 'Fichier vidéo introuvable'
+        }, status=404)
+    return None
+
+
+def _sequence_preview_data(sequence, hls_url):
+    """Informations d'une séquence et de son produit pour l'API d'aperçu"""
+    product = sequence.product
+    return {
+        'success': True,
+        'sequence': {
+            'id': sequence.id,
+            'title': sequence.title,
+            'description': sequence.description or '',
+            'duration': sequence.get_duration_display(),
+            'order': sequence.order,
+            'is_preview': sequence.is_preview,
+            # Extrait court quand il existe ; hls_url : rendus adaptatifs de la séquence complète,
+            # vide si l'extrait doit être lu ou si le visiteur n'a pas acheté le produit
+            'video_url': sequence.preview_url(),
+            'hls_url': hls_url,
+            'level': getattr(product, 'level', None),
+            'product_id': product.id,
+            'product_slug': product.slug,
+            'product_title': product.title,
+            'total_sequences': product.video_sequence_count,
+            'preview_sequences': product.video_preview_count,
+        }
+    }
+
+
 def sequence_video_preview(request, sequence_id):
     """API pour servir l'aperçu vidéo d'une séquence spécifique"""
     try:
-        sequence = get_object_or_404(VideoSequence, id=sequence_id, is_active=True)
+        sequence = get_object_or_404(VideoSequence.objects.select_related('product'), id=sequence_id, is_active=True)
         
-        # Vérifier que la séquence a un fichier vidéo
-        if not sequence.video_file:
-            return JsonResponse({
-                'error': 'Aucun fichier vidéo disponible pour cette séquence'
-            }, status=404)
-        
-        # Vérifier que le fichier existe physiquement
-        if not os.path.exists(sequence.video_file.path):
-            return JsonResponse({
-                'error': 'Fichier vidéo introuvable'
-            }, status=404)
-        
-        # Récupérer les informations du produit associé
-        product = sequence.product
-        total_sequences = product.video_sequences.filter(is_active=True).count()
+        missing = _missing_video_response(sequence)
+        if missing is not None:
+            return missing
         
         # Retourner les informations de la séquence
-        return JsonResponse({
-            'success': True,
-            'sequence': {
-                'id': sequence.id,
-                'title': sequence.title,
-                'description': sequence.description or '',
-                'duration': sequence.get_duration_display(),
-                'order': sequence.order,
-                'is_preview': sequence.is_preview,
-                'video_url': sequence.video_file.url,
-                'level': getattr(product, 'level', None),
-                'product_id': product.id,
-                'product_slug': product.slug,
-                'product_title': product.title,
-                'total_sequences': total_sequences,
-                'preview_sequences': product.video_sequences.filter(is_active=True, is_preview=True).count(),
-            }
-        })
+        return JsonResponse(_sequence_preview_data(sequence, sequence.hls_url_for(request.user)))
         
     except Exception as e:
         return JsonResponse({
@@ -822,17 +920,7 @@ def product_video_sequences(request, product_id):
         messages.error(request, 'Vous devez être connecté pour accéder à cette page.')
         return redirect('store:login')
     
-    has_purchased = False
-    for order in request.user.orders.all():
-        if order.status == 'paid':
-            for item in order.items.all():
-                if item.product == product:
-                    has_purchased = True
-                    break
-        if has_purchased:
-            break
-    
-    if not has_purchased:
+    if not PurchaseEntitlement.user_owns(request.user, product):
         messages.error(request, 'Vous devez avoir acheté cette formation pour y accéder.')
         return redirect('store:product_detail', slug=product.slug)
     
@@ -846,9 +934,10 @@ def product_video_sequences(request, product_id):
     return render(request, 'store/product_video_sequences.html', context)
 
 
+@read_from_replica
 def book_collections(request):
     """Liste des collections de livres"""
-    collections = BookCollection.objects.filter(is_active=True).prefetch_related('books')
+    collections = BookCollection.book_aggregates_queryset().filter(is_active=True)
     
     context = {
         'collections': collections,
@@ -856,9 +945,11 @@ def book_collections(request):
     return render(request, 'store/book_collections.html', context)
 
 
+@read_from_replica
+@catalog_condition(book_collection_validator)
 def book_collection_detail(request, slug):
     """Détail d'une collection de livres"""
-    collection = get_object_or_404(BookCollection, slug=slug, is_active=True)
+    collection = get_object_or_404(BookCollection.book_aggregates_queryset(), slug=slug, is_active=True)
     books = collection.books.filter(is_active=True)
     
     context = {
@@ -868,9 +959,10 @@ def book_collection_detail(request, slug):
     return render(request, 'store/book_collection_detail.html', context)
 
 
+@read_from_replica
 def personal_development(request):
     """Page développement personnel"""
-    sections = PersonalDevelopmentSection.objects.filter(is_active=True).prefetch_related('books')
+    sections = PersonalDevelopmentSection.book_aggregates_queryset().filter(is_active=True)
     
     # Livres populaires en développement personnel
     popular_books = Product.objects.filter(
@@ -886,9 +978,11 @@ def personal_development(request):
     return render(request, 'store/personal_development.html', context)
 
 
+@read_from_replica
+@catalog_condition(personal_development_section_validator)
 def personal_development_section(request, slug):
     """Détail d'une section développement personnel"""
-    section = get_object_or_404(PersonalDevelopmentSection, slug=slug, is_active=True)
+    section = get_object_or_404(PersonalDevelopmentSection.book_aggregates_queryset(), slug=slug, is_active=True)
     books = section.books.filter(is_active=True)
     
     context = {
@@ -898,6 +992,7 @@ def personal_development_section(request, slug):
     return render(request, 'store/personal_development_section.html', context)
 
 
+@rate_limit('contact', methods=('POST',))
 def contact(request):
     """Page de contact"""
     if request.method == 'POST':
@@ -928,6 +1023,7 @@ def contact(request):
     return render(request, 'store/contact.html', context)
 
 @login_required
+@rate_limit('download')
 def download_free_product(request, product_id):
     """Téléchargement direct d'un produit gratuit"""
     try:
@@ -943,6 +1039,11 @@ def download_free_product(request, product_id):
             messages.error(request, "Le fichier de ce produit n'est pas disponible.")
             return redirect('store:product_detail', slug=product.slug)
         
+        # Revalidation conditionnelle : ni téléchargement compté ni enregistrement créé
+        not_modified = _product_file_not_modified(request, product)
+        if not_modified is not None:
+            return not_modified
+        
         # Incrémenter le compteur de téléchargements du produit
         product.increment_downloads()
         
@@ -964,17 +1065,7 @@ def download_free_product(request, product_id):
         else:
             # Retourner le fichier simple
             try:
-                # Ouvrir le fichier en mode binaire
-                with open(product.product_file.path, 'rb') as file:
-                    file_content = file.read()
-                
-                # Créer la réponse HTTP
-                response = HttpResponse(file_content, content_type='application/octet-stream')
-                filename = os.path.basename(product.product_file.name)
-                response['Content-Disposition'] = f'attachment; filename="{filename}"'
-                response['Content-Length'] = len(file_content)
-                return response
-                
+                return _product_file_response(request, product)
             except (IOError, OSError) as e:
                 messages.error(request, "Erreur lors de l'accès au fichier.")
                 return redirect('store:product_detail', slug=product.slug)
@@ -988,6 +1079,7 @@ def download_free_product(request, product_id):
 
 
 @login_required
+@rate_limit('download')
 def download_compressed_product(request, product_id=None, product=None, download=None):
     """Téléchargement compressé d'un produit avec plusieurs fichiers"""
     try:
@@ -1000,20 +1092,8 @@ def download_compressed_product(request, product_id=None, product=None, download
             messages.error(request, "Produit non trouvé.")
             return redirect('store:home')
         
-        # Vérifier les droits d'accès
-        has_access = False
-        
-        # Produit gratuit
-        if product.is_free():
-            has_access = True
-        else:
-            # Vérifier si l'utilisateur a acheté ce produit
-            user_orders = Order.objects.filter(
-                user=request.user,
-                status='paid',
-                items__product=product
-            )
-            has_access = user_orders.exists()
+        # Vérifier les droits d'accès : produit gratuit ou acheté
+        has_access = product.is_free() or PurchaseEntitlement.user_owns(request.user, product)
         
         if not has_access:
             messages.error(request, "Vous n'avez pas accès à ce produit.")
@@ -1029,7 +1109,7 @@ def download_compressed_product(request, product_id=None, product=None, download
             # Ajouter le fichier principal du produit
             if product.product_file:
                 try:
-                    main_filename = os.path.basename(product.product_file.name)
+                    main_filename = product.download_filename()
                     zip_file.writestr(f"{product.title}/{main_filename}", product.product_file.read())
                     has_content = True
                 except Exception as e:
@@ -1072,7 +1152,7 @@ def download_compressed_product(request, product_id=None, product=None, download
                         if book.product_file:
                             try:
                                 if os.path.exists(book.product_file.path):
-                                    book_filename = os.path.basename(book.product_file.name)
+                                    book_filename = book.download_filename()
                                     zip_file.writestr(f"{product.title}/collection_{collection.slug}/{book_filename}", book.product_file.read())
                                     valid_books += 1
                             except Exception as e:
@@ -1092,7 +1172,7 @@ def download_compressed_product(request, product_id=None, product=None, download
                         if book.product_file:
                             try:
                                 if os.path.exists(book.product_file.path):
-                                    book_filename = os.path.basename(book.product_file.name)
+                                    book_filename = book.download_filename()
                                     zip_file.writestr(f"{product.title}/section_{section.slug}/{book_filename}", book.product_file.read())
                                     valid_books += 1
                             except Exception as e:
@@ -1246,6 +1326,7 @@ def oauth_callback(request):
 
 
 @staff_member_required
+@read_from_replica
 def admin_dashboard(request):
     """Dashboard administrateur pour suivre l'état des achats"""
     
@@ -1378,7 +1459,7 @@ def admin_orders(request):
     date_to = request.GET.get('date_to', '')
     search = request.GET.get('search', '')
     
-    orders = Order.objects.all().order_by('-created_at')
+    orders = Order.objects.select_related('user').prefetch_related('items__product')
     
     # Appliquer les filtres
     if status_filter:
@@ -1399,17 +1480,24 @@ def admin_orders(request):
             pass
     
     if search:
+        # Sous-requête EXISTS plutôt qu'une jointure sur les articles + DISTINCT
+        matching_items = OrderItem.objects.filter(
+            order=OuterRef('pk'),
+            product__title__icontains=search
+        )
         orders = orders.filter(
             Q(order_number__icontains=search) |
             Q(user__username__icontains=search) |
             Q(user__email__icontains=search) |
-            Q(items__product__title__icontains=search)
-        ).distinct()
+            Exists(matching_items)
+        )
     
-    # Pagination
-    paginator = Paginator(orders, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination par curseur avec comptage borné
+    paginator = KeysetPaginator(orders, 20, count_limit=1000)
+    page_obj = paginator.get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
     
     context = {
         'page_obj': page_obj,
@@ -1450,6 +1538,7 @@ def admin_order_detail(request, order_number):
 
 
 @staff_member_required
+@read_from_replica
 def admin_analytics(request):
     """Analytics détaillés pour l'administrateur"""
     
@@ -1531,6 +1620,25 @@ def admin_analytics(request):
     return render(request, 'store/admin/analytics.html', context)
 
 
+def metrics(request):
+    """Export des métriques par vue au format texte Prometheus (celles du worker qui répond)"""
+    if not settings.QUERY_METRICS_ENABLED:
+        raise Http404
+    
+    # Accès réservé au staff ou à un collecteur muni du jeton
+    token = settings.QUERY_METRICS_TOKEN
+    authorized = request.user.is_staff or (
+        token and request.headers.get('Authorization') == f'Bearer {token}'
+    )
+    if not authorized:
+        return HttpResponse(status=403)
+    
+    return HttpResponse(
+        metrics_registry.render_prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
 # Vues CinetPay
 @login_required
 def cinetpay_payment_status(request, transaction_id):
@@ -1635,6 +1743,7 @@ def retry_cinetpay_payment(request, transaction_id):
         })
 
 
+@rate_limit('webhook')
 def cinetpay_webhook(request):
     """Webhook CinetPay pour les notifications de paiement"""
     if request.method != 'POST':
@@ -1653,11 +1762,13 @@ def cinetpay_webhook(request):
         if result['success']:
             return JsonResponse({'status': 'success'}, status=200)
         else:
-            logger.error(f"Erreur webhook CinetPay: {result['error']}")
+            logger.error("Erreur webhook CinetPay : %s", result['error'], extra={
+                'event': 'cinetpay.webhook', 'transaction_id': webhook_data.get('transaction_id'), 'status': 'error',
+            })
             return JsonResponse({'status': 'error', 'message': result['error']}, status=400)
             
     except json.JSONDecodeError:
         return JsonResponse({'error': 'Données JSON invalides'}, status=400)
     except Exception as e:
-        logger.error(f"Erreur webhook CinetPay: {str(e)}")
+        logger.exception("Erreur webhook CinetPay : %s", e, extra={'event': 'cinetpay.webhook'})
         return JsonResponse({'error': 'Erreur interne'}, status=500)